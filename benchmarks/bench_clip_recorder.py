@@ -0,0 +1,104 @@
+# --- Alert Clip Recorder Benchmark ---
+# Measures what the alert clip recorder (src/clip_recorder.py) costs a live loop: frames from a clip
+# are fed at the camera rate for a while, once without and once with the recorder, each run in a
+# fresh process. Reported are the time add() takes on the loop thread, the process CPU use, the
+# encoded bytes held in memory and the peak memory of the process. An alert is triggered every
+# --alert-every seconds, so writing clips is part of the measurement.
+#
+#   python benchmarks/bench_clip_recorder.py --video clip.avi
+#   python benchmarks/bench_clip_recorder.py --video clip.avi --size 1280 720 --seconds 60 --json clips.json
+
+import os  # Import os to make the src folder importable.
+import sys  # Import sys to extend the import path.
+import json  # Import json to save the results.
+import time  # Import time for pacing and timing.
+import shutil  # Import shutil to remove the written clips.
+import tempfile  # Import tempfile for the clip folder.
+import argparse  # Import argparse to parse command-line arguments.
+import cv2  # Import OpenCV to read the clip.
+import numpy as np  # Import numpy for the percentiles.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from clip_recorder import ClipRecorder  # noqa: E402
+from bench_pipeline import peak_rss_mb, run_in_process  # noqa: E402
+
+
+def load_frames(path, size, max_frames=60):  # Source frames at the camera resolution.
+    cap = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(cv2.resize(frame, tuple(size)))
+    cap.release()
+    return frames
+
+
+def run_mode(config, results):  # Runs in a fresh process.
+    frames = load_frames(config['video'], config['size'])
+    out_dir = tempfile.mkdtemp(prefix='clips_')
+    recorder = ClipRecorder(out_dir, before=config['before'], after=config['after']) if config['record'] else None
+    total = int(config['seconds'] * config['fps'])
+    add_times, memory = [], []
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    next_alert = config['alert_every']
+    for i in range(total):
+        now = i / config['fps']
+        due = wall_start + now
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)  # Camera pacing.
+        if recorder:
+            t0 = time.perf_counter()
+            recorder.add(frames[i % len(frames)], now)
+            add_times.append(time.perf_counter() - t0)
+            if now >= next_alert:
+                recorder.trigger(now)
+                next_alert += config['alert_every']
+            memory.append(recorder.memory_bytes())
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    if recorder:
+        recorder.close()  # Waits for the last clip, so its memory is in the peak.
+    result = {'record': config['record'], 'frames': total, 'cpu_percent': 100.0 * cpu / wall, 'peak_rss_mb': peak_rss_mb()}
+    if recorder:
+        ms = np.array(add_times) * 1000.0
+        result.update({'add_ms_p50': float(np.percentile(ms, 50)), 'add_ms_p99': float(np.percentile(ms, 99)),
+                       'add_ms_max': float(ms.max()), 'buffer_mb_max': max(memory) / 2 ** 20,
+                       'dropped': recorder.dropped, 'clips': len(recorder.clips_written)})
+    shutil.rmtree(out_dir, ignore_errors=True)
+    results.put(result)
+
+
+def run(config):  # One mode in a fresh process.
+    return run_in_process(run_mode, config)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure the loop, CPU and memory cost of the alert clip recorder.")
+    parser.add_argument('--video', required=True, help="Video file to take frames from.")
+    parser.add_argument('--size', type=int, nargs=2, default=[1280, 720], help="Camera resolution. Default is 1280 720.")
+    parser.add_argument('--fps', type=float, default=30.0, help="Camera frame rate. Default is 30.")
+    parser.add_argument('--seconds', type=float, default=30.0, help="Length of each run. Default is 30.")
+    parser.add_argument('--before', type=float, default=5.0, help="Seconds kept before an alert. Default is 5.")
+    parser.add_argument('--after', type=float, default=5.0, help="Seconds recorded after an alert. Default is 5.")
+    parser.add_argument('--alert-every', type=float, default=12.0, help="Seconds between alerts. Default is 12.")
+    parser.add_argument('--json', default=None, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    base = {'video': args.video, 'size': args.size, 'fps': args.fps, 'seconds': args.seconds, 'before': args.before,
+            'after': args.after, 'alert_every': args.alert_every}
+    without = run(dict(base, record=False))
+    with_clips = run(dict(base, record=True))
+    if without is None or with_clips is None:  # The reason has been printed.
+        sys.exit(1)
+    print(f"{args.size[0]}x{args.size[1]} at {args.fps:g} fps for {args.seconds:g} s, alert every {args.alert_every:g} s")
+    print(f"  CPU:        {without['cpu_percent']:.1f}% without, {with_clips['cpu_percent']:.1f}% with the recorder")
+    print(f"  Peak RSS:   {without['peak_rss_mb']:.0f} MB without, {with_clips['peak_rss_mb']:.0f} MB with the recorder")
+    print(f"  add():      p50 {with_clips['add_ms_p50']:.3f} ms, p99 {with_clips['add_ms_p99']:.3f} ms, max {with_clips['add_ms_max']:.2f} ms")
+    print(f"  Buffered:   at most {with_clips['buffer_mb_max']:.1f} MB of JPEG frames")
+    print(f"  Clips:      {with_clips['clips']} written, {with_clips['dropped']} frames dropped")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'config': base, 'without': without, 'with': with_clips}, f, indent=2)
+        print(f"Results written to {args.json}")
@@ -0,0 +1,150 @@
+# --- Face Detector Benchmark ---
+# Runs every face detector backend (src/face_detectors.py) over the same recorded clip at the
+# recognition pipeline's detection width and reports the time per frame and the recall against a
+# reference: the detections stored in a .frec session recorded with --detections, or else YuNet on
+# the full-resolution frames. A detection counts as found when it overlaps a reference face with an
+# IoU of at least --iou; unmatched detections are reported as extras (likely false positives). For
+# the Haar-gated backend the share of frames on which YuNet ran is reported too.
+#
+#   python benchmarks/bench_detectors.py --video clip.avi
+#   python benchmarks/bench_detectors.py --video data/sessions/door.frec --configs yunet haar:1.1:1 haar:1.3:2 haar+yunet:1.2:2
+
+import os  # Import os to make the src folder importable.
+import sys  # Import sys to extend the import path.
+import json  # Import json to save the results.
+import time  # Import time for timing.
+import argparse  # Import argparse to parse command-line arguments.
+import cv2  # Import OpenCV to read the clip.
+import numpy as np  # Import numpy for the percentiles.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from face_detectors import create_detector, GatedDetector, YUNET_MODEL  # noqa: E402
+from recognition_core import DETECTION_WIDTH, get_iou  # noqa: E402
+from session_record import SessionReader, SESSION_EXT  # noqa: E402
+
+DEFAULT_CONFIGS = ['yunet', 'haar:1.1:1', 'haar:1.2:2', 'haar:1.3:2', 'haar+yunet:1.2:2']
+REFERENCE_SCORE = 0.9  # Minimum YuNet score for a reference face.
+
+
+def load_clip(path, max_frames):  # Frames and, for sessions recorded with --detections, the stored faces.
+    """Returns (frames, reference) where reference is a list of (N, 4) boxes per frame, or None."""
+    frames, reference = [], []
+    if path.lower().endswith(SESSION_EXT):
+        reader = SessionReader(path)
+        detection_width = reader.header.get('detection_width')
+        for _, (_, frame, det) in zip(range(max_frames), reader):
+            frames.append(frame)
+            if detection_width:  # Stored at the detection width; rescale to the frame.
+                scale = frame.shape[1] / detection_width
+                reference.append(det[det[:, -1] >= REFERENCE_SCORE, :4] * scale)
+        reader.close()
+        return frames, (reference if detection_width else None)
+    cap = cv2.VideoCapture(path)
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames, None
+
+
+def yunet_reference(frames, models_dir):  # YuNet at full resolution.
+    detector = cv2.FaceDetectorYN.create(os.path.join(models_dir, YUNET_MODEL), "", (0, 0))
+    reference = []
+    for frame in frames:
+        detector.setInputSize((frame.shape[1], frame.shape[0]))
+        _, faces = detector.detect(frame)
+        faces = faces if faces is not None else np.zeros((0, 15), dtype=np.float32)
+        reference.append(faces[faces[:, -1] >= REFERENCE_SCORE, :4])
+    return reference
+
+
+def corners(box):  # x, y, w, h to x1, y1, x2, y2 (the get_iou format).
+    return box[0], box[1], box[0] + box[2], box[1] + box[3]
+
+
+def parse_config(config):  # 'backend[:scale_factor[:downscale]]'
+    parts = config.split(':')
+    options = {'backend': parts[0]}
+    if len(parts) > 1:
+        options['scale_factor'] = float(parts[1])
+    if len(parts) > 2:
+        options['downscale'] = float(parts[2])
+    return options
+
+
+def run_config(config, frames, reference, models_dir, width, iou, cascade):  # One backend.
+    """Times one detector configuration over the clip and scores it against the reference boxes."""
+    detector = create_detector(models_dir=models_dir, cascade_path=cascade, **parse_config(config))
+    if detector is None:
+        return None
+    times, found, total, extra = [], 0, 0, 0
+    for frame, truth in zip(frames, reference):
+        scale = width / frame.shape[1]  # Same resize as RecognitionPipeline.process_frame.
+        small = cv2.resize(frame, (width, int(frame.shape[0] * scale)))
+        t0 = time.perf_counter()
+        detector.setInputSize((small.shape[1], small.shape[0]))
+        _, faces = detector.detect(small)
+        times.append(time.perf_counter() - t0)
+        boxes = [corners(face[:4] / scale) for face in (faces if faces is not None else [])]
+        unmatched = list(range(len(boxes)))
+        for box in map(corners, truth):  # Greedy matching, best overlap first.
+            best = max(unmatched, key=lambda i: get_iou(box, boxes[i]), default=None)
+            if best is not None and get_iou(box, boxes[best]) >= iou:
+                unmatched.remove(best)
+                found += 1
+        total += len(truth)
+        extra += len(unmatched)
+    ms = np.array(times) * 1000.0
+    result = {'config': config, 'ms_mean': float(ms.mean()), 'ms_p95': float(np.percentile(ms, 95)),
+              'fps': float(1000.0 / ms.mean()), 'recall': found / total if total else 0.0,
+              'extra_per_frame': extra / len(frames)}
+    if isinstance(detector, GatedDetector):
+        result['yunet_frames'] = detector.gated / max(1, detector.frames)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare face detector backends on a recorded clip.")
+    parser.add_argument('--video', required=True, help="Video file or recorded .frec session.")
+    parser.add_argument('--configs', nargs='+', default=DEFAULT_CONFIGS,
+                        help="Backends as backend[:scale_factor[:downscale]]. Default: " + ' '.join(DEFAULT_CONFIGS))
+    parser.add_argument('--frames', type=int, default=300, help="Frames to use. Default is 300.")
+    parser.add_argument('--width', type=int, default=DETECTION_WIDTH, help=f"Detection width. Default is {DETECTION_WIDTH}.")
+    parser.add_argument('--iou', type=float, default=0.4, help="Overlap for a detection to count as found. Default is 0.4.")
+    parser.add_argument('--models-dir', default='models', help="Folder with the YuNet model. Default is models.")
+    parser.add_argument('--haar-cascade', default=None, help="Haar cascade XML (default: the one shipped with OpenCV).")
+    parser.add_argument('--json', default=None, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)  # Comparable single-core numbers for every backend.
+    frames, reference = load_clip(args.video, args.frames)
+    if not frames:
+        print(f"Error: no frames read from '{args.video}'.")
+        return
+    source = "recorded detections"
+    if reference is None:
+        reference = yunet_reference(frames, args.models_dir)
+        source = "YuNet at full resolution"
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, {sum(map(len, reference))} reference faces "
+          f"({source}), detection width {args.width}")
+    print(f"{'config':<20} {'ms/frame':>9} {'p95 ms':>8} {'fps':>7} {'recall':>7} {'extra/frame':>12} {'yunet runs':>11}")
+    results = []
+    for config in args.configs:
+        r = run_config(config, frames, reference, args.models_dir, args.width, args.iou, args.haar_cascade)
+        if r is None:
+            continue
+        results.append(r)
+        gated = f"{r['yunet_frames']:.0%}" if 'yunet_frames' in r else '-'
+        print(f"{r['config']:<20} {r['ms_mean']:>9.2f} {r['ms_p95']:>8.2f} {r['fps']:>7.1f} {r['recall']:>7.1%} "
+              f"{r['extra_per_frame']:>12.2f} {gated:>11}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'video': args.video, 'frames': len(frames), 'reference': source, 'width': args.width,
+                       'iou': args.iou, 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
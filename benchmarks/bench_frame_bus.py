@@ -0,0 +1,109 @@
+# --- Frame Bus Benchmark ---
+# Measures publish-to-read latency and the CPU cost per reader of the shared-memory frame bus
+# at a given resolution and frame rate (default 1080p30).
+#
+#   python benchmarks/bench_frame_bus.py
+#   python benchmarks/bench_frame_bus.py --readers 1 2 4 --seconds 10 --zero-copy --json results.json
+
+import os  # Import os to make the src folder importable.
+import sys  # Import sys to extend the import path.
+import json  # Import json to save the results.
+import time  # Import time for pacing and timing.
+import argparse  # Import argparse to parse command-line arguments.
+import multiprocessing as mp  # Import multiprocessing to run readers in separate processes.
+import numpy as np  # Import numpy for the synthetic frames and percentiles.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from frame_bus import FrameBus  # noqa: E402
+
+
+def reader(name, copy, results):  # Runs in every reader process.
+    """Reads every frame it can until the publisher closes the bus and reports latency and CPU time."""
+    bus = FrameBus(name)
+    latencies, last_seq, received, dropped = [], -1, 0, 0
+    out = np.empty(bus.shape, dtype=np.uint8)
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    while True:
+        result = bus.wait(last_seq, timeout=2.0, copy=copy, out=out)
+        if result is None:
+            break
+        seq, frame, _, timestamp = result
+        latencies.append(time.perf_counter() - timestamp)  # perf_counter is system-wide on Linux and Windows.
+        if last_seq >= 0:
+            dropped += seq - last_seq - 1
+        last_seq = seq
+        received += 1
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    bus.close()
+    lat = np.array(latencies) * 1e6
+    results.put({'received': received, 'dropped': dropped, 'cpu_percent': 100.0 * cpu / wall,
+                 'latency_us': {'p50': float(np.percentile(lat, 50)), 'p95': float(np.percentile(lat, 95)),
+                                'p99': float(np.percentile(lat, 99)), 'max': float(lat.max())} if lat.size else None})
+
+
+def run(width, height, fps, seconds, readers, copy):  # One configuration.
+    """Publishes synthetic frames at `fps` for `seconds` to `readers` reader processes."""
+    name = f"bench_bus_{os.getpid()}"
+    frames = [np.random.default_rng(i).integers(0, 255, (height, width, 3), dtype=np.uint8) for i in range(3)]
+    bus = FrameBus(name, shape=frames[0].shape, create=True)
+    results = mp.Queue()
+    procs = [mp.Process(target=reader, args=(name, copy, results)) for _ in range(readers)]
+    for p in procs:
+        p.start()
+    time.sleep(1.0)  # Let the readers attach.
+
+    period = 1.0 / fps
+    publish_times = []
+    cpu_start, start = time.process_time(), time.perf_counter()
+    count = int(seconds * fps)
+    for i in range(count):
+        target = start + i * period
+        while time.perf_counter() < target:  # Pace like a camera.
+            time.sleep(max(0.0, min(0.001, target - time.perf_counter())))
+        t0 = time.perf_counter()
+        bus.publish(frames[i % len(frames)])
+        publish_times.append(time.perf_counter() - t0)
+    wall = time.perf_counter() - start
+    publisher_cpu = 100.0 * (time.process_time() - cpu_start) / wall
+    bus.close()  # Readers see the closed flag and report.
+
+    reader_results = [results.get(timeout=30) for _ in procs]
+    for p in procs:
+        p.join()
+    pub = np.array(publish_times) * 1e6
+    return {
+        'resolution': f"{width}x{height}", 'fps': fps, 'frames': count, 'readers': readers,
+        'mode': 'copy' if copy else 'zero-copy',
+        'publish_us': {'p50': float(np.percentile(pub, 50)), 'p95': float(np.percentile(pub, 95))},
+        'publisher_cpu_percent': publisher_cpu,
+        'reader_cpu_percent': float(np.mean([r['cpu_percent'] for r in reader_results])),
+        'latency_us_p50': float(np.median([r['latency_us']['p50'] for r in reader_results])),
+        'latency_us_p95': float(np.max([r['latency_us']['p95'] for r in reader_results])),
+        'latency_us_max': float(np.max([r['latency_us']['max'] for r in reader_results])),
+        'dropped': int(sum(r['dropped'] for r in reader_results)),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the shared-memory frame bus.")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--readers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--zero-copy', action='store_true', help="Readers use views instead of private copies.")
+    parser.add_argument('--json', help="Save the results to this file.")
+    args = parser.parse_args()
+
+    rows = []
+    print(f"{'readers':>7} {'mode':>9} {'publish p50':>11} {'lat p50':>8} {'lat p95':>8} {'lat max':>8} "
+          f"{'CPU/reader':>10} {'pub CPU':>7} {'dropped':>7}")
+    for n in args.readers:
+        r = run(args.width, args.height, args.fps, args.seconds, n, copy=not args.zero_copy)
+        rows.append(r)
+        print(f"{n:>7} {r['mode']:>9} {r['publish_us']['p50']:>9.0f}us {r['latency_us_p50']:>6.0f}us "
+              f"{r['latency_us_p95']:>6.0f}us {r['latency_us_max']:>6.0f}us {r['reader_cpu_percent']:>9.1f}% "
+              f"{r['publisher_cpu_percent']:>6.1f}% {r['dropped']:>7}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
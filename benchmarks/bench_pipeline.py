@@ -0,0 +1,261 @@
+# --- Recognition Pipeline Benchmark ---
+# Drives the recognition core (recognition_core.RecognitionPipeline) from a recorded clip or a still
+# image instead of a camera, with no window and no alerts, and reports throughput, per-frame latency
+# percentiles, the time per stage and peak memory over a matrix of gallery sizes, faces per frame
+# and detection widths. Every configuration runs in a fresh process, so peak memory is its own.
+#
+# Faces per frame are produced by cropping the source to its face and tiling it into a grid on a
+# 1920x1080 canvas. The gallery is padded with random unit vectors to the requested size (the real
+# gallery, if any, is included, so real faces are still recognized).
+#
+#   python benchmarks/bench_pipeline.py --video clip.avi
+#   python benchmarks/bench_pipeline.py --image data/train/alice/0.jpg --gallery-sizes 100 100000 --faces 1 32 --json after.json
+#   python benchmarks/bench_pipeline.py --video clip.avi --json after.json --baseline before.json
+
+import os  # Import os to make the src folder importable.
+import sys  # Import sys to extend the import path.
+import json  # Import json to save the results.
+import time  # Import time for timing.
+import math  # Import math to size the face grid.
+import platform  # Import platform to record the machine in the results.
+import argparse  # Import argparse to parse command-line arguments.
+import queue  # Import queue for the timeout of the result queue.
+import multiprocessing as mp  # Import multiprocessing to run each configuration in its own process.
+import cv2  # Import OpenCV for the models and to build the frames.
+import numpy as np  # Import numpy for the synthetic gallery and percentiles.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from gallery import load_gallery, gallery_from_arrays  # noqa: E402
+from metrics import Metrics  # noqa: E402
+from recognition_core import RecognitionPipeline  # noqa: E402
+from session_record import SessionReader, SESSION_EXT  # noqa: E402
+
+CANVAS = (1920, 1080)  # Size of the benchmark frames.
+SOURCE_FPS = 30.0  # Frame timestamps advance at this rate, so alert timing is the same on every run.
+ROWS_PER_PERSON = 10  # Synthetic gallery rows per synthetic person.
+MODEL_FILES = ('face_detection_yunet_2023mar.onnx', 'face_recognition_sface_2021dec.onnx')  # Needed in --models.
+RESULT_TIMEOUT = 3600  # Seconds one configuration may take.
+
+
+def peak_rss_mb():  # Peak resident memory of this process.
+    """Returns the peak working set (Windows) or maximum resident set size (elsewhere) in MB."""
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + \
+                       [(n, ctypes.c_size_t) for n in ('PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage',
+                                                       'QuotaPagedPoolUsage', 'QuotaPeakNonPagedPoolUsage',
+                                                       'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(),
+                                                 ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / 2 ** 20
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10  # Bytes on macOS, KB on Linux.
+
+
+def load_source(video, image, max_frames):  # Frames to tile.
+    """Returns a list of BGR source frames from a video file, a recorded session or a single image."""
+    if video and video.lower().endswith(SESSION_EXT):
+        reader = SessionReader(video)
+        frames = [frame for _, (_, frame, _) in zip(range(max_frames), reader)]
+        reader.close()
+        return frames
+    if video:
+        cap = cv2.VideoCapture(video)
+        frames = []
+        while len(frames) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        return frames
+    frame = cv2.imread(image)
+    return [frame] if frame is not None else []
+
+
+def crop_to_face(frames, face_detector):  # Make the tiles mostly face.
+    """Crops every frame to the region around the largest face of the first frame (unchanged if none is found)."""
+    h, w = frames[0].shape[:2]
+    face_detector.setInputSize((w, h))
+    _, faces = face_detector.detect(frames[0])
+    if faces is None:
+        return frames
+    x, y, bw, bh = max(faces, key=lambda f: f[2] * f[3])[:4]
+    cx, cy, half = x + bw / 2, y + bh / 2, max(bw, bh)  # A square twice the size of the face.
+    x1, y1 = int(max(0, cx - half)), int(max(0, cy - half))
+    x2, y2 = int(min(w, cx + half)), int(min(h, cy + half))
+    return [f[y1:y2, x1:x2] for f in frames]
+
+
+def tile(frame, faces):  # One benchmark frame.
+    """Places `faces` copies of `frame` in a grid on a CANVAS-sized black frame."""
+    cols = math.ceil(math.sqrt(faces))
+    rows = math.ceil(faces / cols)
+    cell_w, cell_h = CANVAS[0] // cols, CANVAS[1] // rows
+    h, w = frame.shape[:2]
+    s = min(cell_w / w, cell_h / h)
+    small = cv2.resize(frame, (max(1, int(w * s)), max(1, int(h * s))), interpolation=cv2.INTER_AREA)
+    canvas = np.zeros((CANVAS[1], CANVAS[0], 3), dtype=np.uint8)
+    for i in range(faces):
+        y, x = (i // cols) * cell_h, (i % cols) * cell_w
+        canvas[y:y + small.shape[0], x:x + small.shape[1]] = small
+    return canvas
+
+
+def build_gallery(size, base_path, seed=0):  # Real gallery padded with random rows.
+    """Returns a Gallery of `size` rows: the rows of `base_path` (if it exists) plus random unit vectors."""
+    embeddings, names = np.zeros((0, 128), dtype=np.float32), []
+    if base_path and os.path.exists(base_path):
+        base = load_gallery(base_path)
+        labels = base.labels()
+        embeddings = base.embeddings()[:size]
+        names = [base.names[i] for i in labels[:size]]
+    pad = size - len(names)
+    if pad > 0:
+        random_rows = np.random.default_rng(seed).standard_normal((pad, embeddings.shape[1]), dtype=np.float32)
+        embeddings = np.vstack([embeddings, random_rows])
+        names += [f"synthetic_{i // ROWS_PER_PERSON:06d}" for i in range(pad)]
+    return gallery_from_arrays(embeddings, names)
+
+
+def run_config(config, results):  # Runs in a fresh process.
+    """Benchmarks one (gallery size, faces per frame, detection width) configuration."""
+    face_detector = cv2.FaceDetectorYN.create(os.path.join(config['models'], MODEL_FILES[0]), "", (0, 0))
+    face_recognizer = cv2.FaceRecognizerSF.create(os.path.join(config['models'], MODEL_FILES[1]), "")
+    gallery = build_gallery(config['gallery_size'], config['gallery'])
+    source = crop_to_face(load_source(config['video'], config['image'], config['source_frames']), face_detector)
+    frames = [tile(f, config['faces']) for f in source]
+    metrics = Metrics()  # In memory only; used for the per-stage breakdown.
+    pipeline = RecognitionPipeline(face_detector, face_recognizer, gallery, confidence_threshold=config['threshold'],
+                                   metrics=metrics, detection_width=config['width'])  # No RL tracker, no events.
+
+    total = config['warmup'] + config['frames']
+    latencies, detected, known = [], 0, 0
+    for i in range(total):
+        if i == config['warmup']:  # Warm-up frames are not measured.
+            cpu_start, wall_start = time.process_time(), time.perf_counter()
+            metrics = pipeline.metrics = Metrics()
+        t0 = time.perf_counter()
+        out = pipeline.process_frame(frames[i % len(frames)], now=i / SOURCE_FPS, frame_id=i + 1)
+        if i >= config['warmup']:
+            latencies.append(time.perf_counter() - t0)
+            detected += len(out)
+            known += sum(r['name'] != "Unknown" for r in out)
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    lat = np.array(latencies) * 1000.0
+    stages = metrics.summary()['stages_ms']
+    results.put({
+        'gallery_size': config['gallery_size'], 'faces': config['faces'], 'width': config['width'],
+        'frames': config['frames'], 'fps': config['frames'] / wall, 'cpu_percent': 100.0 * cpu / wall,
+        'latency_ms': {'p50': float(np.percentile(lat, 50)), 'p95': float(np.percentile(lat, 95)),
+                       'p99': float(np.percentile(lat, 99)), 'max': float(lat.max())},
+        'stages_ms_p50': {k: v['p50'] for k, v in stages.items()},
+        'detected_per_frame': detected / config['frames'], 'known_per_frame': known / config['frames'],
+        'gallery_mb': gallery.count * gallery.dim * 4 / 2 ** 20, 'peak_rss_mb': peak_rss_mb(),
+    })
+
+
+def run(config):  # One configuration in a fresh process.
+    return run_in_process(run_config, config)
+
+
+def run_in_process(target, config):  # Also used by the other benchmarks.
+    """Runs target(config, results) in a fresh process and returns what it puts on `results`, or None
+    (with the reason printed) if the process died first."""
+    ctx = mp.get_context('spawn')  # The same start method on every platform.
+    results = ctx.Queue()
+    p = ctx.Process(target=target, args=(config, results))
+    p.start()
+    try:
+        waited = 0
+        while waited < RESULT_TIMEOUT:
+            try:
+                return results.get(timeout=1)
+            except queue.Empty:
+                waited += 1
+                if not p.is_alive():  # Crashed (e.g. a model failed to load) without a result.
+                    p.join()
+                    print(f"Error: The benchmark process exited with code {p.exitcode} without a result.")
+                    return None
+        print(f"Error: No result after {RESULT_TIMEOUT} s.")
+        p.terminate()
+        return None
+    finally:
+        p.join()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the recognition pipeline on recorded or synthetic frames.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--video', help="Video file or recorded .frec session to take frames from.")
+    source.add_argument('--image', help="Still image with a face (default: the first photo in data/train).")
+    parser.add_argument('--models', default='models', help="Folder with the YuNet and SFace models. Default is models.")
+    parser.add_argument('--gallery', default='models/gallery.json', help="Real gallery included in every gallery size.")
+    parser.add_argument('--gallery-sizes', type=int, nargs='+', default=[100, 1000, 10000, 100000])
+    parser.add_argument('--faces', type=int, nargs='+', default=[1, 4, 16, 32], help="Faces per frame.")
+    parser.add_argument('--widths', type=int, nargs='+', default=[320, 640], help="Detection widths.")
+    parser.add_argument('--frames', type=int, default=100, help="Measured frames per configuration.")
+    parser.add_argument('--warmup', type=int, default=10, help="Unmeasured frames per configuration.")
+    parser.add_argument('--source-frames', type=int, default=300, help="Frames read from --video.")
+    parser.add_argument('--threshold', type=float, default=0.8, help="Recognition threshold.")
+    parser.add_argument('--json', help="Save the results to this file.")
+    parser.add_argument('--baseline', help="Results of an earlier run to compare throughput with.")
+    args = parser.parse_args()
+
+    image = args.image
+    if not args.video and not image:  # Default source: the first training photo.
+        for root, _, files in sorted(os.walk('data/train')):
+            photos = sorted(f for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+            if photos:
+                image = os.path.join(root, photos[0])
+                break
+    if not args.video and not image:
+        print("Error: No source frames. Use --video or --image.")
+        sys.exit(1)
+    if not load_source(args.video, image, 1):
+        print(f"Error: Could not read '{args.video or image}'.")
+        sys.exit(1)
+    for model in MODEL_FILES:  # Checked once here; a missing model would otherwise fail every configuration.
+        if not os.path.exists(os.path.join(args.models, model)):
+            print(f"Error: Model not found at '{os.path.join(args.models, model)}'.")
+            sys.exit(1)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = {(r['gallery_size'], r['faces'], r['width']): r for r in json.load(f)['results']}
+
+    rows = []
+    print(f"{'gallery':>8} {'faces':>5} {'width':>5} {'fps':>7} {'p50':>8} {'p95':>8} {'p99':>8} "
+          f"{'detected':>8} {'peak RSS':>9}" + (f" {'vs base':>8}" if baseline else ""))
+    for gallery_size in args.gallery_sizes:
+        for faces in args.faces:
+            for width in args.widths:
+                r = run({'models': args.models, 'gallery': args.gallery, 'video': args.video, 'image': image,
+                         'source_frames': args.source_frames, 'gallery_size': gallery_size, 'faces': faces,
+                         'width': width, 'frames': args.frames, 'warmup': args.warmup, 'threshold': args.threshold})
+                if r is None:  # The reason has been printed; measure the other configurations.
+                    continue
+                rows.append(r)
+                line = (f"{gallery_size:>8} {faces:>5} {width:>5} {r['fps']:>7.1f} {r['latency_ms']['p50']:>6.1f}ms "
+                        f"{r['latency_ms']['p95']:>6.1f}ms {r['latency_ms']['p99']:>6.1f}ms "
+                        f"{r['detected_per_frame']:>8.1f} {r['peak_rss_mb']:>7.0f}MB")
+                base = baseline.get((gallery_size, faces, width))
+                if base:
+                    line += f" {r['fps'] / base['fps'] - 1.0:>+7.1%}"
+                print(line)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                       'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                                       'processor': platform.processor(), 'cpus': os.cpu_count(),
+                                       'opencv': cv2.__version__, 'numpy': np.__version__},
+                       'source': args.video or image, 'results': rows}, f, indent=2)
+        print(f"Results saved to '{args.json}'")
@@ -0,0 +1,147 @@
+# --- Recognition Service Load Test ---
+# Sends the same photo to the recognition service (src/recognition_service.py) from many concurrent
+# keep-alive clients and reports requests per second, latency percentiles and the mean batch size
+# the service formed, for each concurrency level.
+#
+#   python src/recognition_service.py --workers 4 &
+#   python benchmarks/bench_service.py --image data/train/alice/0.jpg --concurrency 1 4 16 64
+#   python benchmarks/bench_service.py --spawn --workers 4 --max-batch 1 --json no_batching.json
+
+import os  # Import os to find the service script.
+import sys  # Import sys to start the service with this interpreter.
+import json  # Import json for the requests and the results.
+import time  # Import time for timing.
+import argparse  # Import argparse to parse command-line arguments.
+import threading  # Import threading for the concurrent clients.
+import subprocess  # Import subprocess to start the service with --spawn.
+import http.client  # Import http.client for keep-alive connections.
+from urllib.parse import urlparse  # Import urlparse to split the service URL.
+import numpy as np  # Import numpy for the percentiles.
+
+SERVICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'recognition_service.py')
+
+
+def get_json(host, port, path, timeout=5.0):  # One GET request.
+    conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request('GET', path)
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def wait_for_service(host, port, timeout=120.0):  # Until /health answers.
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            return get_json(host, port, '/health')
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError(f"service on {host}:{port} did not start within {timeout:.0f}s")
+
+
+def client(host, port, body, content_type, stop_at, latencies, errors):  # One client thread.
+    """POSTs `body` to /identify over one keep-alive connection until `stop_at`."""
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    while time.perf_counter() < stop_at:
+        t0 = time.perf_counter()
+        try:
+            conn.request('POST', '/identify', body, {'Content-Type': content_type})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+            continue
+        latencies.append(time.perf_counter() - t0)
+    conn.close()
+
+
+def run_level(host, port, body, content_type, concurrency, seconds):  # One concurrency level.
+    """Runs `concurrency` clients for `seconds` and returns the throughput and latency summary."""
+    before = get_json(host, port, '/health')
+    latencies, errors = [], []  # list.append is thread-safe.
+    stop_at = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client, args=(host, port, body, content_type, stop_at, latencies, errors))
+               for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    after = get_json(host, port, '/health')
+    batches = after['batches'] - before['batches']
+    ms = np.array(latencies) * 1000.0 if latencies else np.zeros(1)
+    return {'concurrency': concurrency, 'requests': len(latencies), 'errors': len(errors),
+            'rps': len(latencies) / elapsed, 'p50_ms': float(np.percentile(ms, 50)),
+            'p95_ms': float(np.percentile(ms, 95)), 'p99_ms': float(np.percentile(ms, 99)),
+            'mean_batch': (after['images'] - before['images']) / batches if batches else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the recognition service.")
+    parser.add_argument('--url', default='http://127.0.0.1:8765', help="Service URL. Default is http://127.0.0.1:8765.")
+    parser.add_argument('--image', default=None, help="Photo to send (default: the first photo in data/train).")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64], help="Concurrent clients per level.")
+    parser.add_argument('--seconds', type=float, default=10.0, help="Duration of each level. Default is 10.")
+    parser.add_argument('--spawn', action='store_true', help="Start the service for the test and stop it afterwards.")
+    parser.add_argument('--workers', type=int, default=0, help="Service workers with --spawn (0 = all cores).")
+    parser.add_argument('--max-batch', type=int, default=None, help="Service --max-batch with --spawn.")
+    parser.add_argument('--max-wait-ms', type=float, default=None, help="Service --max-wait-ms with --spawn.")
+    parser.add_argument('--gallery', default='models/gallery.json', help="Gallery with --spawn. Default is models/gallery.json.")
+    parser.add_argument('--json', default=None, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    image = args.image
+    if image is None:  # First photo of the training set.
+        for root, dirs, files in sorted(os.walk('data/train')):
+            photos = sorted(f for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png')))
+            if photos:
+                image = os.path.join(root, photos[0])
+                break
+    if image is None or not os.path.exists(image):
+        print("Error: no photo to send (use --image).")
+        return
+    with open(image, 'rb') as f:
+        body = f.read()
+    content_type = 'image/png' if image.lower().endswith('.png') else 'image/jpeg'
+
+    url = urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+    service = None
+    if args.spawn:
+        command = [sys.executable, SERVICE, '--host', host, '--port', str(port), '--workers', str(args.workers),
+                   '--gallery', args.gallery]
+        if args.max_batch is not None:
+            command += ['--max-batch', str(args.max_batch)]
+        if args.max_wait_ms is not None:
+            command += ['--max-wait-ms', str(args.max_wait_ms)]
+        service = subprocess.Popen(command)
+    try:
+        health = wait_for_service(host, port)
+        print(f"Service: {args.url} ({health['workers']} workers), photo: {image}")
+        run_level(host, port, body, content_type, 1, min(2.0, args.seconds))  # Warm-up: first inference is slow.
+        print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'batch':>6} {'errors':>7}")
+        results = []
+        for concurrency in args.concurrency:
+            r = run_level(host, port, body, content_type, concurrency, args.seconds)
+            results.append(r)
+            print(f"{r['concurrency']:>8} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                  f"{r['mean_batch']:>6.2f} {r['errors']:>7}")
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'url': args.url, 'image': image, 'seconds': args.seconds, 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
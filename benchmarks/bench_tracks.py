@@ -0,0 +1,125 @@
+# --- Tracker State Benchmark ---
+# Times the per-frame tracker bookkeeping of the recognition pipeline (association of detections to
+# tracks, time-to-live countdown and expiry) with many faces in view, for the struct-of-arrays
+# TrackTable (src/track_table.py) and for the dict-per-track loop it replaced. Faces sit on a grid
+# and drift a few pixels per frame; every frame a share of them is hidden (occlusions) so tracks
+# expire and new ones start. No models are needed.
+#
+#   python benchmarks/bench_tracks.py
+#   python benchmarks/bench_tracks.py --tracks 10 100 400 --frames 2000 --json tracks.json
+
+import os  # Import os to make the src folder importable.
+import sys  # Import sys to extend the import path.
+import json  # Import json to save the results.
+import time  # Import time for timing.
+import argparse  # Import argparse to parse command-line arguments.
+from collections import deque  # Import deque for the reference implementation.
+import numpy as np  # Import numpy for the synthetic faces.
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from recognition_core import get_iou  # noqa: E402
+from track_table import TrackTable, TRACKER_TTL, PREDICTION_HISTORY_SIZE, MATCH_IOU  # noqa: E402
+
+FACE_SIZE = 40  # Box side in pixels at the detection width.
+
+
+class DictTracks:  # The tracker state before TrackTable: one dict per track.
+    def __init__(self):
+        self.tracks = {}
+        self.next_track_id = 0
+
+    def step(self, boxes, now):  # Association, TTL countdown and expiry as in the old process_frame().
+        boxes = [list(map(int, b)) for b in boxes]  # The old loop built its boxes from Python ints.
+        matched_track_ids = set()
+        for current_box in boxes:
+            best_iou, best_track_id = 0, None
+            for track_id, track_data in self.tracks.items():
+                iou = get_iou(current_box, track_data['box'])
+                if iou > best_iou:
+                    best_iou, best_track_id = iou, track_id
+            if best_iou > MATCH_IOU and best_track_id not in matched_track_ids:
+                track = self.tracks[best_track_id]
+                matched_track_ids.add(best_track_id)
+            else:
+                track = {'id': self.next_track_id, 'predictions': deque(maxlen=PREDICTION_HISTORY_SIZE),
+                         'confirmed_name': "Unknown", 'confirmation_streak': 0, 'first_seen': now,
+                         'alert_sent': False, 'log_and_audio_triggered': False}
+                self.tracks[self.next_track_id] = track
+                matched_track_ids.add(self.next_track_id)
+                self.next_track_id += 1
+            track['box'] = list(current_box)
+            track['ttl'] = TRACKER_TTL
+        dead_tracks = []
+        for track_id, track in self.tracks.items():
+            if track_id not in matched_track_ids:
+                track['ttl'] -= 1
+            if track['ttl'] <= 0:
+                dead_tracks.append(track_id)
+        for track_id in dead_tracks:
+            del self.tracks[track_id]
+        return len(self.tracks)
+
+
+class TableTracks:  # The same steps on a TrackTable.
+    def __init__(self):
+        self.table = TrackTable()
+
+    def step(self, boxes, now):
+        slots = self.table.associate(boxes)
+        for i in np.flatnonzero(slots < 0):
+            slots[i] = self.table.new(now)
+        for slot, box in zip(slots, boxes):
+            self.table.touch(slot, box)
+        self.table.age(slots, now)
+        return len(self.table)
+
+
+def make_frames(tracks, frames, hidden, seed=0):  # Synthetic detections.
+    """Returns a list of (N, 4) x1, y1, x2, y2 boxes: `tracks` drifting faces, `hidden` of them missing per frame."""
+    rng = np.random.default_rng(seed)
+    cols = int(np.ceil(np.sqrt(tracks)))
+    grid = np.array([((i % cols) * FACE_SIZE * 2.0, (i // cols) * FACE_SIZE * 2.0) for i in range(tracks)])
+    out = []
+    for _ in range(frames):
+        grid += rng.uniform(-2, 2, grid.shape)
+        visible = rng.random(tracks) >= hidden
+        xy = grid[visible]
+        out.append(np.hstack([xy, xy + FACE_SIZE]).astype(np.float32))
+    return out
+
+
+def run(impl, frames):  # Time one implementation.
+    tracker = impl()
+    times, live = [], 0
+    for i, boxes in enumerate(frames):
+        t0 = time.perf_counter()
+        live = tracker.step(boxes, i / 30.0)
+        times.append(time.perf_counter() - t0)
+    ms = np.array(times) * 1000.0
+    return {'ms_mean': float(ms.mean()), 'ms_p95': float(np.percentile(ms, 95)), 'tracks_at_end': live}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time tracker association and expiry with many faces in view.")
+    parser.add_argument('--tracks', type=int, nargs='+', default=[10, 100], help="Faces in view. Default is 10 100.")
+    parser.add_argument('--frames', type=int, default=1000, help="Frames per run. Default is 1000.")
+    parser.add_argument('--hidden', type=float, default=0.05, help="Share of faces missing in each frame. Default is 0.05.")
+    parser.add_argument('--json', default=None, help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    print(f"{'tracks':>6} {'implementation':<16} {'ms/frame':>9} {'p95 ms':>8} {'tracks at end':>14}")
+    results = []
+    for n in args.tracks:
+        frames = make_frames(n, args.frames, args.hidden)
+        for label, impl in (('dict per track', DictTracks), ('TrackTable', TableTracks)):
+            r = dict(run(impl, frames), tracks=n, implementation=label)
+            results.append(r)
+            print(f"{n:>6} {label:<16} {r['ms_mean']:>9.3f} {r['ms_p95']:>8.3f} {r['tracks_at_end']:>14}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'frames': args.frames, 'hidden': args.hidden, 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,21 +2,24 @@ import cv2  # Import OpenCV for camera access and image processing.
 import os  # Import os to create directories.
 import time  # Import time to create unique filenames.
 import argparse  # Import argparse to handle command-line arguments.
+import sys  # Import sys to make the src folder importable.
 
-def collect_training_data(person_name, num_images=30, output_dir='data/train'):  # Main function for data collection.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))  # This script lives outside src/.
+from face_detectors import create_detector, add_detector_arguments, detector_options  # noqa: E402  Import the detector backends.
+
+def collect_training_data(person_name, num_images=30, output_dir='data/train', detector=None):  # Main function for data collection.
     """A helper utility to collect face images for training."""
     # --- Argument Explanations ---
     # person_name (str): The name of the person for whom data is being collected.
     # num_images (int): The target number of images to collect.
     # output_dir (str): The root directory where training data will be saved.
+    # detector (dict): Face detector options for face_detectors.create_detector(). None uses YuNet.
     
     # --- Setup ---
-    # Load the face detector model.
-    detector_path = 'models/face_detection_yunet_2023mar.onnx'  # Path to the pre-trained face detector model.
-    if not os.path.exists(detector_path):  # Check if the model file exists.
-        print(f"Error: Face detector model not found at '{detector_path}'")  # Print an error if not found.
+    # Load the face detector (YuNet by default, or a Haar cascade backend; see src/face_detectors.py).
+    face_detector = create_detector(models_dir='models', **(detector or {}))  # Create the face detector object.
+    if face_detector is None:  # A model is missing (the reason has been printed).
         return  # Exit the function.
-    face_detector = cv2.FaceDetectorYN.create(detector_path, "", (0, 0))  # Create the face detector object.
 
     # Create the directory for the person's images if it doesn't already exist.
     person_dir = os.path.join(output_dir, person_name)  # Construct the full path to the person's folder.
@@ -88,6 +91,7 @@ if __name__ == '__main__':  # This block runs only when this script is executed
     parser = argparse.ArgumentParser(description="Collect face images for training.")  # Create a command-line argument parser.
     parser.add_argument('name', type=str, help="The name of the person (use quotes for names with spaces, e.g., 'John Doe').")  # Add an argument for the person's name.
     parser.add_argument('--count', type=int, default=30, help="Target number of images to collect.")  # Add an optional argument for the number of images.
+    add_detector_arguments(parser)  # --detector and the Haar cascade settings.
     
     args = parser.parse_args()  # Parse the arguments provided by the user.
-    collect_training_data(person_name=args.name, num_images=args.count)  # Call the main function with the parsed arguments.
\ No newline at end of file
+    collect_training_data(person_name=args.name, num_images=args.count, detector=detector_options(args))  # Call the main function with the parsed arguments.
\ No newline at end of file
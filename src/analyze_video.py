@@ -0,0 +1,319 @@
+# --- Import Necessary Libraries ---
+import cv2  # Import OpenCV to read the video files and run the models.
+import os  # Import os to check paths and count cores.
+import csv  # Import csv for the CSV timeline.
+import time  # Import time to report the processing speed.
+import sqlite3  # Import sqlite3 for the SQLite timeline.
+import argparse  # Import argparse to parse command-line arguments when running the script directly.
+from datetime import datetime  # Import datetime to turn frame times into wall-clock times.
+from multiprocessing import Pool  # Import Pool to analyze chunks in parallel worker processes.
+from gallery import load_gallery  # Import the gallery loader.
+from recognition_core import RecognitionPipeline, NullEvents, get_iou, DETECTION_WIDTH, UNKNOWN_ALERT_DURATION  # The live per-frame core.
+from session_record import SessionReader, SESSION_EXT  # Import the reader for recorded sessions.
+
+# --- Offline Video Analysis ---
+# Answers "who was in the room between 2 and 4?" from recorded footage. Each video is cut into
+# chunks that are analyzed in parallel worker processes by the same pipeline as the live system,
+# as fast as the CPU allows and without windows or alerts. Every chunk also processes OVERLAP
+# seconds before its start, so its trackers are already running (and confirmed) when the chunk
+# begins; tracks that cross a chunk boundary are then stitched back together by their position at
+# the boundary frame. The result is a timeline of presences and events in CSV or SQLite.
+CHUNK_SECONDS = 120.0  # Length of the piece of video one worker task analyzes.
+OVERLAP_SECONDS = UNKNOWN_ALERT_DURATION + 1.0  # Warm-up before each chunk; long enough for an unknown alert.
+STITCH_IOU = 0.5  # Minimum box overlap at the boundary frame to join two pieces of a track.
+TIMELINE_FIELDS = ['video', 'event', 'track', 'name', 'start', 'end', 'start_frame', 'end_frame', 'duration', 'score']
+
+_worker = None  # (pipeline settings, detector, recognizer, gallery), created once per worker process.
+
+
+class TimelineEvents(NullEvents):  # Collects the pipeline's events instead of acting on them.
+    def __init__(self):  # The constructor method.
+        self.frame_index = 0  # Set by the chunk loop before every frame.
+        self.events = []
+
+    def known_person(self, name, track, frame, now):
+        self.events.append(('KNOWN_PERSON_ENTRY', track['id'], name, self.frame_index, now))
+
+    def unknown_alert(self, track, frame, now, repeat):
+        if not repeat:  # A recently alerted face is not a new event.
+            self.events.append(('UNKNOWN_PERSON_ALERT', track['id'], "Unknown", self.frame_index, now))
+
+
+def video_info(path):  # Frame count, frame rate and start time.
+    """Returns (frames, fps, start_time) of a video file or `.frec` session.
+
+    A session knows its start time. For other files the start is taken as the file's modification
+    time minus its duration (cameras finish writing a file when the recording ends).
+    """
+    if path.lower().endswith(SESSION_EXT):
+        reader = SessionReader(path)
+        times = []
+        while True:
+            record = reader.read(decode=False)
+            if record is None:
+                break
+            times.append(record[0])
+        reader.close()
+        fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 30.0
+        return len(times), fps, times[0] if times else 0.0
+    cap = cv2.VideoCapture(path)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    return frames, fps, os.path.getmtime(path) - frames / fps
+
+
+def read_frames(path, first, last, fps, start_time):  # Frames of one chunk.
+    """Yields (index, timestamp, frame) for frames first..last-1 of a video file or session."""
+    if path.lower().endswith(SESSION_EXT):
+        reader = SessionReader(path)
+        index = 0
+        while index < last:
+            record = reader.read(decode=index >= first)  # Frames before the chunk are skipped undecoded.
+            if record is None:
+                break
+            if index >= first:
+                yield index, record[0], record[1]
+            index += 1
+        reader.close()
+        return
+    cap = cv2.VideoCapture(path)
+    if first:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    index = int(cap.get(cv2.CAP_PROP_POS_FRAMES))  # Some codecs can only seek to a keyframe.
+    while index < last:
+        if index < first:  # Decode forward to the exact frame.
+            if not cap.grab():
+                break
+            index += 1
+            continue
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield index, start_time + index / fps, frame
+        index += 1
+    cap.release()
+
+
+def _init_worker(models_dir, gallery_path, threshold, detection_width):  # Runs once in every worker process.
+    """Loads the models and the (memory-mapped, shared) gallery for this worker."""
+    global _worker
+    cv2.setNumThreads(1)  # Parallelism comes from the processes, not from OpenCV's internal threads.
+    _worker = (threshold, detection_width,
+               cv2.FaceDetectorYN.create(os.path.join(models_dir, 'face_detection_yunet_2023mar.onnx'), "", (0, 0)),
+               cv2.FaceRecognizerSF.create(os.path.join(models_dir, 'face_recognition_sface_2021dec.onnx'), ""),
+               load_gallery(gallery_path))
+
+
+def _analyze_chunk(task):  # Runs in a worker process for every chunk.
+    """
+    Analyzes frames [start, end) of one video after warming up on the overlap before `start`.
+
+    Returns:
+        dict: {'video', 'index', 'start', 'end', 'frames', 'tracks'}. Each track has its first/last
+            frame and time (from `start` on), name, best score, frame count, its box on the frame
+            before `start` (if it was already tracked there) and on its last frame, and its events.
+    """
+    video, index, start, end, warmup, fps, start_time, stride = task
+    threshold, detection_width, face_detector, face_recognizer, gallery = _worker
+    events = TimelineEvents()
+    pipeline = RecognitionPipeline(face_detector, face_recognizer, gallery, confidence_threshold=threshold,
+                                   events=events, detection_width=detection_width)  # No RL tracker, no alerts.
+    tracks, processed = {}, 0
+    for frame_index, timestamp, frame in read_frames(video, warmup, end, fps, start_time):
+        if (frame_index - warmup) % stride:
+            continue
+        events.frame_index = frame_index
+        results = pipeline.process_frame(frame, now=timestamp, frame_id=frame_index)
+        processed += 1
+        for r in results:
+            if frame_index < start:  # Warm-up: only remember where the track is on the boundary frame.
+                if frame_index == start - stride:
+                    tracks[r['id']] = {'boundary_box': r['box']}
+                continue
+            t = tracks.setdefault(r['id'], {'boundary_box': None})
+            if 'first_frame' not in t:
+                t.update(first_frame=frame_index, first_time=timestamp, frames=0, score=r['score'], name="Unknown")
+            t.update(last_frame=frame_index, last_time=timestamp, last_box=r['box'])
+            t['frames'] += 1
+            t['score'] = max(t['score'], r['score'])
+            if r['confirmed']:
+                t['name'] = r['name']
+    for event, track_id, name, frame_index, now in events.events:
+        if frame_index >= start and track_id in tracks:  # Events of the warm-up belong to the previous chunk.
+            tracks[track_id].setdefault('events', []).append((event, name, frame_index, now))
+    tracks = {k: t for k, t in tracks.items() if 'first_frame' in t}  # Drop tracks seen only in the warm-up.
+    return {'video': video, 'index': index, 'start': start, 'end': end, 'frames': processed, 'tracks': list(tracks.values())}
+
+
+def stitch_chunks(chunks, stride=1):  # Join tracks across chunk boundaries.
+    """
+    Joins the per-chunk tracks of one video into whole tracks.
+
+    A track that was already running on the frame before its chunk started is joined with the
+    previous chunk's track that ended on that frame at the same position (IoU >= STITCH_IOU).
+    Welcomes and alerts that the earlier piece already produced are not repeated.
+
+    Returns:
+        list: Tracks with first/last frame and time, name, score, frames and events
+    """
+    tracks, open_tracks = [], []  # open_tracks: tracks still running at the end of the previous chunk.
+    for chunk in sorted(chunks, key=lambda c: c['index']):
+        boundary = chunk['start'] - stride  # Last processed frame of the previous chunk.
+        still_open = []
+        for piece in sorted(chunk['tracks'], key=lambda t: t['first_frame']):
+            merged = None
+            if piece['boundary_box'] is not None:
+                best = max(open_tracks, key=lambda t: get_iou(piece['boundary_box'], t['last_box']), default=None)
+                if best is not None and get_iou(piece['boundary_box'], best['last_box']) >= STITCH_IOU:
+                    merged = best
+                    open_tracks.remove(best)
+            if merged is None:
+                merged = dict(piece, events=[])
+                tracks.append(merged)
+                new_events = piece.get('events', [])
+            else:
+                confirmed, alerted = merged['name'] != "Unknown", any(e[0] == 'UNKNOWN_PERSON_ALERT' for e in merged['events'])
+                new_events = [e for e in piece.get('events', [])
+                              if not (e[0] == 'KNOWN_PERSON_ENTRY' and confirmed) and not (e[0] == 'UNKNOWN_PERSON_ALERT' and alerted)]
+                merged.update(last_frame=piece['last_frame'], last_time=piece['last_time'], last_box=piece['last_box'],
+                              frames=merged['frames'] + piece['frames'], score=max(merged['score'], piece['score']))
+                if merged['name'] == "Unknown":
+                    merged['name'] = piece['name']
+            merged['events'].extend(new_events)
+            if piece['last_frame'] >= chunk['end'] - stride:  # Still visible at the end of the chunk.
+                still_open.append(merged)
+        open_tracks = still_open
+    return tracks
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def timeline_rows(video, tracks):  # Tracks to timeline rows.
+    """Returns one PRESENCE row per track and one row per event, ordered by time."""
+    rows = []
+    for track_id, t in enumerate(sorted(tracks, key=lambda t: t['first_time'])):
+        rows.append({'video': video, 'event': 'PRESENCE', 'track': track_id, 'name': t['name'],
+                     'start': _format_time(t['first_time']), 'end': _format_time(t['last_time']),
+                     'start_frame': t['first_frame'], 'end_frame': t['last_frame'],
+                     'duration': round(t['last_time'] - t['first_time'], 2), 'score': round(t['score'], 3)})
+        for event, name, frame_index, now in t['events']:
+            rows.append({'video': video, 'event': event, 'track': track_id, 'name': name,
+                         'start': _format_time(now), 'end': _format_time(now), 'start_frame': frame_index,
+                         'end_frame': frame_index, 'duration': 0.0, 'score': round(t['score'], 3)})
+    rows.sort(key=lambda r: (r['start'], r['track']))
+    return rows
+
+
+def write_timeline(rows, output_path, videos=None):  # CSV or SQLite, by extension.
+    """
+    Writes the timeline rows to a `.csv` file or to the `timeline` table of a `.db`/`.sqlite` file.
+
+    The SQLite table collects several runs: the previous rows of the analyzed `videos` (default: the
+    videos in `rows`) are replaced in the same transaction, so analyzing a video again does not
+    duplicate its timeline.
+    """
+    if output_path.lower().endswith(('.db', '.sqlite', '.sqlite3')):
+        videos = sorted(set(r['video'] for r in rows) if videos is None else set(videos))
+        with sqlite3.connect(output_path) as db:  # One transaction: committed on success, rolled back on error.
+            db.execute("CREATE TABLE IF NOT EXISTS timeline (video TEXT, event TEXT, track INTEGER, name TEXT, start TEXT, "
+                       "end TEXT, start_frame INTEGER, end_frame INTEGER, duration REAL, score REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS timeline_start ON timeline (start)")
+            db.executemany("DELETE FROM timeline WHERE video = ?", [(v,) for v in videos])
+            db.executemany(f"INSERT INTO timeline VALUES ({', '.join('?' * len(TIMELINE_FIELDS))})",
+                           [tuple(r[f] for f in TIMELINE_FIELDS) for r in rows])
+        db.close()
+        return
+    with open(output_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=TIMELINE_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def analyze_videos(video_paths, output_path='data/timeline.csv', gallery_path='models/gallery.json', confidence_threshold=0.8,
+                   workers=0, chunk_seconds=CHUNK_SECONDS, overlap_seconds=OVERLAP_SECONDS, stride=1,
+                   detection_width=DETECTION_WIDTH, start_time=None):  # Main analysis function.
+    """
+    Analyzes recorded videos in parallel and writes an event timeline.
+
+    Args:
+        video_paths (list): Video files or `.frec` sessions
+        output_path (str): `.csv`, or `.db`/`.sqlite` for SQLite
+        gallery_path (str): Gallery manifest (a legacy embeddings.pkl also works)
+        confidence_threshold (float): Recognition threshold
+        workers (int): Worker processes (0 = all cores)
+        chunk_seconds (float): Video length per task
+        overlap_seconds (float): Warm-up processed before each chunk
+        stride (int): Analyze every `stride`-th frame (1 = every frame)
+        detection_width (int): Width frames are resized to before detection
+        start_time (float): Wall-clock time of the first frame (default: from the session or file time)
+
+    Returns:
+        list: The timeline rows
+    """
+    models_dir = os.path.dirname(gallery_path)
+    for path in [gallery_path, os.path.join(models_dir, 'face_detection_yunet_2023mar.onnx'),
+                 os.path.join(models_dir, 'face_recognition_sface_2021dec.onnx')] + list(video_paths):
+        if not os.path.exists(path):
+            print(f"Error: '{path}' not found.")
+            return []
+
+    # --- Cut every video into chunks ---
+    tasks = []
+    for video in video_paths:
+        frames, fps, video_start = video_info(video)
+        video_start = start_time if start_time is not None else video_start
+        chunk_frames = max(stride, int(chunk_seconds * fps) // stride * stride)  # Chunks start on processed frames.
+        overlap_frames = int(overlap_seconds * fps) // stride * stride
+        print(f"{video}: {frames} frames at {fps:.1f} fps ({frames / fps / 60:.1f} min), "
+              f"{-(-frames // chunk_frames)} chunk(s), starting {_format_time(video_start)}")
+        for index, start in enumerate(range(0, frames, chunk_frames)):
+            tasks.append((video, index, start, min(frames, start + chunk_frames), max(0, start - overlap_frames),
+                          fps, video_start, stride))
+
+    # --- Analyze the chunks in parallel ---
+    workers = workers or os.cpu_count() or 1
+    began, done, processed = time.time(), {}, 0
+    with Pool(min(workers, max(1, len(tasks))), initializer=_init_worker,
+              initargs=(models_dir, gallery_path, confidence_threshold, detection_width)) as pool:
+        for result in pool.imap_unordered(_analyze_chunk, tasks):  # Chunks finish in any order.
+            done.setdefault(result['video'], []).append(result)
+            processed += result['frames']
+            elapsed = time.time() - began
+            print(f"  ... {sum(len(v) for v in done.values())}/{len(tasks)} chunks, {processed / elapsed:.0f} frames/s")
+
+    # --- Stitch the chunks and write the timeline ---
+    rows = []
+    for video in video_paths:
+        rows.extend(timeline_rows(video, stitch_chunks(done.get(video, []), stride)))
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    write_timeline(rows, output_path, videos=video_paths)
+    presences = sum(r['event'] == 'PRESENCE' for r in rows)
+    print(f"✓ {presences} presences and {len(rows) - presences} events written to '{output_path}' "
+          f"({processed} frames in {time.time() - began:.1f}s)")
+    return rows
+
+
+if __name__ == '__main__':  # This block runs only when this script is executed directly.
+    parser = argparse.ArgumentParser(description="Analyze recorded videos and write a timeline of who was seen when.")
+    parser.add_argument('videos', nargs='+', help="Video files or .frec sessions.")
+    parser.add_argument('--out', default='data/timeline.csv', help="Timeline file: .csv, or .db/.sqlite for SQLite. Default is data/timeline.csv.")
+    parser.add_argument('--gallery', default='models/gallery.json', help="Gallery manifest. Default is models/gallery.json.")
+    parser.add_argument('--confidence', type=float, default=0.8, help="Recognition threshold (0.0 to 1.0). Default is 0.8.")
+    parser.add_argument('--workers', type=int, default=0, help="Worker processes (0 = all cores).")
+    parser.add_argument('--chunk-seconds', type=float, default=CHUNK_SECONDS, help=f"Video length per task. Default is {CHUNK_SECONDS:g}.")
+    parser.add_argument('--overlap-seconds', type=float, default=OVERLAP_SECONDS,
+                        help=f"Warm-up before each chunk. Default is {OVERLAP_SECONDS:g}.")
+    parser.add_argument('--stride', type=int, default=1, help="Analyze every Nth frame. Default is 1.")
+    parser.add_argument('--width', type=int, default=DETECTION_WIDTH, help=f"Detection width. Default is {DETECTION_WIDTH}.")
+    parser.add_argument('--start', default=None, help="Wall-clock time of the first frame, e.g. '2025-12-01 14:00:00'.")
+    args = parser.parse_args()
+
+    start = datetime.strptime(args.start, '%Y-%m-%d %H:%M:%S').timestamp() if args.start else None
+    analyze_videos(args.videos, args.out, gallery_path=args.gallery, confidence_threshold=args.confidence,
+                   workers=args.workers, chunk_seconds=args.chunk_seconds, overlap_seconds=args.overlap_seconds,
+                   stride=max(1, args.stride), detection_width=args.width, start_time=start)
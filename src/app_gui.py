@@ -3,16 +3,23 @@ from tkinter import simpledialog, messagebox, PhotoImage, filedialog  # Import s
 import subprocess  # Import subprocess to run other Python scripts from this one.
 import threading  # Import threading to run processes in the background without freezing the GUI.
 import os  # Import os for operating system interactions, like creating directories.
-import shutil  # Import shutil for high-level file operations like copying.
-import time  # Import time for creating unique filenames.
-import pickle  # Import pickle for loading RL state
+import json  # Import json to read the exported RL statistics.
 from pathlib import Path  # Import Path for better path handling
+from enroll import enroll_person, remove_person  # Import online enrollment (no full retrain needed).
+from control_channel import ControlServer  # Import the command/telemetry link to the recognizer.
+from frame_bus import FrameBus  # Import the shared-memory frame bus the recognizer publishes the preview to.
+import cv2  # Import OpenCV to fit preview frames into the panel.
+
+CONTROL_POLL_MS = 200  # How often the GUI handles messages from the recognizer.
+STOP_GRACE_MS = 3000  # How long a graceful stop may take before the recognizer is terminated.
+PREVIEW_INTERVAL_MS = 66  # Preview refresh interval (about 15 FPS); only the newest frame is ever shown.
+PREVIEW_SIZE = (480, 270)  # Size of the preview panel in pixels; frames are scaled down to fit, keeping their aspect ratio.
 
 class FaceRecApp:  # Defines the main class for our GUI application.
     def __init__(self, root):  # The constructor method, called when a new FaceRecApp object is created.
         self.root = root  # Store the main Tkinter window object.
         self.root.title("Face Recognition Security System")  # Set the title of the window.
-        self.root.geometry("500x380")  # Set the initial size of the window.
+        self.root.geometry("520x720")  # Set the initial size of the window (room for the live preview).
         self.root.configure(bg="#212121")  # Set the background color of the main window to a dark grey.
 
         # --- Icon (Optional) ---
@@ -20,6 +27,20 @@ class FaceRecApp:  # Defines the main class for our GUI application.
         # self.root.iconphoto(False, PhotoImage(file='assets/icon.png')) 
 
         self.recognition_process = None  # A variable to hold the running recognition script process.
+
+        # --- Live Preview State ---
+        self.preview_bus_name = f"face_rec_preview_{os.getpid()}"  # Unique per GUI, so two GUIs don't collide.
+        self.preview_bus = None  # Attached once the recognizer has published its first frame.
+        self.preview_seq = -1  # Sequence number of the frame on screen.
+        self.preview_image = None  # Tk keeps no reference to the image itself.
+
+        # --- Control Channel to the Recognizer ---
+        # Feedback and commands go to the recognizer, live telemetry comes back (no files, no pickles).
+        try:
+            self.control = ControlServer()
+        except OSError as e:  # The GUI still works, just without live feedback.
+            print(f"GUI: Control channel unavailable: {e}")
+            self.control = None
         
         # --- Professional Style Configuration for a Modern Dark Theme ---
         self.dark_bg = "#212121"  # Define the dark background color.
@@ -40,7 +61,15 @@ class FaceRecApp:  # Defines the main class for our GUI application.
 
         # --- Title Label ---
         title_label = tk.Label(main_frame, text="Security System Control", font=self.title_font, bg=self.dark_bg, fg=self.accent_color)  # Create the title text.
-        title_label.pack(pady=(0, 25))  # Add it to the frame with vertical padding at the bottom.
+        title_label.pack(pady=(0, 10))  # Add it to the frame with vertical padding at the bottom.
+
+        # --- Live Preview Panel ---
+        preview_frame = tk.Frame(main_frame, width=PREVIEW_SIZE[0], height=PREVIEW_SIZE[1], bg="#000000")  # Fixed-size black panel.
+        preview_frame.pack(pady=(0, 10))
+        preview_frame.pack_propagate(False)  # Keep the panel size whatever the label shows.
+        self.preview_label = tk.Label(preview_frame, text="Live preview appears here when the system is running.",
+                                      bg="#000000", fg="#888888", font=self.status_font)
+        self.preview_label.pack(expand=True, fill=tk.BOTH)
 
         # --- Camera Source Flag (Checkbox) ---
         self.use_mobile_var = tk.BooleanVar()  # A special tkinter variable to hold the checkbox state (True/False).
@@ -71,9 +100,13 @@ class FaceRecApp:  # Defines the main class for our GUI application.
         self.stop_button.config(state=tk.DISABLED)  # Initially disabled.
         self.stop_button.pack(side=tk.LEFT, expand=True, padx=5)  # Place it next to the start button.
 
-        # --- Add New Person Button ---
-        self.add_person_button = self.create_styled_button(main_frame, "＋ Add Person via Upload", self.add_new_person_by_upload, self.accent_color, text_color=self.dark_bg)  # Create the "Add Person" button.
-        self.add_person_button.pack(fill=tk.X, pady=5)  # Add it to the main frame, filling horizontal space.
+        # --- Add / Remove Person Buttons ---
+        person_button_frame = tk.Frame(main_frame, bg=self.dark_bg)  # A row for the enrollment buttons.
+        person_button_frame.pack(fill=tk.X, pady=5)
+        self.add_person_button = self.create_styled_button(person_button_frame, "＋ Add Person via Upload", self.add_new_person_by_upload, self.accent_color, text_color=self.dark_bg)  # Create the "Add Person" button.
+        self.add_person_button.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=(0, 5))  # Takes most of the row.
+        self.remove_person_button = self.create_styled_button(person_button_frame, "－ Remove", self.remove_person_dialog, self.medium_bg)  # Create the "Remove" button.
+        self.remove_person_button.pack(side=tk.LEFT)
 
         # --- RL Feedback Section ---
         rl_frame = tk.Frame(main_frame, bg=self.dark_bg, relief=tk.SOLID, borderwidth=1)
@@ -124,6 +157,8 @@ class FaceRecApp:  # Defines the main class for our GUI application.
         
         # Load initial RL stats
         self.update_rl_status()
+        self.root.after(CONTROL_POLL_MS, self.poll_control_channel)  # Start handling recognizer messages.
+        self.root.after(PREVIEW_INTERVAL_MS, self.update_preview)  # Start the preview refresh loop.
 
         # --- Exit Button ---
         exit_button = self.create_styled_button(main_frame, "Exit Application", self.on_closing, self.error_red)  # Create the "Exit" button.
@@ -148,9 +183,9 @@ class FaceRecApp:  # Defines the main class for our GUI application.
         button.bind("<Leave>", lambda e, b=button, bg=bg_color, fg=fg_color: b.config(bg=bg, fg=fg))  # On leave, revert to original colors.
         return button  # Return the created button object.
 
-    def run_in_thread(self, command):  # A helper method to run a command.
+    def run_in_thread(self, command, env=None):  # A helper method to run a command.
         """Runs a command in a separate process to keep the GUI responsive."""
-        self.recognition_process = subprocess.Popen(command)  # Start the command as a new process and store it.
+        self.recognition_process = subprocess.Popen(command, env=env)  # Start the command as a new process and store it.
         self.recognition_process.wait()  # Wait here until the subprocess finishes (e.g., user presses 'q').
         # This code runs AFTER the recognition process has stopped.
         self.root.after(0, self.on_recognition_stop)  # Schedule the UI update to run on the main GUI thread.
@@ -163,7 +198,47 @@ class FaceRecApp:  # Defines the main class for our GUI application.
         self.update_status("System Idle.", self.accent_color)  # Update the status bar.
         self.start_button.config(state=tk.NORMAL)  # Re-enable the "Start" button.
         self.stop_button.config(state=tk.DISABLED)  # Disable the "Stop" button.
-        self.add_person_button.config(state=tk.NORMAL)  # Re-enable the "Add Person" button.
+        self.update_rl_status()  # Show the statistics the session exported on exit.
+        self.close_preview("Preview stopped.")  # Detach from the recognizer's frame bus.
+
+    def update_preview(self):  # Runs on the GUI thread every PREVIEW_INTERVAL_MS.
+        """Shows the newest preview frame from the recognizer, skipping any frames published in between."""
+        try:
+            if self.recognition_process and self.preview_bus is None:
+                try:
+                    self.preview_bus = FrameBus(self.preview_bus_name)  # The recognizer creates it with its first frame.
+                except (FileNotFoundError, ValueError):
+                    pass
+            bus = self.preview_bus
+            if bus is not None:
+                if bus.closed:  # The recognizer stopped (or restarted with a new bus).
+                    self.close_preview("Preview stopped.")
+                elif bus.latest_seq > self.preview_seq:
+                    result = bus.read()  # Newest frame only; a private copy of a small RGB image.
+                    if result is not None:
+                        self.preview_seq, frame, _, _ = result
+                        h, w = frame.shape[:2]
+                        scale = min(PREVIEW_SIZE[0] / w, PREVIEW_SIZE[1] / h)
+                        if scale < 1.0:  # Fit the whole frame (and its overlay text) into the panel; the label centres it on black.
+                            w, h = max(1, int(w * scale)), max(1, int(h * scale))
+                            frame = cv2.resize(frame, (w, h), interpolation=cv2.INTER_AREA)
+                        ppm = b'P6 %d %d 255\n' % (w, h) + frame.tobytes()  # Raw RGB with a PPM header: no encoding.
+                        self.preview_image = tk.PhotoImage(width=w, height=h, data=ppm, format='PPM')
+                        self.preview_label.config(image=self.preview_image, text="")
+        except Exception as e:  # The preview must never take the GUI down.
+            print(f"GUI: Preview error: {e}")
+            self.close_preview("Preview unavailable.")
+        self.root.after(PREVIEW_INTERVAL_MS, self.update_preview)
+
+    def close_preview(self, message):
+        """Detaches from the preview bus and shows `message` in the panel."""
+        if self.preview_bus is not None:
+            self.preview_label.config(image="")  # Drop the image before the shared memory goes away.
+            self.preview_image = None
+            self.preview_bus.close()
+            self.preview_bus = None
+        self.preview_seq = -1
+        self.preview_label.config(text=message)
 
     def toggle_mobile_url_entry(self):  # This method is called when the checkbox is clicked.
         """Shows or hides the mobile URL entry box based on the checkbox state."""
@@ -190,24 +265,38 @@ class FaceRecApp:  # Defines the main class for our GUI application.
             camera_source = '0'  # ...default to the laptop webcam.
             
         command = ["python", "src/recognize_face.py", "--camera", camera_source]  # Define the command to run the recognition script with the camera argument.
-        threading.Thread(target=self.run_in_thread, args=(command,), daemon=True).start()  # Run the command in a new thread so the GUI doesn't freeze.
+        command += ["--preview-bus", self.preview_bus_name, "--no-window"]  # Video goes to our preview panel instead of a separate window.
+        env = None
+        if self.control:  # Tell the recognizer where to connect; the key goes through the environment, not the command line.
+            command += ["--control-port", str(self.control.port)]
+            env = self.control.child_env()
+        threading.Thread(target=self.run_in_thread, args=(command, env), daemon=True).start()  # Run the command in a new thread so the GUI doesn't freeze.
         
         # --- Update UI to "Running" State ---
         self.update_status("System Running...", self.success_green)  # Update the status bar.
         self.start_button.config(state=tk.DISABLED)  # Disable the "Start" button to prevent multiple clicks.
         self.stop_button.config(state=tk.NORMAL)  # Enable the "Stop" button.
-        self.add_person_button.config(state=tk.DISABLED)  # IMPORTANT: Disable adding users while the system is running to prevent conflicts.
+        # Adding people stays enabled: the running system picks up the updated gallery by itself.
 
     def stop_recognition(self):  # This method is called when the "Stop System" button is clicked.
         """Stops the live recognition script process."""
         if self.recognition_process:  # Check if a process is actually running.
             print("GUI: Stopping recognition system...")  # Log the action to the console.
             self.update_status("Stopping system...", self.error_red)  # Update the status bar.
-            self.recognition_process.terminate()  # Send a signal to terminate the running script.
+            if self.control and self.control.send({'type': 'stop'}):  # Ask for a clean exit, so the RL state is saved...
+                self.root.after(STOP_GRACE_MS, self.force_stop)  # ...but don't wait forever.
+            else:
+                self.recognition_process.terminate()  # Send a signal to terminate the running script.
             # The UI update will be handled by on_recognition_stop once the process fully terminates.
 
+    def force_stop(self):  # Called if a graceful stop takes too long.
+        """Terminates the recognition process if it is still running."""
+        process = self.recognition_process
+        if process and process.poll() is None:
+            process.terminate()
+
     def add_new_person_by_upload(self):  # This method is called when the "Add Person via Upload" button is clicked.
-        """Opens dialogs to get a name and upload image files, then retrains the model."""
+        """Opens dialogs to get a name and upload image files, then enrolls them into the gallery."""
         person_name = simpledialog.askstring("Add New Person", "Enter the person's name:", parent=self.root)  # Show a dialog asking for the person's name.
         
         # --- Validation Step 1: Check if a name was entered ---
@@ -231,223 +320,233 @@ class FaceRecApp:  # Defines the main class for our GUI application.
                 messagebox.showwarning("Cancelled", "No images were selected. Operation cancelled.")  # Show a warning if no files were chosen.
                 return  # Stop the function.
             
-            # --- File Copying and Retraining ---
-            try:  # Use a try-except block to catch any errors from the scripts.
-                self.update_status(f"Copying {len(filepaths)} images...", self.accent_color)  # Update status bar.
-                person_dir = os.path.join('data/train', person_name)  # Define the target directory for the new images.
-                os.makedirs(person_dir, exist_ok=True)  # Create the person's training directory if it doesn't exist.
-                for fpath in filepaths:  # Loop through each selected file path.
-                    # Copy each selected file into the new directory with a unique name.
-                    timestamp = int(time.time() * 1000)  # Create a unique timestamp.
-                    _, extension = os.path.splitext(fpath)  # Get the file extension.
-                    new_filename = f"{person_name}_{timestamp}{extension}"  # Create a new, unique filename.
-                    shutil.copy(fpath, os.path.join(person_dir, new_filename))  # Copy the file.
-                
-                messagebox.showinfo("Training", f"{len(filepaths)} images copied successfully. Now retraining the model. This may take a moment.")  # Inform the user.
-                self.update_status("Retraining model...", self.accent_color)  # Update status bar.
-                subprocess.run(["python", "src/train_model.py"], check=True)  # Run the training script and wait for it to finish.
-                messagebox.showinfo("Success", f"Model successfully retrained with {person_name}!")  # Announce success.
-                self.update_status("System Idle.", self.accent_color)  # Reset status bar.
-            except subprocess.CalledProcessError:  # If any of the scripts fail...
-                messagebox.showerror("Error", "A script failed to execute. Check the console for details.")  # ...show an error message.
-                self.update_status("Error during training.", self.error_red)  # Update status bar with error state.
-            except Exception as e:  # Catch other potential errors, like file permission issues.
-                messagebox.showerror("Error", f"An error occurred while copying files: {e}")  # Show the error.
-                self.update_status("File copy error.", self.error_red)  # Update status bar.
+            # --- Enrollment (only the new photos are processed) ---
+            self.update_status(f"Enrolling {len(filepaths)} images of {person_name}...", self.accent_color)  # Update status bar.
+            self.set_person_buttons(tk.DISABLED)  # One gallery change at a time.
+            threading.Thread(target=self.run_enrollment, args=(person_name, list(filepaths)), daemon=True).start()  # Keep the GUI responsive.
         else:  # If the user cancelled the name dialog...
             messagebox.showwarning("Cancelled", "No name entered. Operation cancelled.")  # ...show a warning.
 
+    def run_enrollment(self, person_name, filepaths):  # Runs in a background thread.
+        """Enrolls the photos and reports the result on the GUI thread."""
+        try:
+            result = enroll_person(person_name, filepaths)  # Copies, embeds and appends to the gallery.
+        except Exception as e:  # E.g. file permission issues.
+            result = {'success': False, 'message': f"An error occurred while enrolling: {e}", 'skipped': []}
+        self.root.after(0, self.on_enrollment_done, result)  # Tkinter widgets may only be used from the main thread.
+
+    def on_enrollment_done(self, result):  # Called on the GUI thread.
+        """Shows the enrollment result."""
+        self.set_person_buttons(tk.NORMAL)
+        if result['success']:
+            note = f"\n\n{len(result['skipped'])} photo(s) had no usable face." if result['skipped'] else ""
+            messagebox.showinfo("Success", f"{result['message']}.{note}")  # Announce success.
+            self.update_status("System Running..." if self.recognition_process else "System Idle.",
+                               self.success_green if self.recognition_process else self.accent_color)
+        else:
+            messagebox.showerror("Error", result['message'])  # Show the error.
+            self.update_status("Enrollment failed.", self.error_red)  # Update status bar with error state.
+
+    def remove_person_dialog(self):  # This method is called when the "Remove" button is clicked.
+        """Asks for a name and removes that person from the gallery."""
+        person_name = simpledialog.askstring("Remove Person", "Enter the name of the person to remove:", parent=self.root)
+        if not person_name or not person_name.strip():
+            return
+        person_name = person_name.strip()
+        if not messagebox.askyesno("Confirm", f"Remove {person_name}? Their training photos are moved to data/removed."):
+            return
+        self.update_status(f"Removing {person_name}...", self.accent_color)
+        self.set_person_buttons(tk.DISABLED)  # One gallery change at a time.
+        threading.Thread(target=self.run_removal, args=(person_name,), daemon=True).start()  # Compaction can take a while.
+
+    def run_removal(self, person_name):  # Runs in a background thread.
+        """Removes the person and reports the result on the GUI thread."""
+        try:
+            result = remove_person(person_name)  # Only the gallery manifest is rewritten (plus a compaction now and then).
+        except Exception as e:
+            result = {'success': False, 'message': f"An error occurred while removing: {e}"}
+        self.root.after(0, self.on_removal_done, result)  # Tkinter widgets may only be used from the main thread.
+
+    def on_removal_done(self, result):  # Called on the GUI thread.
+        """Shows the removal result."""
+        self.set_person_buttons(tk.NORMAL)
+        self.update_status("System Running..." if self.recognition_process else "System Idle.",
+                           self.success_green if self.recognition_process else self.accent_color)
+        if result['success']:
+            messagebox.showinfo("Removed", result['message'])
+        else:
+            messagebox.showerror("Error", result['message'])
+
+    def set_person_buttons(self, state):  # Add and Remove are disabled while either one runs.
+        """Sets the state of the Add Person and Remove buttons."""
+        self.add_person_button.config(state=state)
+        self.remove_person_button.config(state=state)
+
     def on_closing(self):  # This method is called when the user tries to close the window.
         """Handles the window close event to ensure graceful shutdown."""
         print("GUI: Close requested.")
         if self.recognition_process:  # If the recognition system is running...
             self.stop_recognition()  # ...stop it first.
+            self.force_stop()  # The window is going away, so don't wait for a graceful exit.
+        if self.control:
+            self.control.close()  # Close the control channel.
         self.root.destroy()  # Then, safely close the GUI window.
     
     def update_rl_status(self):
-        """Update the RL status label with current statistics."""
+        """Update the RL status label from live telemetry, or from the last exported statistics."""
         try:
-            rl_data_path = Path('data/rl_tracker.pkl')
-            if rl_data_path.exists():
-                with open(rl_data_path, 'rb') as f:
-                    data = pickle.load(f)
-                threshold = data.get('threshold', 0.80)
-                total_feedback = len(data.get('feedback_history', []))
-                
-                if total_feedback > 0:
-                    recent = data.get('feedback_history', [])[-20:]
-                    accuracy = sum(1 for f in recent if f['is_correct']) / len(recent) if recent else 0
+            telemetry = self.control.latest_telemetry() if self.control else None
+            if telemetry:  # Live values from the running recognizer.
+                self.rl_status_label.config(
+                    text=f"Threshold: {telemetry['threshold']:.3f} | Accuracy: {telemetry['accuracy']:.1%} | "
+                         f"Feedback: {telemetry['total_feedback']} | {telemetry['fps']:.1f} FPS"
+                )
+                return
+            stats = self.load_exported_stats()
+            if stats:
+                if stats['total_feedback'] > 0:
                     self.rl_status_label.config(
-                        text=f"Threshold: {threshold:.3f} | Accuracy: {accuracy:.1%} | Feedback: {total_feedback}"
+                        text=f"Threshold: {stats['global_threshold']:.3f} | Accuracy: {stats['recent_accuracy']:.1%} | Feedback: {stats['total_feedback']}"
                     )
                 else:
-                    self.rl_status_label.config(text=f"Threshold: {threshold:.3f} | No feedback yet")
+                    self.rl_status_label.config(text=f"Threshold: {stats['global_threshold']:.3f} | No feedback yet")
             else:
                 self.rl_status_label.config(text="No learning data yet - start providing feedback!")
         except Exception as e:
             self.rl_status_label.config(text="RL status unavailable")
             print(f"Error loading RL stats: {e}")
-    
-    def feedback_correct(self):
-        """Send 'correct' feedback signal to the recognition system."""
-        if not self.recognition_process:
+
+    def load_exported_stats(self):
+        """Returns the statistics exported by the last recognition session, or None."""
+        stats_path = Path('data/rl_statistics.json')
+        if not stats_path.exists():
+            return None
+        with open(stats_path, 'r') as f:
+            return json.load(f)
+
+    def poll_control_channel(self):
+        """Handles messages from the recognizer; runs on the GUI thread a few times per second."""
+        if self.control:
+            for message in self.control.poll_messages():
+                if message['type'] == 'feedback_result':
+                    color = self.success_green if message['success'] else self.error_red
+                    self.update_status(message['message'], color)
+                elif message['type'] == 'stats':
+                    self.open_stats_window(message['stats'])
+            telemetry = self.control.latest_telemetry()
+            if telemetry:
+                self.update_rl_status()
+        self.root.after(CONTROL_POLL_MS, self.poll_control_channel)
+
+    def send_feedback(self, is_correct):
+        """Send feedback on the latest prediction to the recognition system."""
+        if not self.recognition_process or not self.control or not self.control.connected:
             messagebox.showwarning("Not Running", 
                                  "Recognition system must be running to provide feedback.\n\n"
                                  "Start the system and wait for a prediction, then provide feedback.")
             return
-        
-        # The recognition system listens for 'y' key
-        # We'll create a signal file that the system checks
-        signal_file = Path('data/.feedback_signal')
-        signal_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        try:
-            with open(signal_file, 'w') as f:
-                f.write('correct')
-            messagebox.showinfo("Feedback Sent", 
-                              "✓ Marked as CORRECT\n\n"
-                              "The system will adjust to be slightly more lenient.")
-            # Schedule status update
-            self.root.after(1000, self.update_rl_status)
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not send feedback: {e}")
+        if self.control.send({'type': 'feedback', 'correct': is_correct, 'true_name': None}):
+            self.update_status(f"Feedback sent: {'CORRECT' if is_correct else 'WRONG'}...", self.accent_color)
+        else:
+            messagebox.showerror("Error", "Could not send feedback: the recognition system is not connected.")
+
+    def feedback_correct(self):
+        """Send 'correct' feedback to the recognition system (it becomes slightly more lenient)."""
+        self.send_feedback(True)
     
     def feedback_wrong(self):
-        """Send 'wrong' feedback signal to the recognition system."""
-        if not self.recognition_process:
-            messagebox.showwarning("Not Running", 
-                                 "Recognition system must be running to provide feedback.\n\n"
-                                 "Start the system and wait for a prediction, then provide feedback.")
-            return
-        
-        signal_file = Path('data/.feedback_signal')
-        signal_file.parent.mkdir(parents=True, exist_ok=True)
-        
-        try:
-            with open(signal_file, 'w') as f:
-                f.write('wrong')
-            messagebox.showinfo("Feedback Sent", 
-                              "✗ Marked as WRONG\n\n"
-                              "The system will adjust to be more strict.")
-            # Schedule status update
-            self.root.after(1000, self.update_rl_status)
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not send feedback: {e}")
+        """Send 'wrong' feedback to the recognition system (it becomes more strict)."""
+        self.send_feedback(False)
     
     def show_rl_stats(self):
-        """Display detailed RL statistics in a popup window."""
+        """Display detailed RL statistics: live from the recognizer, or from the last exported session."""
+        if self.control and self.control.send({'type': 'get_stats'}):
+            return  # The window opens when the reply arrives (see poll_control_channel).
         try:
-            rl_data_path = Path('data/rl_tracker.pkl')
-            if not rl_data_path.exists():
+            stats = self.load_exported_stats()
+            if not stats:
                 messagebox.showinfo("No Data", 
                                   "No learning data available yet.\n\n"
                                   "Start the recognition system and provide feedback "
                                   "to see statistics.")
                 return
-            
-            with open(rl_data_path, 'rb') as f:
-                data = pickle.load(f)
-            
-            threshold = data.get('threshold', 0.80)
-            bounds = data.get('threshold_bounds', (0.65, 0.92))
-            feedback_history = data.get('feedback_history', [])
-            person_stats = data.get('person_stats', {})
-            person_thresholds = data.get('person_thresholds', {})
-            
-            # Calculate statistics
-            total = len(feedback_history)
-            if total > 0:
-                correct = sum(1 for f in feedback_history if f['is_correct'])
-                overall_acc = correct / total
-                
-                recent = feedback_history[-20:]
-                recent_correct = sum(1 for f in recent if f['is_correct'])
-                recent_acc = recent_correct / len(recent) if recent else 0
-            else:
-                overall_acc = 0
-                recent_acc = 0
-            
-            # Create stats window
-            stats_window = tk.Toplevel(self.root)
-            stats_window.title("Learning Statistics")
-            stats_window.geometry("500x600")
-            stats_window.configure(bg=self.dark_bg)
-            
-            # Stats content
-            stats_frame = tk.Frame(stats_window, bg=self.dark_bg, padx=20, pady=20)
-            stats_frame.pack(fill=tk.BOTH, expand=True)
-            
-            title = tk.Label(stats_frame, text="📊 Reinforcement Learning Statistics", 
-                           font=("Segoe UI", 14, "bold"), bg=self.dark_bg, fg="#FFD700")
-            title.pack(pady=(0, 15))
-            
-            # Global stats
-            global_frame = tk.LabelFrame(stats_frame, text="Global Metrics", 
-                                        font=("Segoe UI", 10, "bold"),
-                                        bg=self.dark_bg, fg=self.light_fg, 
-                                        relief=tk.SOLID, borderwidth=1)
-            global_frame.pack(fill=tk.X, pady=5)
-            
-            stats_text = f"""
-Adaptive Threshold: {threshold:.3f}
+            self.open_stats_window(stats)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not load statistics: {e}")
+            print(f"Error showing RL stats: {e}")
+
+    def open_stats_window(self, stats):
+        """Shows a ReinforcementTracker.get_statistics() dictionary in a popup window."""
+        bounds = stats['threshold_bounds']
+
+        # Create stats window
+        stats_window = tk.Toplevel(self.root)
+        stats_window.title("Learning Statistics")
+        stats_window.geometry("500x600")
+        stats_window.configure(bg=self.dark_bg)
+        
+        # Stats content
+        stats_frame = tk.Frame(stats_window, bg=self.dark_bg, padx=20, pady=20)
+        stats_frame.pack(fill=tk.BOTH, expand=True)
+        
+        title = tk.Label(stats_frame, text="📊 Reinforcement Learning Statistics", 
+                       font=("Segoe UI", 14, "bold"), bg=self.dark_bg, fg="#FFD700")
+        title.pack(pady=(0, 15))
+        
+        # Global stats
+        global_frame = tk.LabelFrame(stats_frame, text="Global Metrics", 
+                                    font=("Segoe UI", 10, "bold"),
+                                    bg=self.dark_bg, fg=self.light_fg, 
+                                    relief=tk.SOLID, borderwidth=1)
+        global_frame.pack(fill=tk.X, pady=5)
+        
+        stats_text = f"""
+Adaptive Threshold: {stats['global_threshold']:.3f}
 Threshold Range: [{bounds[0]:.2f}, {bounds[1]:.2f}]
 
-Total Feedback: {total}
-Overall Accuracy: {overall_acc:.1%}
-Recent Accuracy (last 20): {recent_acc:.1%}
+Total Feedback: {stats['total_feedback']}
+Overall Accuracy: {stats['overall_accuracy']:.1%}
+Recent Accuracy (last 20): {stats['recent_accuracy']:.1%}
 """
-            global_label = tk.Label(global_frame, text=stats_text, 
-                                   font=("Consolas", 9), bg=self.dark_bg, 
-                                   fg=self.light_fg, justify=tk.LEFT)
-            global_label.pack(padx=10, pady=10)
+        global_label = tk.Label(global_frame, text=stats_text, 
+                               font=("Consolas", 9), bg=self.dark_bg, 
+                               fg=self.light_fg, justify=tk.LEFT)
+        global_label.pack(padx=10, pady=10)
+        
+        # Per-person stats (already sorted by total interactions)
+        if stats['person_stats']:
+            person_frame = tk.LabelFrame(stats_frame, text="Per-Person Statistics", 
+                                        font=("Segoe UI", 10, "bold"),
+                                        bg=self.dark_bg, fg=self.light_fg,
+                                        relief=tk.SOLID, borderwidth=1)
+            person_frame.pack(fill=tk.BOTH, expand=True, pady=5)
             
-            # Per-person stats
-            if person_stats:
-                person_frame = tk.LabelFrame(stats_frame, text="Per-Person Statistics", 
-                                            font=("Segoe UI", 10, "bold"),
-                                            bg=self.dark_bg, fg=self.light_fg,
-                                            relief=tk.SOLID, borderwidth=1)
-                person_frame.pack(fill=tk.BOTH, expand=True, pady=5)
-                
-                # Scrollable text widget
-                text_widget = tk.Text(person_frame, height=15, width=55, 
-                                     font=("Consolas", 9), bg=self.medium_bg, 
-                                     fg=self.light_fg, relief=tk.FLAT)
-                scrollbar = tk.Scrollbar(person_frame, command=text_widget.yview)
-                text_widget.config(yscrollcommand=scrollbar.set)
-                
-                text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
-                scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
-                
-                # Sort by total interactions
-                sorted_persons = sorted(person_stats.items(), 
-                                      key=lambda x: x[1]['total'], reverse=True)
-                
-                for name, stats in sorted_persons[:15]:  # Top 15
-                    total_p = stats['total']
-                    correct_p = stats['correct']
-                    acc_p = correct_p / total_p if total_p > 0 else 0
-                    custom_t = person_thresholds.get(name)
-                    
-                    line = f"{name:20s} | {acc_p:6.1%} ({correct_p}/{total_p})"
-                    if custom_t:
-                        line += f" | T:{custom_t:.2f}"
-                    line += "\n"
-                    
-                    text_widget.insert(tk.END, line)
-                
-                text_widget.config(state=tk.DISABLED)
+            # Scrollable text widget
+            text_widget = tk.Text(person_frame, height=15, width=55, 
+                                 font=("Consolas", 9), bg=self.medium_bg, 
+                                 fg=self.light_fg, relief=tk.FLAT)
+            scrollbar = tk.Scrollbar(person_frame, command=text_widget.yview)
+            text_widget.config(yscrollcommand=scrollbar.set)
             
-            # Close button
-            close_btn = tk.Button(stats_frame, text="Close", command=stats_window.destroy,
-                                 bg=self.accent_color, fg=self.dark_bg, 
-                                 font=("Segoe UI", 10, "bold"),
-                                 relief=tk.SOLID, borderwidth=1, padx=20, pady=5)
-            close_btn.pack(pady=(10, 0))
+            text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
             
-        except Exception as e:
-            messagebox.showerror("Error", f"Could not load statistics: {e}")
-            print(f"Error showing RL stats: {e}")
+            for p in stats['person_stats']:
+                line = f"{p['name']:20s} | {p['accuracy']:6.1%} ({p['correct']}/{p['total']})"
+                if p['custom_threshold']:
+                    line += f" | T:{p['custom_threshold']:.2f}"
+                line += "\n"
+                
+                text_widget.insert(tk.END, line)
+            
+            text_widget.config(state=tk.DISABLED)
+        
+        # Close button
+        close_btn = tk.Button(stats_frame, text="Close", command=stats_window.destroy,
+                             bg=self.accent_color, fg=self.dark_bg, 
+                             font=("Segoe UI", 10, "bold"),
+                             relief=tk.SOLID, borderwidth=1, padx=20, pady=5)
+        close_btn.pack(pady=(10, 0))
 
 if __name__ == "__main__":  # This block runs only when this script is executed directly.
     root = tk.Tk()  # Create the main application window.
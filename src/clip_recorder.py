@@ -0,0 +1,161 @@
+# --- Import Necessary Libraries ---
+import os  # Import os to create the output folder.
+import time  # Import time for the default clock.
+import queue  # Import queue to hand frames to the encoder thread.
+import threading  # Import threading for the encoder and writer threads.
+from collections import deque  # Import deque for the pre-event ring.
+import cv2  # Import OpenCV for resizing, JPEG encoding and writing the clip.
+import numpy as np  # Import numpy to decode the stored frames.
+
+# --- Alert Clip Recorder ---
+# Keeps the last few seconds of video in memory and, when an unknown-person alert fires, writes them
+# plus a few seconds after the alert to a short clip, so the alert shows how the person arrived
+# instead of one still frame taken at whatever moment the alert delay ran out.
+#
+# The frame loop only downscales each recorded frame and puts it on a queue (well under a
+# millisecond). A background thread JPEG-encodes it into a ring of the last `before` seconds; only
+# encoded frames are kept, so memory stays at a few MB. On an alert the ring is copied into a clip
+# that collects `after` more seconds and is then written as an MJPG .avi by a thread of its own.
+# If the encoder falls behind, frames are dropped (and counted) rather than slowing the loop down.
+CLIP_BEFORE_SECONDS = 5.0  # Video kept from before the alert.
+CLIP_AFTER_SECONDS = 5.0  # Video recorded after the alert.
+CLIP_FPS = 15.0  # Frames per second stored; faster sources are thinned out.
+CLIP_WIDTH = 640  # Stored frames are downscaled to at most this width.
+CLIP_QUALITY = 80  # JPEG quality of the stored frames.
+MAX_QUEUED_FRAMES = 30  # Frames waiting for the encoder; more are dropped.
+
+
+class ClipRecorder:  # Pre-event ring and background clip writer.
+    """
+    Records alert clips from the frames of a live loop.
+
+    Args:
+        output_dir (str): Folder for the clips
+        before (float): Seconds of video kept from before an alert
+        after (float): Seconds recorded after an alert
+        fps (float): Maximum stored frames per second
+        width (int): Maximum stored frame width
+        quality (int): JPEG quality (1-100)
+
+    Attributes:
+        dropped (int): Frames dropped because the encoder fell behind
+        clips_written (list): Paths of the finished clips
+    """
+
+    def __init__(self, output_dir='data/alerts', before=CLIP_BEFORE_SECONDS, after=CLIP_AFTER_SECONDS,
+                 fps=CLIP_FPS, width=CLIP_WIDTH, quality=CLIP_QUALITY):  # The constructor method.
+        self.output_dir = output_dir
+        self.before = before
+        self.after = after
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.width = width
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        self.dropped = 0
+        self.clips_written = []
+        self.ring = deque()  # (timestamp, JPEG bytes) of the last `before` seconds, oldest first.
+        self.ring_bytes = 0
+        self._clip = None  # Clip collecting frames after an alert: {'path', 'end', 'frames'}.
+        self._next_time = None  # When the next frame is due (keeps the stored rate at `fps`).
+        self._clip_path, self._clip_end = None, None  # Clip being recorded, as seen by the frame loop.
+        self._queue = queue.Queue()  # Frames and alerts for the encoder thread, in order.
+        self._writers = []
+        self._thread = threading.Thread(target=self._run, name='ClipRecorder', daemon=True)
+        self._thread.start()
+
+    # --- Frame Loop Side ---
+    def add(self, frame, now=None):  # Called once per frame; never blocks.
+        """Queues a BGR frame taken at `now` for the ring (thinned to `fps`; dropped if the encoder is behind)."""
+        now = time.time() if now is None else now
+        if self._next_time is not None and now < self._next_time:
+            return
+        behind = self._next_time is None or now - self._next_time > self.interval
+        self._next_time = now + self.interval if behind else self._next_time + self.interval
+        if self._queue.qsize() >= MAX_QUEUED_FRAMES:
+            self.dropped += 1
+            return
+        h, w = frame.shape[:2]
+        if w > self.width:  # The downscaled copy is also what keeps later drawing on `frame` out of the clip.
+            small = cv2.resize(frame, (self.width, int(h * self.width / w)), interpolation=cv2.INTER_AREA)
+        else:
+            small = frame.copy()
+        self._queue.put(('frame', now, small))
+
+    def trigger(self, now=None, name='alert'):  # Called by the alert handler.
+        """
+        Starts a clip of the last `before` seconds and the next `after` seconds. An alert while a clip
+        is still recording extends that clip instead.
+
+        Returns:
+            str: Path the clip will be written to
+        """
+        now = time.time() if now is None else now
+        if self._clip_path is None or now >= self._clip_end:
+            self._clip_path = os.path.join(self.output_dir, f"{name}_{int(now)}.avi")
+        self._clip_end = now + self.after
+        self._queue.put(('trigger', now, self._clip_path))
+        return self._clip_path
+
+    def close(self):  # Finish the current clip and wait for every writer.
+        self._queue.put(('close', None, None))
+        self._thread.join()
+        for writer in self._writers:
+            writer.join()
+
+    def memory_bytes(self):  # Encoded bytes held in the ring and the clip being recorded.
+        clip = self._clip
+        return self.ring_bytes + (sum(len(data) for _, data in clip['frames']) if clip else 0)
+
+    # --- Encoder Thread ---
+    def _run(self):
+        while True:
+            kind, now, item = self._queue.get()
+            if kind == 'frame':
+                ok, encoded = cv2.imencode('.jpg', item, self.params)
+                if not ok:
+                    continue
+                data = encoded.tobytes()
+                self.ring.append((now, data))
+                self.ring_bytes += len(data)
+                while self.ring and now - self.ring[0][0] > self.before:  # Oldest frames leave the ring.
+                    self.ring_bytes -= len(self.ring.popleft()[1])
+                if self._clip is not None:
+                    self._clip['frames'].append((now, data))
+                    if now >= self._clip['end']:
+                        self._finish()
+            elif kind == 'trigger':
+                if self._clip is not None and self._clip['path'] == item:  # Same incident: record longer.
+                    self._clip['end'] = now + self.after
+                else:
+                    if self._clip is not None:
+                        self._finish()
+                    self._clip = {'path': item, 'end': now + self.after, 'frames': list(self.ring)}
+            else:  # 'close'
+                if self._clip is not None:
+                    self._finish()
+                return
+
+    def _finish(self):  # Hand the clip to a writer thread.
+        clip, self._clip = self._clip, None
+        writer = threading.Thread(target=self._write, args=(clip,), name='ClipWriter', daemon=True)
+        self._writers = [w for w in self._writers if w.is_alive()] + [writer]
+        writer.start()
+
+    def _write(self, clip):  # Decode the stored JPEGs and write the clip.
+        frames = clip['frames']
+        if not frames:
+            return
+        duration = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / duration if duration > 0 else (1.0 / self.interval if self.interval else 15.0)
+        os.makedirs(os.path.dirname(clip['path']) or '.', exist_ok=True)
+        writer, size = None, None
+        for _, data in frames:
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if writer is None:
+                size = (image.shape[1], image.shape[0])
+                writer = cv2.VideoWriter(clip['path'], cv2.VideoWriter_fourcc(*'MJPG'), fps, size)
+            if (image.shape[1], image.shape[0]) != size:  # The camera changed resolution.
+                image = cv2.resize(image, size)
+            writer.write(image)
+        writer.release()
+        self.clips_written.append(clip['path'])
+        print(f"✓ Alert clip saved to {clip['path']} ({len(frames)} frames, {duration:.1f} s)")
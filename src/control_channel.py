@@ -0,0 +1,192 @@
+# --- Import Necessary Libraries ---
+import os  # Import os to read the shared key from the environment.
+import json  # Import json for the message format.
+import time  # Import time to rate-limit telemetry.
+import queue  # Import queue to hand received messages to the owning thread.
+import threading  # Import threading for the background receive loops.
+from multiprocessing.connection import Listener, Client  # Authenticated local sockets (work the same on Windows).
+
+# --- Control and Telemetry Channel ---
+# The GUI owns a Listener on 127.0.0.1 and starts recognize_face.py with its port on the command line
+# and a random key in the environment. The recognizer connects back as a Client. Every message is
+# one JSON object sent with send_bytes:
+#
+#   GUI -> recognizer:  {"type": "feedback", "correct": true|false, "true_name": null}
+#                       {"type": "get_stats"}
+#                       {"type": "stop"}
+#   recognizer -> GUI:  {"type": "telemetry", "fps", "threshold", "frame", "tracks": [...], ...}  (at most TELEMETRY_RATE Hz)
+#                       {"type": "feedback_result", "success", "message", "threshold"}
+#                       {"type": "stats", "stats": {...}}  (ReinforcementTracker.get_statistics())
+#   either way:         {"type": "bye"}  (sent before closing, so the other side's receive loop ends at once)
+CONTROL_KEY_ENV = 'FACE_REC_CONTROL_KEY'  # Environment variable carrying the hex authentication key.
+TELEMETRY_RATE = 5.0  # Telemetry messages per second.
+
+
+def _encode(message):
+    return json.dumps(message, default=str).encode('utf-8')
+
+
+def _decode(data):
+    return json.loads(data.decode('utf-8'))
+
+
+class ControlServer:  # GUI side.
+    """
+    Listens for the recognizer process and exchanges messages with it.
+
+    The latest telemetry message is kept (older ones are dropped), all other messages are queued.
+    Nothing blocks the GUI thread: accepting and receiving happen on a daemon thread.
+    """
+
+    def __init__(self):  # The constructor method.
+        self.authkey = os.urandom(16)  # A fresh key per GUI session.
+        self._listener = Listener(('127.0.0.1', 0), authkey=self.authkey)  # Port 0 = any free port.
+        self.port = self._listener.address[1]
+        self._conn = None
+        self._send_lock = threading.Lock()
+        self._telemetry = None  # Most recent telemetry message.
+        self._messages = queue.Queue()  # Replies (feedback results, stats).
+        self._closed = False
+        threading.Thread(target=self._serve, name='ControlServer', daemon=True).start()
+
+    def child_env(self):  # Environment for the recognizer subprocess.
+        """Returns a copy of os.environ with the authentication key added."""
+        env = dict(os.environ)
+        env[CONTROL_KEY_ENV] = self.authkey.hex()
+        return env
+
+    def _serve(self):  # Accept one recognizer at a time and read its messages.
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except Exception:  # Listener closed, or a client with the wrong key.
+                if self._closed:
+                    return
+                continue
+            self._conn, self._telemetry = conn, None
+            try:
+                while True:
+                    message = _decode(conn.recv_bytes())
+                    if message.get('type') == 'bye':
+                        break
+                    if message.get('type') == 'telemetry':
+                        self._telemetry = message  # Only the newest telemetry matters.
+                    else:
+                        self._messages.put(message)
+            except (EOFError, OSError, ValueError):  # The recognizer exited.
+                pass
+            self._conn = None
+            conn.close()
+
+    @property
+    def connected(self):
+        return self._conn is not None
+
+    def send(self, message):  # Send one command.
+        """Sends a message to the recognizer. Returns False if it is not connected."""
+        conn = self._conn
+        if conn is None:
+            return False
+        try:
+            with self._send_lock:
+                conn.send_bytes(_encode(message))
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def latest_telemetry(self):  # Newest telemetry, or None.
+        """Returns the most recent telemetry message while the recognizer is connected."""
+        return self._telemetry if self.connected else None
+
+    def poll_messages(self):  # Non-blocking.
+        """Returns all replies received since the last call."""
+        messages = []
+        while True:
+            try:
+                messages.append(self._messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def close(self):
+        """Closes the listener and the current connection."""
+        self._closed = True
+        conn = self._conn
+        if conn is not None and self.send({'type': 'bye'}):
+            conn.close()
+        self._listener.close()
+
+
+class ControlClient:  # Recognizer side.
+    """
+    Connects to the GUI's ControlServer. Commands are read on a daemon thread and handed to the frame
+    loop through `poll_commands()`, so the recognizer state is only ever touched by the loop itself.
+    """
+
+    def __init__(self, port, authkey=None, rate=TELEMETRY_RATE):  # The constructor method.
+        """
+        Args:
+            port (int): Port of the GUI's ControlServer
+            authkey (bytes): Authentication key (default: read from the FACE_REC_CONTROL_KEY environment variable)
+            rate (float): Maximum telemetry messages per second
+        """
+        if authkey is None:
+            authkey = bytes.fromhex(os.environ.get(CONTROL_KEY_ENV, ''))
+        self._conn = Client(('127.0.0.1', port), authkey=authkey)
+        self._send_lock = threading.Lock()
+        self._commands = queue.Queue()
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._last_telemetry = 0.0
+        threading.Thread(target=self._receive, name='ControlClient', daemon=True).start()
+
+    def _receive(self):
+        try:
+            while True:
+                command = _decode(self._conn.recv_bytes())
+                if command.get('type') == 'bye':
+                    break
+                self._commands.put(command)
+        except (AttributeError, EOFError, OSError, ValueError):  # The GUI went away.
+            pass
+        self._commands.put({'type': 'disconnected'})
+
+    @property
+    def connected(self):
+        return self._conn is not None
+
+    def poll_commands(self):  # Non-blocking; called once per frame.
+        """Returns all commands received since the last call."""
+        commands = []
+        while True:
+            try:
+                commands.append(self._commands.get_nowait())
+            except queue.Empty:
+                return commands
+
+    def send(self, message):  # Send one reply.
+        """Sends a message to the GUI. Returns False (and stops sending) once the GUI is gone."""
+        if self._conn is None:
+            return False
+        try:
+            with self._send_lock:
+                self._conn.send_bytes(_encode(message))
+            return True
+        except (OSError, ValueError):
+            self._conn = None
+            return False
+
+    def publish_telemetry(self, build, now=None):  # Rate-limited.
+        """Calls `build()` and sends its result as telemetry, at most `rate` times per second."""
+        now = time.monotonic() if now is None else now
+        if self._conn is None or now - self._last_telemetry < self._interval:
+            return False  # The payload is not even built when it would be dropped.
+        self._last_telemetry = now
+        message = build()
+        message['type'] = 'telemetry'
+        return self.send(message)
+
+    def close(self):
+        """Says goodbye to the GUI and closes the connection."""
+        conn = self._conn
+        if conn is not None and self.send({'type': 'bye'}):
+            self._conn = None
+            conn.close()
@@ -0,0 +1,211 @@
+# --- Import Necessary Libraries ---
+import os  # Import os to manage the shard files.
+import json  # Import json for the append-only index log.
+import pickle  # Import pickle for the file stat index.
+import shutil  # Import shutil to swap in a compacted store.
+import numpy as np  # Import numpy to write and memory-map the embedding shards.
+
+class EmbeddingStore:  # On-disk, append-only store of training embeddings.
+    """
+    Stores the embeddings of every training image in fixed-size `.npy` shards on disk.
+
+    Layout of the store directory:
+        shard_00000.npy ...  (rows, 128) float32 embeddings, written once and never modified
+        index.jsonl          one line per image: key -> shard, first row, row count
+        files.pkl            {source: (size, mtime_ns, sha1)} stat index of the last run
+
+    Only the current shard is kept in memory. When it is full it is written to disk and its
+    index lines are appended and flushed; that is the checkpoint. If a run crashes, the next
+    run reloads the index and only re-processes images that were not checkpointed yet.
+    """
+
+    def __init__(self, root, shard_rows=4096, read_index=True):  # The constructor method.
+        """Opens (or creates) the store in `root`. `shard_rows` bounds the rows buffered in memory.
+
+        With `read_index=False` the existing index is not loaded: the store can only be appended to,
+        which costs nothing however large it is (used by online enrollment).
+        """
+        self.root = root  # Directory holding the shards and the index.
+        self.shard_rows = shard_rows  # Rows per shard, i.e. the checkpoint interval.
+        os.makedirs(root, exist_ok=True)  # Create the store directory if needed.
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self.files_path = os.path.join(root, 'files.pkl')
+
+        self.entries = {}  # key -> {'shard', 'start', 'count', 'num_augmentations', 'message'}
+        self.total_rows = 0  # Rows stored on disk, including superseded ones (used to decide on compaction).
+        self._pending = []  # Index records of the shard that is still in memory.
+        self._buffer = []  # Feature arrays of the shard that is still in memory.
+        self._buffer_rows = 0
+        self._maps = {}  # shard id -> read-only memory map.
+        self._trim_partial_line()  # Also when appending only: new records must not merge into a cut-short one.
+        if read_index:
+            self._load_index()
+        self._next_shard = self._find_next_shard()
+
+    # --- Loading ---
+    def _load_index(self):  # Replay the index log.
+        """Loads the index log; later records for the same key supersede earlier ones."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # A damaged line; everything before it is valid.
+                    break
+                if not os.path.exists(self._shard_path(record['shard'])) and record['count'] > 0:
+                    continue  # The shard write did not finish; treat the image as not processed.
+                self.entries[record.pop('key')] = record
+                self.total_rows += record['count']
+
+    def _trim_partial_line(self):  # Undo a crash in the middle of an index append.
+        """Truncates the index log after its last complete line."""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:  # Search backwards for the last newline, a block at a time.
+                step = min(4096, pos)
+                f.seek(pos - step)
+                newline = f.read(step).rfind(b'\n')
+                if newline >= 0:
+                    pos = pos - step + newline + 1
+                    break
+                pos -= step
+            if pos < end:
+                f.truncate(pos)
+
+    def _find_next_shard(self):  # Never overwrite an existing shard.
+        """Returns the first unused shard id."""
+        ids = [int(name[6:11]) for name in os.listdir(self.root) if name.startswith('shard_') and name.endswith('.npy')]
+        return max(ids) + 1 if ids else 0
+
+    def _shard_path(self, shard_id):
+        return os.path.join(self.root, f"shard_{shard_id:05d}.npy")
+
+    def load_files(self):  # The stat index from the previous run.
+        """Returns the {source: (size, mtime_ns, sha1)} index saved by the last run."""
+        if not os.path.exists(self.files_path):
+            return {}
+        try:
+            with open(self.files_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:  # A damaged stat index only means the files are hashed again.
+            return {}
+
+    def save_files(self, files):  # Save the stat index for the next run.
+        """Atomically writes the {source: (size, mtime_ns, sha1)} index."""
+        tmp_path = self.files_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(files, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.files_path)
+
+    # --- Lookup ---
+    def get(self, key):  # Metadata for one image.
+        """Returns the index entry for `key`, or None."""
+        return self.entries.get(key)
+
+    def features(self, key):  # Embeddings for one image.
+        """Returns the (rows, 128) embeddings of `key` as a read-only view, or None if the image had no face."""
+        entry = self.entries[key]
+        if entry['count'] == 0:
+            return None
+        shard = entry['shard']
+        if shard not in self._maps:  # Memory-map each shard once; pages are only read when used.
+            self._maps[shard] = np.load(self._shard_path(shard), mmap_mode='r')
+        return self._maps[shard][entry['start']:entry['start'] + entry['count']]
+
+    # --- Writing ---
+    def add(self, key, features, message, num_augmentations):  # Buffer the result for one image.
+        """Adds one image's embeddings (None if it was skipped) and checkpoints when the shard is full."""
+        count = 0 if features is None else len(features)
+        self._pending.append({'key': key, 'shard': self._next_shard, 'start': self._buffer_rows,
+                              'count': count, 'num_augmentations': num_augmentations, 'message': message})
+        if count:
+            self._buffer.append(np.asarray(features, dtype=np.float32).reshape(count, -1))
+            self._buffer_rows += count
+        if self._buffer_rows >= self.shard_rows:  # Shard full: write it out.
+            self.flush()
+
+    def flush(self):  # Checkpoint.
+        """Writes the buffered shard to disk and appends its records to the index log."""
+        if not self._pending:
+            return
+        if self._buffer_rows:  # Write the shard first, so the index never points at missing data.
+            # Another process (enrollment next to a retrain) may write to the same store, so the shard
+            # id is claimed by creating the file exclusively; a taken id moves on to the next one.
+            while True:
+                try:
+                    fd = os.open(self._shard_path(self._next_shard),
+                                 os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0))
+                    break
+                except FileExistsError:
+                    self._next_shard += 1
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.vstack(self._buffer))
+                f.flush()
+                os.fsync(f.fileno())
+            for record in self._pending:
+                record['shard'] = self._next_shard
+
+        # Then append the index records, in one write so lines of concurrent writers never interleave.
+        data = ''.join(json.dumps(record) + '\n' for record in self._pending).encode()
+        fd = os.open(self.index_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)  # Make the checkpoint durable.
+        finally:
+            os.close(fd)
+
+        for record in self._pending:
+            record = dict(record)
+            self.entries[record.pop('key')] = record
+        self.total_rows += self._buffer_rows
+        if self._buffer_rows:
+            self._next_shard += 1
+        self._pending, self._buffer, self._buffer_rows = [], [], 0
+
+    # --- Maintenance ---
+    def prune(self, used_keys, max_garbage=0.5):  # Forget images that are no longer in the dataset.
+        """Drops entries not in `used_keys`; rewrites the shards if more than `max_garbage` of the rows are dead."""
+        self.flush()
+        self.entries = {k: v for k, v in self.entries.items() if k in used_keys}
+        live_rows = sum(e['count'] for e in self.entries.values())
+        many_small_shards = len(os.listdir(self.root)) > 64 and live_rows < 32 * self.shard_rows
+        if self.total_rows and (live_rows < (1 - max_garbage) * self.total_rows or many_small_shards):
+            self._compact()
+        else:  # Just rewrite the index without the dropped entries.
+            self._write_index(self.root, self.entries)
+
+    def _compact(self):  # Stream the live rows into fresh shards.
+        """Copies all live rows into new shards in a temporary directory and swaps it in."""
+        tmp_root = self.root.rstrip('/\\') + '.compact'
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        fresh = EmbeddingStore(tmp_root, shard_rows=self.shard_rows)
+        for key, entry in sorted(self.entries.items(), key=lambda item: (item[1]['shard'], item[1]['start'])):
+            fresh.add(key, self.features(key), entry['message'], entry['num_augmentations'])  # One image at a time.
+        fresh.flush()
+        files = self.load_files()
+        fresh.close()
+        self.close()  # Release the memory maps before the old shards are deleted (required on Windows).
+
+        shutil.rmtree(self.root)
+        os.replace(tmp_root, self.root)
+        self.save_files(files)
+        self.entries, self.total_rows = fresh.entries, fresh.total_rows
+        self._next_shard = self._find_next_shard()
+
+    @staticmethod
+    def _write_index(root, entries):  # Rewrite the index log from scratch.
+        """Atomically replaces the index log with one record per live entry."""
+        path = os.path.join(root, 'index.jsonl')
+        with open(path + '.tmp', 'w') as f:
+            for key, entry in entries.items():
+                f.write(json.dumps(dict(entry, key=key)) + '\n')
+        os.replace(path + '.tmp', path)
+
+    def close(self):  # Release file handles.
+        """Writes any buffered rows and drops the memory maps."""
+        self.flush()
+        self._maps.clear()
@@ -0,0 +1,201 @@
+# --- Import Necessary Libraries ---
+import cv2  # Import OpenCV to load the detection and recognition models.
+import os  # Import os to manage the training folders.
+import argparse  # Import argparse to parse command-line arguments when running the script directly.
+import shutil  # Import shutil to copy new photos and archive removed persons.
+import time  # Import time for unique filenames.
+import yaml  # Import yaml to keep face_labels.yml in sync with the gallery.
+import numpy as np  # Import numpy to combine the new embeddings.
+from train_model import (embed_image, file_sha1, models_fingerprint, seed_from_hash,  # Reuse the training pipeline
+                         BASE_AUGMENTATIONS, EXTRA_AUGMENTATIONS, FEW_IMAGES_THRESHOLD)  # so the embeddings match training.
+from face_detectors import create_detector, add_detector_arguments, detector_options  # Import the detector backends.
+from embedding_store import EmbeddingStore  # Import the training cache, so a later full retrain reuses these embeddings.
+from gallery import append_to_gallery, remove_from_gallery, convert_pickle, write_gallery, load_gallery  # Gallery updates.
+
+# --- Online Enrollment ---
+# Adding a person used to mean copying photos into data/train/<name> and retraining on the whole
+# dataset. Enrollment embeds only the new photos (with the same augmentations and seeds as
+# train_model.py) and appends them to the gallery as a new segment. A running recognizer picks
+# the change up through its gallery watcher, so no restart is needed.
+
+def _update_labels(gallery_path, labels_path):  # Keep the human-readable label list in sync.
+    """Rewrites face_labels.yml from the gallery's name table."""
+    names = sorted(n for n in load_gallery(gallery_path).names if n is not None)
+    with open(labels_path, 'w') as f:
+        yaml.dump({i: name for i, name in enumerate(names)}, f, default_flow_style=False)
+
+
+def _name_error(name):  # Names become folder names under data/train.
+    """Returns why `name` cannot be used as a person name, or None if it is fine."""
+    if not name or not name.strip():
+        return f"Invalid name '{name}'"
+    name = name.strip()
+    if name.lower() == "unknown":  # "Unknown" is reserved.
+        return "'Unknown' is a reserved name"
+    separators = [sep for sep in (os.sep, os.altsep, '/') if sep]
+    if (any(sep in name for sep in separators) or '..' in name or name == '.' or os.path.isabs(name)
+            or os.path.splitdrive(name)[0]):  # Would leave the training folder.
+        return f"Invalid name '{name}': names may not contain path separators or '..'"
+    return None
+
+
+def _ensure_gallery(gallery_path):  # Make sure there is a manifest to append to.
+    """Converts a legacy embeddings.pkl if that is all there is. Returns True if a gallery exists."""
+    if os.path.exists(gallery_path):
+        return True
+    legacy_path = os.path.join(os.path.dirname(gallery_path), 'embeddings.pkl')
+    if os.path.exists(legacy_path):
+        print(f"Converting legacy '{legacy_path}' to '{gallery_path}'...")
+        convert_pickle(legacy_path, gallery_path)
+        return True
+    return False
+
+
+def enroll_person(name, image_paths, gallery_path='models/gallery.json', labels_path='models/face_labels.yml',
+                  data_dir='data/train', cache_path='models/embedding_cache', detector=None):  # Main enrollment function.
+    """
+    Adds photos of a person to the gallery without retraining.
+
+    The photos are copied into `data_dir/<name>/` (so a later full retrain includes them), embedded
+    with their augmentations, and appended to the gallery. Work depends only on the number of new photos.
+
+    Args:
+        name (str): Person name (a known person gets the photos added)
+        image_paths (list): Photos to enroll
+        gallery_path (str): Gallery manifest
+        labels_path (str): face_labels.yml to update
+        data_dir (str): Training data folder the photos are copied into
+        cache_path (str): Embedding store of train_model.py, or None to skip it
+        detector (dict): Face detector options for face_detectors.create_detector(); use the same ones
+            the gallery was trained with (train_model.py --detector), or the rows will not match a retrain
+
+    Returns:
+        dict: {'success', 'message', 'embedded', 'skipped', 'rows'}
+    """
+    error = _name_error(name)  # Checked before anything touches the filesystem.
+    if error:
+        return {'success': False, 'message': error, 'embedded': 0, 'skipped': [], 'rows': 0}
+    name = name.strip()
+
+    # --- Load Deep Learning Models ---
+    models_dir = os.path.dirname(gallery_path)
+    detector_path = os.path.join(models_dir, 'face_detection_yunet_2023mar.onnx')
+    recognizer_path = os.path.join(models_dir, 'face_recognition_sface_2021dec.onnx')
+    for path in (detector_path, recognizer_path):
+        if not os.path.exists(path):
+            return {'success': False, 'message': f"Model not found at '{path}'", 'embedded': 0, 'skipped': [], 'rows': 0}
+    face_detector = create_detector(models_dir=models_dir, **(detector or {}))  # YuNet unless another backend is chosen.
+    if face_detector is None:  # E.g. the Haar cascade file is missing (the reason has been printed).
+        return {'success': False, 'message': "Could not load the face detector", 'embedded': 0, 'skipped': [], 'rows': 0}
+    face_recognizer = cv2.FaceRecognizerSF.create(recognizer_path, "")
+
+    # --- Copy the photos into the training folder ---
+    person_dir = os.path.join(data_dir, name)
+    os.makedirs(person_dir, exist_ok=True)
+    existing_images = len([f for f in os.listdir(person_dir) if os.path.isfile(os.path.join(person_dir, f))])
+    copied = []
+    for fpath in image_paths:
+        _, extension = os.path.splitext(fpath)
+        new_filename = f"{name}_{time.time_ns() // 1000}{extension}"  # Unique name, as the GUI upload did before.
+        shutil.copy(fpath, os.path.join(person_dir, new_filename))
+        copied.append(new_filename)
+
+    # The count rule of train_model.py, applied to the photos the person had before (for a new person,
+    # to these photos), so the new rows get the same augmentation count as the person's existing ones.
+    # A full retrain counts the whole folder: once it crosses FEW_IMAGES_THRESHOLD, the retrain
+    # re-embeds all of the person's photos with the other count, which enrollment does not do.
+    person_images = existing_images or len(copied)
+    num_augmentations = EXTRA_AUGMENTATIONS if person_images < FEW_IMAGES_THRESHOLD else BASE_AUGMENTATIONS
+
+    # --- Embed only the new photos ---
+    store = EmbeddingStore(cache_path, read_index=False) if cache_path else None  # Append-only: no index load.
+    model_hash = models_fingerprint(detector_path, recognizer_path, detector) if store else None
+    features, sources, augmented, skipped = [], [], [], []
+    for filename in copied:
+        image_path = os.path.join(person_dir, filename)
+        content_hash = file_sha1(image_path)
+        rows, message = embed_image(image_path, face_detector, face_recognizer, num_augmentations,
+                                    seed=seed_from_hash(content_hash))
+        if store:
+            store.add(f"{content_hash}:{model_hash}", rows, message, num_augmentations)
+        if rows is None:
+            print(message)
+            skipped.append(filename)
+            continue
+        features.append(rows)
+        sources.extend([f"{name}/{filename}"] * len(rows))
+        augmented.extend(i > 0 for i in range(len(rows)))  # Row 0 is the original photo.
+    if store:
+        store.close()
+
+    if not features:
+        return {'success': False, 'message': f"No usable face found in the {len(copied)} photo(s) of {name}",
+                'embedded': 0, 'skipped': skipped, 'rows': 0}
+
+    # --- Publish ---
+    features = np.vstack(features)
+    if _ensure_gallery(gallery_path):
+        append_to_gallery(gallery_path, features, name, sources, augmented)
+    else:  # First person ever: start a new gallery.
+        write_gallery(gallery_path, features, [name] * len(features), sources, augmented)
+    _update_labels(gallery_path, labels_path)
+
+    embedded = len(copied) - len(skipped)
+    return {'success': True, 'message': f"Enrolled {name}: {embedded} photo(s), {len(features)} embeddings",
+            'embedded': embedded, 'skipped': skipped, 'rows': len(features)}
+
+
+def remove_person(name, gallery_path='models/gallery.json', labels_path='models/face_labels.yml',
+                  data_dir='data/train', archive_dir='data/removed'):  # Main removal function.
+    """
+    Removes a person from the gallery without retraining.
+
+    Args:
+        name (str): Person to remove
+        gallery_path (str): Gallery manifest
+        labels_path (str): face_labels.yml to update
+        data_dir (str): Training data folder
+        archive_dir (str): The person's training photos are moved here so a full retrain does not
+            bring them back. None leaves them in place.
+
+    Returns:
+        dict: {'success', 'message', 'rows'}
+    """
+    error = _name_error(name)  # The name is also a folder that gets moved.
+    if error:
+        return {'success': False, 'message': error, 'rows': 0}
+    if not _ensure_gallery(gallery_path):
+        return {'success': False, 'message': f"Gallery not found at '{gallery_path}'", 'rows': 0}
+    rows = remove_from_gallery(gallery_path, name)
+    if rows == 0:
+        return {'success': False, 'message': f"'{name}' is not in the gallery", 'rows': 0}
+    _update_labels(gallery_path, labels_path)
+
+    person_dir = os.path.join(data_dir, name)
+    if archive_dir and os.path.isdir(person_dir):
+        os.makedirs(archive_dir, exist_ok=True)
+        shutil.move(person_dir, os.path.join(archive_dir, f"{name}_{int(time.time())}"))
+    return {'success': True, 'message': f"Removed {name} ({rows} embeddings)", 'rows': rows}
+
+
+if __name__ == '__main__':  # This block runs only when this script is executed directly.
+    parser = argparse.ArgumentParser(description="Add or remove a person without retraining the whole gallery.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    add = sub.add_parser('add', help="Enroll photos of a person.")
+    add.add_argument('name', help="Person name.")
+    add.add_argument('images', nargs='+', help="Photos of the person.")
+    add_detector_arguments(add)  # Must match the options the gallery was trained with.
+    remove = sub.add_parser('remove', help="Remove a person.")
+    remove.add_argument('name', help="Person name.")
+    remove.add_argument('--keep-images', action='store_true',
+                        help="Leave the training photos in data/train (a full retrain will add the person back).")
+    for p in (add, remove):
+        p.add_argument('--gallery', default='models/gallery.json', help="Gallery manifest. Default is models/gallery.json.")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == 'add':
+        result = enroll_person(args.name, args.images, gallery_path=args.gallery, detector=detector_options(args))
+    else:
+        result = remove_person(args.name, gallery_path=args.gallery, archive_dir=None if args.keep_images else 'data/removed')
+    print(f"{'✓' if result['success'] else '✗'} {result['message']} ({time.perf_counter() - start:.2f}s)")
@@ -0,0 +1,224 @@
+# --- Import Necessary Libraries ---
+import os  # Import os to check paths and create the report directory.
+import argparse  # Import argparse to parse command-line arguments.
+import json  # Import json to save the machine-readable report.
+import time  # Import time to report how long the evaluation took.
+import numpy as np  # Import numpy for the blocked similarity computation.
+from reinforcement_learning import roc_from_histograms, equal_error_rate, optimal_threshold  # Reuse the ROC tools for thresholds.
+from gallery import load_gallery  # Import the gallery loader (memory-mapped format or legacy pickle).
+
+
+def load_gallery_arrays(embeddings_path):  # Load the gallery into flat numpy arrays.
+    """Loads embeddings, names and source metadata from the gallery as numpy arrays."""
+    gallery = load_gallery(embeddings_path)  # Memory-mapped gallery (or a legacy pickle converted in memory).
+    labels = gallery.labels()  # Person index of every row.
+    live = np.array([n is not None for n in gallery.names], dtype=bool)[labels]  # Skip rows of removed persons.
+
+    embeddings = gallery.embeddings()[live]  # One (N, 128) float32 matrix.
+    names = np.asarray([gallery.names[i] for i in labels[live]])  # Names as a numpy array of strings.
+
+    sources, augmented = gallery.sources()  # Source image of each embedding (written by newer train_model.py versions).
+    if sources is None:  # Older galleries have no source information...
+        print("Warning: No source metadata in the embeddings file; augmented siblings cannot be excluded.")
+        print("         Re-run train_model.py for an accurate leave-one-image-out evaluation.")
+        sources = np.arange(len(names))  # ...so every embedding is treated as its own image.
+        augmented = np.zeros(len(names), dtype=bool)
+    else:
+        sources, augmented = sources[live], augmented[live]
+    return embeddings, names, np.asarray(sources), augmented
+
+
+def evaluate_gallery(embeddings, names, sources, augmented, block_size=1024, tile_size=8192, bins=400):  # Main evaluation function.
+    """Runs leave-one-image-out identification over the gallery using a tiled similarity matrix."""
+    # --- Argument Explanations ---
+    # embeddings (np.ndarray): (N, D) gallery embeddings.
+    # names (np.ndarray): (N,) person name of each embedding.
+    # sources (np.ndarray): (N,) source image id of each embedding; equal ids are augmented siblings.
+    # augmented (np.ndarray): (N,) True for augmented copies. Only originals are used as queries.
+    # block_size (int): Number of query rows processed at once.
+    # tile_size (int): Number of gallery columns per matmul tile. Memory is about block_size * tile_size * 4 bytes.
+    # bins (int): Number of histogram bins over the cosine range [-1, 1].
+
+    # --- Normalize so a dot product is the cosine similarity ---
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)  # L2 norm of every embedding.
+    gallery = embeddings / np.maximum(norms, 1e-12)  # Unit-length rows.
+
+    # --- Sort the gallery by person so every class is a contiguous column range ---
+    class_names, labels = np.unique(names, return_inverse=True)  # Integer label per embedding.
+    _, source_ids = np.unique(sources, return_inverse=True)  # Integer source id per embedding.
+    order = np.argsort(labels, kind='stable')  # Gallery column order grouped by person.
+    gallery, labels, source_ids, augmented = gallery[order], labels[order], source_ids[order], augmented[order]
+    num_classes = class_names.size
+
+    # --- Index the sibling columns of every source image ---
+    by_source = np.argsort(source_ids, kind='stable')  # Gallery columns grouped by source image.
+    source_counts = np.bincount(source_ids)  # Number of embeddings per source image.
+    source_starts = np.r_[0, np.cumsum(source_counts)[:-1]]  # Where each source's columns start in `by_source`.
+
+    queries = np.flatnonzero(~augmented)  # Hold out every original image once.
+    edges = np.linspace(-1.0, 1.0, bins + 1)  # Histogram bin edges over the cosine range.
+
+    # --- Accumulators (all bounded by the number of classes, not the gallery size) ---
+    confusion = np.zeros((num_classes, num_classes), dtype=np.int64)  # Rows = true person, columns = predicted person.
+    genuine_hist = np.zeros((num_classes, bins), dtype=np.int64)  # Best same-person score per query, per person.
+    impostor_hist = np.zeros((num_classes, bins), dtype=np.int64)  # Best other-person score per query, per predicted person.
+    skipped = 0  # Queries with no remaining same-person images (single-image persons).
+
+    for q0 in range(0, queries.size, block_size):  # Process the queries in blocks.
+        rows = queries[q0:q0 + block_size]  # Gallery indices of this block's queries.
+        q = gallery[rows]  # (B, D) query matrix.
+        b = rows.size
+        class_max = np.full((b, num_classes), -np.inf, dtype=np.float32)  # Best score against each person.
+
+        # Sibling (same source) columns of every query in the block, as (row, column) pairs.
+        counts = source_counts[source_ids[rows]]  # Number of siblings per query (including itself).
+        pair_rows = np.repeat(np.arange(b), counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        pair_cols = by_source[np.repeat(source_starts[source_ids[rows]], counts) + within]
+
+        for c0 in range(0, gallery.shape[0], tile_size):  # Tile the gallery columns.
+            c1 = min(c0 + tile_size, gallery.shape[0])
+            scores = q @ gallery[c0:c1].T  # (B, T) cosine similarities for this tile.
+
+            in_tile = (pair_cols >= c0) & (pair_cols < c1)  # Siblings that fall inside this tile...
+            scores[pair_rows[in_tile], pair_cols[in_tile] - c0] = -np.inf  # ...are excluded from matching.
+
+            tile_labels = labels[c0:c1]  # Person of each column in the tile (sorted, so contiguous runs).
+            starts = np.flatnonzero(np.r_[True, tile_labels[1:] != tile_labels[:-1]])  # Start of each person run.
+            run_max = np.maximum.reduceat(scores, starts, axis=1)  # Best score per person run.
+            run_labels = tile_labels[starts]
+            class_max[:, run_labels] = np.maximum(class_max[:, run_labels], run_max)  # Merge with earlier tiles.
+
+        # --- Identification result for this block ---
+        true = labels[rows]  # True person of every query.
+        best_genuine = class_max[np.arange(b), true]  # Best score against the query's own person.
+        has_genuine = np.isfinite(best_genuine)  # False when the person has no other image left.
+        skipped += int((~has_genuine).sum())
+
+        predicted = np.argmax(class_max, axis=1)  # Top-1 identity (nearest neighbour by class).
+        np.add.at(confusion, (true[has_genuine], predicted[has_genuine]), 1)  # Update the confusion matrix.
+
+        # Best wrong person: who this query would be recognized as if it were not enrolled.
+        others = class_max.copy()
+        others[np.arange(b), true] = -np.inf
+        wrong = np.argmax(others, axis=1)
+        best_impostor = others[np.arange(b), wrong]
+
+        genuine_bins = np.clip(np.searchsorted(edges, best_genuine, side='right') - 1, 0, bins - 1)
+        impostor_bins = np.clip(np.searchsorted(edges, best_impostor, side='right') - 1, 0, bins - 1)
+        np.add.at(genuine_hist, (true[has_genuine], genuine_bins[has_genuine]), 1)
+        has_impostor = np.isfinite(best_impostor)  # Only false if there is just one person in the gallery.
+        np.add.at(impostor_hist, (wrong[has_impostor], impostor_bins[has_impostor]), 1)
+
+    return {
+        'class_names': class_names,
+        'confusion': confusion,
+        'genuine_hist': genuine_hist,
+        'impostor_hist': impostor_hist,
+        'bin_edges': edges,
+        'queries': int(queries.size),
+        'skipped': skipped,
+    }
+
+
+def suggest_thresholds(result, fp_cost=1.0, fn_cost=1.0, bounds=(0.65, 0.92), min_samples=5):  # Turn histograms into thresholds.
+    """Suggests a global and per-person threshold from the genuine/impostor histograms."""
+    edges = result['bin_edges']
+    global_roc = roc_from_histograms(result['genuine_hist'].sum(0), result['impostor_hist'].sum(0), edges)  # Pool all persons.
+    eer, eer_threshold = equal_error_rate(global_roc)
+    best = optimal_threshold(global_roc, fp_cost=fp_cost, fn_cost=fn_cost)
+
+    per_person = {}
+    for i, name in enumerate(result['class_names']):  # One ROC per person from its own histograms.
+        gen, imp = result['genuine_hist'][i], result['impostor_hist'][i]
+        if gen.sum() < min_samples or imp.sum() == 0:  # Not enough evidence for a person-specific value.
+            continue
+        person_best = optimal_threshold(roc_from_histograms(gen, imp, edges), fp_cost=fp_cost, fn_cost=fn_cost)
+        per_person[str(name)] = float(np.clip(person_best['threshold'], *bounds))
+
+    return {
+        'eer': eer,
+        'eer_threshold': eer_threshold,
+        'global_threshold': float(np.clip(best['threshold'], *bounds)),
+        'per_person': per_person,
+    }
+
+
+def save_report(result, thresholds, out_dir):  # Write the report files.
+    """Saves the summary JSON, confusion matrix CSV and score histograms CSV to `out_dir`."""
+    os.makedirs(out_dir, exist_ok=True)  # Create the report directory.
+    names = [str(n) for n in result['class_names']]
+
+    confusion_path = os.path.join(out_dir, 'confusion_matrix.csv')
+    with open(confusion_path, 'w') as f:  # Confusion matrix with a header row and a name column.
+        f.write('true\\predicted,' + ','.join(names) + '\n')
+        for name, row in zip(names, result['confusion']):
+            f.write(name + ',' + ','.join(str(v) for v in row) + '\n')
+
+    edges = result['bin_edges']
+    hist_path = os.path.join(out_dir, 'score_histograms.csv')
+    table = np.column_stack([edges[:-1], edges[1:], result['genuine_hist'].sum(0), result['impostor_hist'].sum(0)])
+    np.savetxt(hist_path, table, delimiter=',', header='bin_low,bin_high,genuine,impostor', comments='', fmt='%.4f')
+
+    confusion = result['confusion']
+    per_person_acc = {name: (float(confusion[i, i] / confusion[i].sum()) if confusion[i].sum() else None)
+                      for i, name in enumerate(names)}
+    report = {
+        'queries': result['queries'],
+        'evaluated': int(confusion.sum()),
+        'skipped_single_image': result['skipped'],
+        'accuracy': float(np.trace(confusion) / max(confusion.sum(), 1)),
+        'per_person_accuracy': per_person_acc,
+        'thresholds': thresholds,
+    }
+    with open(os.path.join(out_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to '{out_dir}'")
+
+
+if __name__ == '__main__':  # This block runs only when this script is executed directly.
+    parser = argparse.ArgumentParser(description="Leave-one-image-out evaluation of the trained gallery.")
+    parser.add_argument('--embeddings', default='models/gallery.json',
+                        help="Gallery manifest (or legacy embeddings.pkl). Default is models/gallery.json.")
+    parser.add_argument('--block-size', type=int, default=1024,
+                        help="Query rows per block. Default is 1024.")
+    parser.add_argument('--tile-size', type=int, default=8192,
+                        help="Gallery columns per matmul tile. Default is 8192.")
+    parser.add_argument('--fp-cost', type=float, default=1.0,
+                        help="Relative cost of a false accept when suggesting thresholds. Default is 1.0.")
+    parser.add_argument('--fn-cost', type=float, default=1.0,
+                        help="Relative cost of a false reject when suggesting thresholds. Default is 1.0.")
+    parser.add_argument('--out-dir', default=None,
+                        help="Optional directory for report.json, confusion_matrix.csv and score_histograms.csv.")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.embeddings):  # Check if the embeddings file exists.
+        print(f"Error: Embeddings file not found at '{args.embeddings}'. Please run the training script first.")
+        raise SystemExit(1)
+
+    embeddings, names, sources, augmented = load_gallery_arrays(args.embeddings)
+    start = time.perf_counter()  # Time the evaluation itself.
+    result = evaluate_gallery(embeddings, names, sources, augmented,
+                              block_size=args.block_size, tile_size=args.tile_size)
+    thresholds = suggest_thresholds(result, fp_cost=args.fp_cost, fn_cost=args.fn_cost)
+    elapsed = time.perf_counter() - start
+
+    confusion = result['confusion']
+    print("=" * 60)
+    print("GALLERY SELF-EVALUATION (leave-one-image-out)")
+    print("=" * 60)
+    print(f"Gallery: {embeddings.shape[0]} embeddings | {len(result['class_names'])} persons | {elapsed:.2f}s")
+    print(f"Queries: {result['queries']} originals ({result['skipped']} skipped: no other image of that person)")
+    print(f"Top-1 Accuracy: {np.trace(confusion) / max(confusion.sum(), 1):.1%}")
+    print(f"Equal Error Rate: {thresholds['eer']:.2%} at threshold {thresholds['eer_threshold']:.3f}")
+    print(f"Suggested Global Threshold: {thresholds['global_threshold']:.3f}")
+    for i, name in enumerate(result['class_names']):  # Per-person accuracy and threshold.
+        total = confusion[i].sum()
+        acc = f"{confusion[i, i] / total:6.1%}" if total else "   n/a"
+        custom = thresholds['per_person'].get(str(name))
+        custom_text = f" | T:{custom:.3f}" if custom is not None else ""
+        print(f"  • {str(name):20s} {acc} ({confusion[i, i]}/{total}){custom_text}")
+    print("=" * 60)
+
+    if args.out_dir:
+        save_report(result, thresholds, args.out_dir)
@@ -0,0 +1,205 @@
+# --- Import Necessary Libraries ---
+import os  # Import os to check the model paths.
+import json  # Import json to describe the detector settings for the embedding cache.
+import hashlib  # Import hashlib to fingerprint the cascade file for the embedding cache.
+import cv2  # Import OpenCV for YuNet and the Haar cascade.
+import numpy as np  # Import numpy to build the detection arrays.
+
+# --- Face Detector Backends ---
+# Every backend has the cv2.FaceDetectorYN interface that the rest of the code already uses:
+#
+#   detector.setInputSize((w, h))
+#   _, faces = detector.detect(bgr_image)   # faces: (N, 15) float32 array or None
+#
+# where each row is box (x, y, w, h), five landmarks (right eye, left eye, nose tip, right and left
+# mouth corner) and a score. So the recognition pipeline, training and data collection can switch
+# backends without any other change:
+#
+#   'yunet'       The YuNet DNN (the default; best recall, including turned and small faces).
+#   'haar'        OpenCV's frontal-face Haar cascade. Much cheaper on weak CPUs, frontal faces only.
+#                 The cascade has no landmarks, so they are placed at their average position within
+#                 the box (good enough for SFace's alignment of frontal faces), and it has no
+#                 calibrated confidence, so every face it keeps gets HAAR_SCORE.
+#   'haar+yunet'  The cascade as a cheap pre-filter: YuNet only runs when the cascade fires, and
+#                 only on the region around the cascade's faces. Frames without a frontal face cost
+#                 one cascade pass.
+DETECTOR_BACKENDS = ('yunet', 'haar', 'haar+yunet')
+YUNET_MODEL = 'face_detection_yunet_2023mar.onnx'
+CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'  # Shipped with OpenCV.
+HAAR_SCALE_FACTOR = 1.1  # Pyramid step of detectMultiScale; larger is faster but misses more faces.
+HAAR_MIN_NEIGHBORS = 5  # Overlapping hits required to keep a face.
+HAAR_DOWNSCALE = 1.0  # The image is shrunk by this factor before the cascade runs (2.0 = a quarter of the pixels).
+HAAR_MIN_SIZE = 30  # Smallest face in pixels of the original image.
+HAAR_SCORE = 1.0  # Score reported for every face the cascade keeps.
+GATE_MARGIN = 0.5  # YuNet searches the cascade's faces plus this fraction of their size around them.
+
+# Average YuNet box and landmarks relative to the Haar box (x, y as a fraction of the box size),
+# measured on frontal faces where both detectors agree.
+HAAR_BOX_SCALE = (0.95, 1.16)  # YuNet boxes are slightly narrower and include the chin.
+HAAR_LANDMARKS = np.array([[0.25, 0.38], [0.73, 0.39], [0.49, 0.62], [0.27, 0.80], [0.68, 0.81]], dtype=np.float32)
+
+
+def boxes_to_faces(boxes, score=HAAR_SCORE):  # Haar rectangles to YuNet-style rows.
+    """Turns (N, 4) x, y, w, h rectangles into (N, 15) YuNet-style rows with estimated landmarks."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    faces = np.empty((len(boxes), 15), dtype=np.float32)
+    origin, size = boxes[:, None, :2], boxes[:, None, 2:4]
+    faces[:, 4:14] = (origin + HAAR_LANDMARKS[None] * size).reshape(-1, 10)
+    faces[:, :2] = boxes[:, :2]
+    faces[:, 2:4] = boxes[:, 2:4] * np.array(HAAR_BOX_SCALE, dtype=np.float32)
+    faces[:, 14] = score
+    return faces
+
+
+class HaarDetector:  # Haar cascade behind the FaceDetectorYN interface.
+    """
+    Frontal-face Haar cascade with a configurable pyramid step and optional downscaling.
+
+    Args:
+        scale_factor (float): detectMultiScale pyramid step (1.1 = 10% per level)
+        min_neighbors (int): Overlapping hits required to keep a face
+        downscale (float): Shrink the image by this factor before detection (1.0 = full size)
+        min_size (int): Smallest face in pixels of the original image
+        cascade_path (str): Cascade XML file
+    """
+
+    def __init__(self, scale_factor=HAAR_SCALE_FACTOR, min_neighbors=HAAR_MIN_NEIGHBORS, downscale=HAAR_DOWNSCALE,
+                 min_size=HAAR_MIN_SIZE, cascade_path=CASCADE_PATH):  # The constructor method.
+        self.cascade = cv2.CascadeClassifier(cascade_path)
+        if self.cascade.empty():
+            raise ValueError(f"Could not load the Haar cascade '{cascade_path}'")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.downscale = max(1.0, downscale)
+        self.min_size = max(24, int(min_size / self.downscale))  # The cascade's own window is 24x24.
+
+    def setInputSize(self, size):  # Any image size works; kept for the FaceDetectorYN interface.
+        pass
+
+    def boxes(self, image):  # Raw cascade rectangles.
+        """Returns the cascade's (N, 4) x, y, w, h rectangles in the coordinates of `image`."""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        if self.downscale > 1.0:
+            gray = cv2.resize(gray, (int(gray.shape[1] / self.downscale), int(gray.shape[0] / self.downscale)),
+                              interpolation=cv2.INTER_AREA)
+        boxes = self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                              minSize=(self.min_size, self.min_size))
+        return np.asarray(boxes, dtype=np.float32).reshape(-1, 4) * self.downscale
+
+    def detect(self, image):  # Same contract as FaceDetectorYN.detect().
+        boxes = self.boxes(image)
+        if not len(boxes):
+            return 0, None
+        return len(boxes), boxes_to_faces(boxes)
+
+
+class GatedDetector:  # Haar pre-filter in front of YuNet.
+    """
+    Runs the Haar cascade first and YuNet only around the faces it finds.
+
+    Attributes:
+        frames (int): Frames seen
+        gated (int): Frames on which YuNet ran
+    """
+
+    def __init__(self, yunet, haar, margin=GATE_MARGIN):  # The constructor method.
+        self.yunet = yunet
+        self.haar = haar
+        self.margin = margin
+        self.frames = 0
+        self.gated = 0
+
+    def setInputSize(self, size):  # YuNet's input size is set per region.
+        pass
+
+    def detect(self, image):  # Same contract as FaceDetectorYN.detect().
+        self.frames += 1
+        boxes = self.haar.boxes(image)
+        if not len(boxes):
+            return 0, None  # No frontal face: YuNet does not run.
+        self.gated += 1
+
+        # --- YuNet on the region around all of the cascade's faces ---
+        h, w = image.shape[:2]
+        pad = self.margin * np.maximum(boxes[:, 2], boxes[:, 3])
+        x0 = int(max(0, (boxes[:, 0] - pad).min()))
+        y0 = int(max(0, (boxes[:, 1] - pad).min()))
+        x1 = int(min(w, (boxes[:, 0] + boxes[:, 2] + pad).max()))
+        y1 = int(min(h, (boxes[:, 1] + boxes[:, 3] + pad).max()))
+        region = image[y0:y1, x0:x1]
+        self.yunet.setInputSize((region.shape[1], region.shape[0]))
+        count, faces = self.yunet.detect(region)
+        if faces is not None:
+            faces[:, [0, 4, 6, 8, 10, 12]] += x0  # Back to the coordinates of the whole image.
+            faces[:, [1, 5, 7, 9, 11, 13]] += y0
+        return count, faces
+
+
+def create_detector(backend='yunet', models_dir='models', scale_factor=HAAR_SCALE_FACTOR, downscale=HAAR_DOWNSCALE,
+                    min_neighbors=HAAR_MIN_NEIGHBORS, cascade_path=None):  # Factory used by the scripts.
+    """
+    Creates a face detector.
+
+    Args:
+        backend (str): One of DETECTOR_BACKENDS
+        models_dir (str): Folder with the YuNet model
+        scale_factor, downscale, min_neighbors: Haar cascade settings (see HaarDetector)
+        cascade_path (str): Cascade XML file (default: the one shipped with OpenCV)
+
+    Returns:
+        The detector, or None (with the reason printed) if a model is missing.
+    """
+    if backend not in DETECTOR_BACKENDS:
+        print(f"Error: Unknown face detector '{backend}'. Choose one of: {', '.join(DETECTOR_BACKENDS)}.")
+        return None
+    yunet = haar = None
+    if backend in ('yunet', 'haar+yunet'):
+        detector_path = os.path.join(models_dir, YUNET_MODEL)
+        if not os.path.exists(detector_path):
+            print(f"Error: Face detector model not found at '{detector_path}'")
+            return None
+        yunet = cv2.FaceDetectorYN.create(detector_path, "", (0, 0))
+    if backend in ('haar', 'haar+yunet'):
+        try:
+            haar = HaarDetector(scale_factor, min_neighbors, downscale, cascade_path=cascade_path or CASCADE_PATH)
+        except ValueError as e:
+            print(f"Error: {e}")
+            return None
+    if backend == 'yunet':
+        return yunet
+    return haar if backend == 'haar' else GatedDetector(yunet, haar)
+
+
+def detector_key(options):  # Identifies the detector settings.
+    """
+    Returns a stable string for detector options (None or the default YuNet gives ''), for cache keys.
+    The cascade is identified by the SHA-1 of its content, not its path: it decides the boxes and so
+    the estimated landmarks and the alignment of every face.
+    """
+    if not options or options.get('backend', 'yunet') == 'yunet':
+        return ''
+    key = {k: v for k, v in options.items() if k != 'cascade_path'}
+    digest = hashlib.sha1()
+    with open(options.get('cascade_path') or CASCADE_PATH, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    key['cascade_sha1'] = digest.hexdigest()
+    return json.dumps(key, sort_keys=True)
+
+
+# --- Command-Line Options ---
+def add_detector_arguments(parser):  # Shared by the scripts that detect faces.
+    """Adds --detector, --haar-scale-factor, --haar-downscale and --haar-cascade to an argparse parser."""
+    parser.add_argument('--detector', choices=DETECTOR_BACKENDS, default='yunet',
+                        help="Face detector: yunet (default), haar, or haar+yunet (YuNet only when the Haar cascade fires).")
+    parser.add_argument('--haar-scale-factor', type=float, default=HAAR_SCALE_FACTOR,
+                        help=f"Haar pyramid step; larger is faster. Default is {HAAR_SCALE_FACTOR}.")
+    parser.add_argument('--haar-downscale', type=float, default=HAAR_DOWNSCALE,
+                        help=f"Shrink frames by this factor before the Haar cascade. Default is {HAAR_DOWNSCALE}.")
+    parser.add_argument('--haar-cascade', default=None, help="Haar cascade XML (default: the one shipped with OpenCV).")
+
+
+def detector_options(args):  # The parsed options as create_detector() keyword arguments.
+    """Returns the detector keyword arguments from parsed add_detector_arguments() options."""
+    return {'backend': args.detector, 'scale_factor': args.haar_scale_factor, 'downscale': args.haar_downscale,
+            'cascade_path': args.haar_cascade}
@@ -0,0 +1,70 @@
+# --- Import Necessary Libraries ---
+import math  # Import math for the pose angles.
+import cv2  # Import OpenCV for the Laplacian.
+import numpy as np  # Import numpy for the landmark arithmetic.
+
+# --- Face Quality ---
+# A cheap estimate of how useful a detected face is for recognition, from what the detector already
+# returns plus one Laplacian on the aligned 112x112 crop:
+#
+#   size       shorter side of the box (tiny faces give unreliable embeddings)
+#   pose       yaw and roll from the five landmarks (profile views match poorly)
+#   score      the detector's confidence
+#   sharpness  variance of the Laplacian of the aligned face (motion blur)
+#
+# Each factor is between 0 and 1, and the quality is their product. Faces below MIN_QUALITY are not
+# embedded and do not vote, so they cost no SFace time and cannot delay a confirmation with
+# "Unknown" votes. The landmark factors are checked first; a face that already fails on them is
+# never aligned.
+GOOD_FACE_SIZE = 64.0  # Shorter box side (pixels at the detection width) from which size no longer matters.
+MAX_YAW = 60.0  # Degrees of yaw at which the pose factor reaches 0 (30 degrees gives 0.5).
+MAX_ROLL = 60.0  # Degrees of roll at which the pose factor reaches 0.
+GOOD_SHARPNESS = 50.0  # Laplacian variance of the aligned face from which blur no longer matters.
+MIN_QUALITY = 0.25  # Faces below this quality are skipped.
+NOSE_DEPTH = 0.4  # How far the nose tip sits in front of the eyes, in units of the eye distance.
+
+
+def estimate_pose(face):  # Head pose from the landmarks.
+    """
+    Estimates yaw and roll in degrees from a YuNet detection row.
+
+    Roll is the angle of the line between the eyes. Yaw comes from how far the nose tip is off the
+    middle between the eyes (with roll removed): turning the head by `yaw` moves the nose by
+    NOSE_DEPTH * tan(yaw) eye distances.
+    """
+    right_eye, left_eye, nose = np.asarray(face[4:10], dtype=np.float64).reshape(3, 2)
+    dx, dy = left_eye - right_eye
+    eye_distance = math.hypot(dx, dy)
+    if eye_distance < 1e-6:  # Degenerate landmarks.
+        return 90.0, 0.0
+    roll = math.degrees(math.atan2(dy, dx))
+    offset = nose - (right_eye + left_eye) / 2  # Nose relative to the middle of the eyes...
+    along = (offset[0] * dx + offset[1] * dy) / eye_distance  # ...along the eye line, i.e. with roll removed.
+    yaw = math.degrees(math.atan(along / eye_distance / NOSE_DEPTH))
+    return yaw, roll
+
+
+def sharpness(aligned_face):  # Blur measure.
+    """Returns the variance of the Laplacian of an aligned face crop (higher is sharper)."""
+    gray = cv2.cvtColor(aligned_face, cv2.COLOR_BGR2GRAY) if aligned_face.ndim == 3 else aligned_face
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def landmark_quality(face):  # The factors that need no pixels.
+    """Returns (quality, factors) from the box size, pose and detector score of a YuNet detection row."""
+    yaw, roll = estimate_pose(face)
+    factors = {'size': min(1.0, min(face[2], face[3]) / GOOD_FACE_SIZE),
+               'pose': max(0.0, 1.0 - abs(yaw) / MAX_YAW) * max(0.0, 1.0 - abs(roll) / MAX_ROLL),
+               'score': min(1.0, max(0.0, float(face[-1])))}
+    return factors['size'] * factors['pose'] * factors['score'], factors
+
+
+def face_quality(face, aligned_face):  # All four factors.
+    """Returns (quality, factors) of a detection and its aligned crop."""
+    quality, factors = landmark_quality(face)
+    factors['sharpness'] = min(1.0, sharpness(aligned_face) / GOOD_SHARPNESS)
+    return quality * factors['sharpness'], factors
+
+
+def weakest_factor(factors):  # Why a face was skipped.
+    return min(factors, key=factors.get)
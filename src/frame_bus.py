@@ -0,0 +1,307 @@
+# --- Import Necessary Libraries ---
+import cv2  # Import OpenCV for the camera capture process and frame resizing.
+import os  # Import os to detect the platform's shared-memory semantics.
+import time  # Import time for frame timestamps and polling.
+import argparse  # Import argparse to parse command-line arguments when running the script directly.
+import numpy as np  # Import numpy to view the shared memory as frames.
+from multiprocessing import shared_memory  # Import shared_memory for the zero-copy frame ring.
+from session_record import ReplayCapture, SESSION_EXT  # Import the player for recorded sessions.
+
+# --- Frame Bus Layout ---
+# One capture process publishes camera frames into a ring of slots in a named shared-memory block;
+# any number of processes (recognizer, recorder, GUI preview, analytics) read them without opening
+# the camera and without copying through pipes.
+#
+#   [bus header 64 B][slot headers slots x 64 B][frame 0][frame 1]...[frame slots-1]
+#
+# Every slot header is a seqlock: the publisher makes `seq` odd while it writes the slot and even
+# (2 * frame_number + 2) when the frame is complete. A reader checks `seq` before and after it looks
+# at the frame, so a torn read (the publisher lapped the ring meanwhile) is always detected.
+BUS_MAGIC = 0x46425553  # "FBUS"
+BUS_VERSION = 1
+DEFAULT_BUS_NAME = 'face_rec_frames'  # Shared-memory name used by the camera publisher.
+DEFAULT_SLOTS = 4  # Frames kept in the ring; a zero-copy reader has (slots - 1) frame periods to finish.
+POLL_INTERVAL = 0.001  # Seconds between checks while waiting for a new frame.
+
+HEADER_DTYPE = np.dtype([('magic', '<u4'), ('version', '<u4'), ('height', '<u4'), ('width', '<u4'),
+                         ('channels', '<u4'), ('slots', '<u4'), ('latest', '<i8'), ('closed', '<u4'),
+                         ('_pad', '<u4', 7)])  # 64 bytes
+SLOT_DTYPE = np.dtype([('seq', '<u8'), ('frame_id', '<i8'), ('timestamp', '<f8'), ('_pad', '<u8', 5)])  # 64 bytes
+
+
+def _attach(name):  # Attaching readers must not unlink the block when they exit.
+    """Opens an existing segment without registering it with Python's resource tracker (POSIX).
+
+    Before Python 3.13 every attach was registered, so the tracker unlinked the publisher's
+    segment when a reader exited.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+    if os.name != 'posix':  # On Windows the block simply lives as long as any process has it open.
+        return shared_memory.SharedMemory(name=name)
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class FrameBus:  # Shared-memory ring of frames.
+    """
+    A named shared-memory ring of fixed-size frames with one publisher and any number of readers.
+
+    Args:
+        name (str): Shared-memory name
+        shape (tuple): (height, width, channels) of the frames; required when creating
+        slots (int): Number of frames in the ring (creator only)
+        create (bool): True in the publisher, False in readers
+    """
+
+    def __init__(self, name=DEFAULT_BUS_NAME, shape=None, slots=DEFAULT_SLOTS, create=False):  # The constructor method.
+        self.name = name
+        self.created = create
+        if create:
+            if shape is None:
+                raise ValueError("shape is required when creating a frame bus")
+            height, width, channels = tuple(shape) if len(shape) == 3 else tuple(shape) + (1,)  # Grey frames get one channel.
+            frame_bytes = height * width * channels
+            size = HEADER_DTYPE.itemsize + slots * SLOT_DTYPE.itemsize + slots * frame_bytes
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:  # Left over from a publisher that crashed (POSIX only).
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self._header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self._shm.buf)
+            self._header[0] = (BUS_MAGIC, BUS_VERSION, height, width, channels, slots, -1, 0, 0)
+            self._map()
+            self._slots['seq'] = 0
+        else:
+            self._shm = _attach(name)  # FileNotFoundError if there is no publisher.
+            self._header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self._shm.buf)
+            if self._header['magic'][0] != BUS_MAGIC or self._header['version'][0] > BUS_VERSION:
+                self._header = None
+                self._shm.close()
+                raise ValueError(f"'{name}' is not a frame bus")
+            self._map()
+
+    def _map(self):  # Numpy views over the shared block.
+        buf = self._shm.buf
+        h = self._header[0]
+        self.shape = (int(h['height']), int(h['width']), int(h['channels']))
+        self.slots = int(h['slots'])
+        self._slots = np.ndarray((self.slots,), dtype=SLOT_DTYPE, buffer=buf, offset=HEADER_DTYPE.itemsize)
+        offset = HEADER_DTYPE.itemsize + self.slots * SLOT_DTYPE.itemsize
+        self._frames = np.ndarray((self.slots,) + self.shape, dtype=np.uint8, buffer=buf, offset=offset)
+
+    # --- Publisher ---
+    def publish(self, frame, frame_id=None, timestamp=None):  # One copy into shared memory.
+        """Writes a frame into the next slot and returns its sequence number."""
+        seq = int(self._header['latest'][0]) + 1
+        slot = seq % self.slots
+        frame = np.asarray(frame).reshape(self.shape)
+        self._slots['seq'][slot] = 2 * seq + 1  # Odd: slot is being written.
+        np.copyto(self._frames[slot], frame)
+        self._slots['frame_id'][slot] = seq if frame_id is None else frame_id
+        self._slots['timestamp'][slot] = time.perf_counter() if timestamp is None else timestamp
+        self._slots['seq'][slot] = 2 * seq + 2  # Even: frame complete.
+        self._header['latest'] = seq  # Readers look here first.
+        return seq
+
+    # --- Readers ---
+    @property
+    def latest_seq(self):
+        """Sequence number of the newest complete frame (-1 before the first frame)."""
+        return int(self._header['latest'][0])
+
+    @property
+    def closed(self):
+        """True once the publisher has shut down."""
+        return bool(self._header['closed'][0])
+
+    def is_valid(self, seq):  # For zero-copy readers.
+        """True while frame `seq` has not been overwritten. Check it after using a zero-copy view."""
+        return int(self._slots['seq'][seq % self.slots]) == 2 * seq + 2
+
+    def read(self, seq=None, copy=True, out=None):  # Read one frame.
+        """
+        Reads frame `seq` (default: the newest one).
+
+        Args:
+            seq (int): Sequence number, or None for the newest frame
+            copy (bool): Return a private copy. False returns a view into shared memory, which stays
+                valid until the publisher laps the ring (see `is_valid`)
+            out (np.ndarray): Optional preallocated buffer for the copy
+
+        Returns:
+            tuple: (seq, frame, frame_id, timestamp), or None if the frame is not (or no longer) available
+        """
+        for _ in range(3):  # A torn read is retried with the then-newest frame.
+            n = self.latest_seq if seq is None else seq
+            if n < 0:
+                return None
+            slot = n % self.slots
+            expected = 2 * n + 2
+            if int(self._slots['seq'][slot]) != expected:
+                if seq is not None:
+                    return None  # Overwritten (or not written yet).
+                continue
+            frame_id = int(self._slots['frame_id'][slot])
+            timestamp = float(self._slots['timestamp'][slot])
+            view = self._frames[slot]
+            if not copy:
+                return n, view, frame_id, timestamp
+            if out is None:
+                out = np.empty(self.shape, dtype=np.uint8)
+            np.copyto(out, view)
+            if int(self._slots['seq'][slot]) == expected:  # Nothing changed while copying.
+                return n, out, frame_id, timestamp
+            if seq is not None:
+                return None
+        return None
+
+    def wait(self, after_seq, timeout=1.0, copy=True, out=None):  # Block until a newer frame exists.
+        """Returns the newest frame with a sequence number above `after_seq`, or None on timeout or shutdown."""
+        deadline = time.perf_counter() + timeout
+        while True:
+            if self.latest_seq > after_seq:
+                result = self.read(copy=copy, out=out)
+                if result is not None:
+                    return result
+            if self.closed or time.perf_counter() > deadline:
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    # --- Cleanup ---
+    def close(self):  # Detach.
+        """Marks the bus closed (publisher) and detaches from the shared memory."""
+        if self._shm is None:
+            return
+        if self.created:
+            self._header['closed'] = 1  # Readers stop waiting.
+        self._header = self._slots = self._frames = None  # Views must go before the buffer is released.
+        self._shm.close()
+        if self.created:
+            try:
+                self._shm.unlink()  # POSIX: remove the name. Windows: freed when the last process detaches.
+            except FileNotFoundError:
+                pass
+        self._shm = None
+
+
+class FrameBusCapture:  # Drop-in for cv2.VideoCapture in consumers.
+    """
+    Reads frames from a FrameBus with the cv2.VideoCapture interface (`read`, `isOpened`, `release`, `get`).
+
+    `read()` returns the newest frame that this reader has not seen yet. Frames published while the
+    reader was busy are skipped, so a slow consumer never falls behind the camera.
+    """
+
+    def __init__(self, name=DEFAULT_BUS_NAME, timeout=2.0, copy=True):  # The constructor method.
+        """
+        Args:
+            name (str): Shared-memory name of the bus
+            timeout (float): Seconds without a new frame after which `read()` fails
+            copy (bool): False returns zero-copy views (valid for about `slots - 1` frame periods)
+        """
+        self.timeout = timeout
+        self.copy = copy
+        self.last_seq = -1
+        self.last_timestamp = None  # Publish time (time.perf_counter) of the last frame returned.
+        self.dropped = 0  # Frames skipped because the reader was slower than the publisher.
+        try:
+            self.bus = FrameBus(name)
+        except (FileNotFoundError, ValueError):
+            self.bus = None
+
+    def isOpened(self):
+        return self.bus is not None and not self.bus.closed
+
+    def read(self):  # Same contract as cv2.VideoCapture.read().
+        """Returns (True, frame) with the next new frame, or (False, None) on timeout or shutdown."""
+        if self.bus is None:
+            return False, None
+        result = self.bus.wait(self.last_seq, timeout=self.timeout, copy=self.copy)  # A fresh array per frame, as VideoCapture does.
+        if result is None:
+            return False, None
+        seq, frame, _, self.last_timestamp = result
+        if self.last_seq >= 0:
+            self.dropped += max(0, seq - self.last_seq - 1)
+        self.last_seq = seq
+        return True, frame
+
+    def get(self, prop_id):  # Only the frame geometry is known.
+        if self.bus is None:
+            return 0.0
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.bus.shape[1])
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.bus.shape[0])
+        return 0.0
+
+    def release(self):
+        if self.bus is not None:
+            self.bus.close()
+            self.bus = None
+
+
+def open_capture(source, replay_speed=1.0):  # Camera, stream URL, frame bus or recorded session.
+    """
+    Opens `source` as a capture: "bus:<name>" reads from a FrameBus, a `.frec` file replays a recorded
+    session (see session_record.py) at `replay_speed`, anything else goes to cv2.VideoCapture.
+    """
+    if isinstance(source, str) and source.startswith('bus:'):
+        return FrameBusCapture(source[4:] or DEFAULT_BUS_NAME)
+    if isinstance(source, str) and source.lower().endswith(SESSION_EXT):
+        return ReplayCapture(source, speed=replay_speed)
+    return cv2.VideoCapture(source)
+
+
+def publish_camera(camera_index=0, name=DEFAULT_BUS_NAME, slots=DEFAULT_SLOTS):  # The capture process.
+    """Opens the camera once and publishes every frame to the bus until the camera stops or Ctrl+C."""
+    cap = cv2.VideoCapture(camera_index)  # Initialize video capture from the specified camera index or URL.
+    if not cap.isOpened():
+        print(f"Error: Could not open camera with index '{camera_index}'.")
+        return
+    ret, frame = cap.read()
+    if not ret:
+        print("Error: Failed to capture frame.")
+        cap.release()
+        return
+
+    bus = FrameBus(name, shape=frame.shape, slots=slots, create=True)
+    print(f"Publishing {frame.shape[1]}x{frame.shape[0]} frames on frame bus '{name}'. Press Ctrl+C to stop.")
+    frames, start = 0, time.perf_counter()
+    try:
+        while ret:
+            if frame.shape != bus.shape:  # The stream changed resolution; keep the bus geometry.
+                frame = cv2.resize(frame, (bus.shape[1], bus.shape[0]))
+            bus.publish(frame)
+            frames += 1
+            ret, frame = cap.read()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        elapsed = time.perf_counter() - start
+        print(f"Published {frames} frames ({frames / max(elapsed, 1e-9):.1f} FPS).")
+        bus.close()
+        cap.release()
+
+
+if __name__ == '__main__':  # This block runs only when this script is executed directly.
+    parser = argparse.ArgumentParser(description="Publish camera frames to a shared-memory frame bus.")
+    parser.add_argument('--camera', type=str, default='0', help="Camera index or video stream URL. Default is 0.")
+    parser.add_argument('--name', default=DEFAULT_BUS_NAME, help=f"Shared-memory name. Default is {DEFAULT_BUS_NAME}.")
+    parser.add_argument('--slots', type=int, default=DEFAULT_SLOTS, help=f"Frames in the ring. Default is {DEFAULT_SLOTS}.")
+    args = parser.parse_args()
+
+    try:  # Try to convert the camera argument to an integer.
+        camera_source = int(args.camera)
+    except ValueError:  # If it fails (e.g., it's a URL), use it as a string.
+        camera_source = args.camera
+    publish_camera(camera_source, name=args.name, slots=args.slots)
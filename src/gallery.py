@@ -0,0 +1,613 @@
+# --- Import Necessary Libraries ---
+import os  # Import os to manage the gallery files.
+import json  # Import json for the human-readable manifest.
+import time  # Import time to create unique generation ids.
+import threading  # Import threading to watch the gallery for changes in the background.
+import pickle  # Import pickle to read and convert legacy embeddings.pkl files.
+import argparse  # Import argparse for the converter command line.
+from contextlib import contextmanager  # Import contextmanager for the manifest lock.
+import numpy as np  # Import numpy for the memory-mapped embedding matrices.
+if os.name == 'nt':
+    import msvcrt  # Import msvcrt for file locks on Windows.
+else:
+    import fcntl  # Import fcntl for file locks on POSIX systems.
+
+# --- Gallery Format (version 1) ---
+# models/gallery.json                        manifest: format, version, dtype, dim, name table and segment list
+# models/gallery_data/<id>.emb.npy           (rows, dim) L2-normalized float32/float16 embeddings (memory-mapped)
+# models/gallery_data/<id>.labels.npy        (rows,) int32 index into the manifest's name table (memory-mapped)
+# models/gallery_data/<id>.meta.npz          optional per-row source image and augmented flag (loaded on demand)
+#
+# Data files are never modified after they are written. A new gallery is published by writing
+# new files and then atomically replacing the manifest, so readers always see a complete gallery
+# and several recognizer processes share the same page-cache pages.
+#
+# Writers (training, enrollment, removal, compaction; possibly in different processes) take an
+# exclusive lock on models/gallery.json.lock around every read-modify-write of the manifest, so
+# no update is lost. A GalleryWriter streams its data files before it takes the lock; it marks
+# them with a <id>.writing file so that another writer's cleanup leaves them alone.
+GALLERY_FORMAT = 'face-gallery'
+GALLERY_VERSION = 1
+DATA_DIR_NAME = 'gallery_data'
+MATCH_BLOCK_ROWS = 65536  # Rows upcast at a time when matching against a float16 gallery.
+WATCH_INTERVAL = 1.0  # Seconds between checks of the manifest by GalleryWatcher.
+STALE_WRITING_SECONDS = 24 * 3600  # A .writing mark this old belongs to a writer that crashed.
+
+
+def _new_generation():  # Unique, sortable id for a set of data files.
+    """Returns a unique id used to name the data files of one gallery write."""
+    return f"g{time.time_ns():x}{os.getpid() & 0xffff:04x}"
+
+
+_held_locks = threading.local()  # Manifest locks held by the current thread (the lock is re-entrant).
+
+
+@contextmanager
+def manifest_lock(path):  # Serialize manifest updates across threads and processes.
+    """
+    Holds an exclusive lock on `path`.lock while the block runs. Re-entrant within one thread, so
+    e.g. remove_from_gallery() can compact the gallery while it holds the lock.
+    """
+    key = os.path.abspath(path)
+    held = getattr(_held_locks, 'paths', None)
+    if held is None:
+        held = _held_locks.paths = set()
+    if key in held:
+        yield
+        return
+    fd = os.open(path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.name == 'nt':
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)  # Retries for about 10 seconds, then raises.
+                    break
+                except OSError:
+                    pass
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            if os.name == 'nt':
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def _atomic_write_json(path, data):  # Publish a manifest.
+    """Writes JSON to a temporary file and renames it over `path` in one step."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class Gallery:  # A loaded, read-only gallery.
+    """
+    Read-only view of a gallery: one or more segments of embeddings plus a name table.
+
+    Attributes:
+        names (list): Name table; labels index into it. Removed persons are None.
+        segments (list): [(embeddings, labels)] arrays, memory-mapped when loaded from disk.
+        count (int): Total number of rows (including rows of removed persons).
+        dim (int): Embedding dimension.
+    """
+
+    def __init__(self, names, segments, path=None, manifest=None, meta_paths=None):  # The constructor method.
+        self.names = list(names)
+        self.segments = segments
+        self.path = path  # Manifest path (None for in-memory galleries).
+        self.manifest = manifest or {}
+        self.meta_paths = meta_paths or [None] * len(segments)
+        self.count = sum(len(labels) for _, labels in segments)
+        self.dim = segments[0][0].shape[1] if segments else 128
+        self.version = self.manifest.get('generation')  # Changes every time the gallery is rewritten.
+
+        # Rows that belong to removed persons are masked out of every match.
+        live = np.array([n is not None for n in self.names] or [True], dtype=bool)
+        self._dead_rows = [np.flatnonzero(~live[labels]) if not live.all() else None for _, labels in segments]
+
+    # --- Matching ---
+    def similarities(self, features):  # Cosine similarity against every row.
+        """Returns (M, count) cosine similarities for (M, dim) or (dim,) query features."""
+        q = np.asarray(features, dtype=np.float32).reshape(-1, self.dim)
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)  # Rows are stored normalized.
+        out = np.empty((q.shape[0], self.count), dtype=np.float32)
+        offset = 0
+        for (emb, labels), dead in zip(self.segments, self._dead_rows):
+            n = len(labels)
+            if emb.dtype == np.float32:
+                out[:, offset:offset + n] = q @ emb.T  # One matmul straight from the mapped pages.
+            else:  # float16 storage: upcast in bounded blocks.
+                for b0 in range(0, n, MATCH_BLOCK_ROWS):
+                    block = np.asarray(emb[b0:b0 + MATCH_BLOCK_ROWS], dtype=np.float32)
+                    out[:, offset + b0:offset + b0 + len(block)] = q @ block.T
+            if dead is not None and dead.size:
+                out[:, offset + dead] = -np.inf
+            offset += n
+        return out
+
+    def match(self, feature):  # Best match for one face.
+        """Returns (name, score, row) of the best match for one feature, or ("Unknown", -1.0, -1) if empty."""
+        if self.count == 0:
+            return "Unknown", -1.0, -1
+        scores = self.similarities(feature)[0]
+        row = int(np.argmax(scores))
+        if not np.isfinite(scores[row]):
+            return "Unknown", -1.0, -1
+        return self.name_of(row), float(scores[row]), row
+
+    def match_many(self, features):  # Best match for several faces in one matmul.
+        """Returns ([names], scores, rows) of the best match for each (M, dim) feature row."""
+        if self.count == 0 or len(features) == 0:
+            m = len(features)
+            return ["Unknown"] * m, np.full(m, -1.0, dtype=np.float32), np.full(m, -1)
+        scores = self.similarities(features)
+        rows = np.argmax(scores, axis=1)
+        best = scores[np.arange(len(rows)), rows]
+        names = [self.name_of(r) if np.isfinite(s) else "Unknown" for r, s in zip(rows, best)]
+        return names, best, rows
+
+    # --- Row Metadata ---
+    def labels(self):  # All labels as one array.
+        """Returns the (count,) label array of all segments."""
+        if not self.segments:
+            return np.zeros(0, dtype=np.int32)
+        return np.concatenate([np.asarray(labels) for _, labels in self.segments])
+
+    def name_of(self, row):  # Name of one row.
+        """Returns the person name of a global row index."""
+        for _, labels in self.segments:
+            if row < len(labels):
+                return self.names[int(labels[row])]
+            row -= len(labels)
+        raise IndexError(row)
+
+    def embeddings(self):  # All rows as one float32 array (a copy).
+        """Returns all embeddings as one (count, dim) float32 array."""
+        if not self.segments:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.concatenate([np.asarray(emb, dtype=np.float32) for emb, _ in self.segments])
+
+    def sources(self):  # Per-row source metadata, loaded on demand.
+        """Returns (sources, augmented) arrays, or (None, None) if any segment has no metadata."""
+        sources, augmented = [], []
+        for (emb, _), meta in zip(self.segments, self.meta_paths):
+            if meta is None:
+                return None, None
+            if isinstance(meta, dict):  # In-memory gallery.
+                sources.append(np.asarray(meta['sources']))
+                augmented.append(np.asarray(meta['augmented'], dtype=bool))
+            else:
+                with np.load(meta) as data:
+                    sources.append(data['sources'])
+                    augmented.append(data['augmented'].astype(bool))
+        if not sources:
+            return None, None
+        return np.concatenate(sources), np.concatenate(augmented)
+
+    def live_names(self):  # Persons currently in the gallery.
+        """Returns the sorted list of names that have not been removed."""
+        return sorted(n for n in self.names if n is not None)
+
+
+# --- Loading ---
+def load_gallery(path, mmap=True):  # Load either format.
+    """
+    Loads a gallery manifest (`.json`) or a legacy `embeddings.pkl`.
+
+    Args:
+        path (str): Manifest or pickle path
+        mmap (bool): Memory-map the embedding files instead of reading them (manifest only)
+
+    Returns:
+        Gallery: The loaded gallery
+    """
+    if path.endswith('.pkl'):  # Legacy format: convert in memory.
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        return gallery_from_arrays(np.vstack(data["embeddings"]), data["names"],
+                                   data.get("sources"), data.get("augmented"))
+
+    with open(path, 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('format') != GALLERY_FORMAT or manifest.get('version', 0) > GALLERY_VERSION:
+        raise ValueError(f"Unsupported gallery file '{path}' (format {manifest.get('format')}, version {manifest.get('version')})")
+
+    base = os.path.dirname(path)
+    mode = 'r' if mmap else None
+    segments, metas = [], []
+    for seg in manifest['segments']:
+        emb = np.load(os.path.join(base, seg['embeddings']), mmap_mode=mode)
+        labels = np.load(os.path.join(base, seg['labels']), mmap_mode=mode)
+        segments.append((emb, labels))
+        metas.append(os.path.join(base, seg['meta']) if seg.get('meta') else None)
+    return Gallery(manifest['names'], segments, path=path, manifest=manifest, meta_paths=metas)
+
+
+def gallery_from_arrays(embeddings, names, sources=None, augmented=None):  # Build an in-memory gallery.
+    """Builds an in-memory Gallery from an (N, dim) array and a list of N names."""
+    embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(names), -1)
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    table, labels = np.unique(np.asarray(names, dtype=str), return_inverse=True)
+    meta = None
+    if sources is not None:
+        meta = {'sources': np.asarray(sources, dtype=str),
+                'augmented': np.asarray(augmented if augmented is not None else [False] * len(names), dtype=bool)}
+    return Gallery([str(n) for n in table], [(embeddings, labels.astype(np.int32))], meta_paths=[meta])
+
+
+# --- Hot Reload ---
+class GalleryWatcher:  # Picks up a retrained gallery while the recognizer is running.
+    """
+    Watches a gallery manifest and loads new versions in a background thread.
+
+    The manifest is replaced atomically on every write, so a change of its modification time or
+    size means a complete new gallery is available. It is loaded (and its pages read once, so the
+    first match does not stall on disk reads) off the frame loop; the loop then calls `poll()`
+    between frames and swaps the returned gallery in with a single assignment.
+    """
+
+    def __init__(self, path, current=None, interval=WATCH_INTERVAL):  # The constructor method.
+        """
+        Args:
+            path (str): Manifest to watch (it does not need to exist yet)
+            current (Gallery): The gallery in use, so the same version is not loaded again
+            interval (float): Seconds between checks
+        """
+        self.path = path
+        self.interval = interval
+        self._version = current.version if current is not None else None
+        self._signature = None  # (mtime_ns, size) of the manifest last looked at.
+        self._pending = None  # Loaded gallery waiting to be picked up by poll().
+        self._last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='GalleryWatcher', daemon=True)
+
+    def start(self):  # Begin watching.
+        """Starts the background thread and returns self."""
+        self._thread.start()
+        return self
+
+    def stop(self):  # Stop watching.
+        """Stops the background thread."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=self.interval + 1.0)
+
+    def poll(self):  # Called by the frame loop.
+        """Returns a newly loaded Gallery once, or None if nothing changed. Never blocks on I/O."""
+        with self._lock:
+            gallery, self._pending = self._pending, None
+        return gallery
+
+    def _run(self):  # Background loop.
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self):  # One check of the manifest.
+        """Loads the manifest if it changed since the last check. Returns True if a new gallery is pending."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:  # Not written yet.
+            return False
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return False
+
+        try:
+            gallery = load_gallery(self.path)
+        except (OSError, ValueError, KeyError) as e:  # Retried on the next check.
+            if str(e) != self._last_error:
+                print(f"Warning: Could not reload gallery '{self.path}': {e}")
+                self._last_error = str(e)
+            return False
+        self._signature, self._last_error = signature, None
+        if gallery.version is not None and gallery.version == self._version:
+            return False  # Same gallery (e.g. the manifest was only touched).
+
+        if gallery.count:  # Read the mapped pages once here, not in the frame loop.
+            gallery.similarities(np.ones(gallery.dim, dtype=np.float32))
+        with self._lock:
+            self._pending = gallery
+        self._version = gallery.version
+        return True
+
+
+# --- Writing ---
+class GalleryWriter:  # Streams rows into a new gallery file set.
+    """
+    Writes a new single-segment gallery row by row with bounded memory.
+
+    The embedding and label files are created as memory-mapped `.npy` files of the final size, so
+    rows go straight to disk. `close()` publishes the gallery by replacing the manifest.
+    """
+
+    def __init__(self, path, count, dim=128, dtype='float32'):  # The constructor method.
+        """Creates the data files for `count` rows at manifest `path`."""
+        self.path = path
+        self.base = os.path.dirname(path)
+        self.dtype = np.dtype(dtype)
+        self.count = count
+        self.dim = dim
+        self.generation = _new_generation()
+        os.makedirs(os.path.join(self.base, DATA_DIR_NAME), exist_ok=True)
+        self._writing = os.path.join(self.base, DATA_DIR_NAME, f"{self.generation}.writing")
+        open(self._writing, 'w').close()  # Keeps other writers' cleanup away from the files below.
+
+        self._rel = {kind: f"{DATA_DIR_NAME}/{self.generation}.{kind}" for kind in ('emb.npy', 'labels.npy', 'meta.npz')}
+        self._emb = np.lib.format.open_memmap(os.path.join(self.base, self._rel['emb.npy']), mode='w+',
+                                              dtype=self.dtype, shape=(count, dim))
+        self._labels = np.lib.format.open_memmap(os.path.join(self.base, self._rel['labels.npy']), mode='w+',
+                                                 dtype=np.int32, shape=(count,))
+        self._names = {}  # name -> label
+        self._sources = []
+        self._augmented = []
+        self._row = 0
+
+    def label_for(self, name):  # Name table lookup.
+        """Returns the label of `name`, adding it to the name table if needed."""
+        if name not in self._names:
+            self._names[name] = len(self._names)
+        return self._names[name]
+
+    def append(self, embeddings, name, source=None, augmented=None):  # Add rows of one person.
+        """Appends (k, dim) embeddings of one person; `source` is one string or k strings, `augmented` k flags."""
+        rows = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        rows = rows / np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)  # Store unit-length rows.
+        k = len(rows)
+        self._emb[self._row:self._row + k] = rows
+        self._labels[self._row:self._row + k] = self.label_for(name)
+        if source is None or isinstance(source, str):
+            self._sources.extend([source or ''] * k)
+        else:  # One source per row.
+            self._sources.extend(source)
+        self._augmented.extend(augmented if augmented is not None else [False] * k)
+        self._row += k
+
+    def close(self):  # Publish.
+        """Flushes the data files, writes the metadata and atomically replaces the manifest."""
+        if self._row != self.count:
+            raise ValueError(f"GalleryWriter expected {self.count} rows but got {self._row}")
+        self._emb.flush()
+        self._labels.flush()
+        del self._emb, self._labels  # Close the memory maps before the files are published.
+        np.savez(os.path.join(self.base, self._rel['meta.npz']),
+                 sources=np.asarray(self._sources, dtype=str), augmented=np.asarray(self._augmented, dtype=np.uint8))
+
+        names = [None] * len(self._names)
+        for name, label in self._names.items():
+            names[label] = name
+        manifest = {
+            'format': GALLERY_FORMAT,
+            'version': GALLERY_VERSION,
+            'generation': self.generation,
+            'dtype': self.dtype.name,
+            'dim': self.dim,
+            'normalized': True,
+            'count': self.count,
+            'names': names,
+            'segments': [{'embeddings': self._rel['emb.npy'], 'labels': self._rel['labels.npy'],
+                          'meta': self._rel['meta.npz'], 'count': self.count}],
+        }
+        with manifest_lock(self.path):
+            _atomic_write_json(self.path, manifest)
+            os.remove(self._writing)
+            cleanup_data_files(self.path)
+
+
+def write_gallery(path, embeddings, names, sources=None, augmented=None, dtype='float32'):  # One-shot writer.
+    """Writes an (N, dim) embedding array and its N names as a new gallery at manifest `path`."""
+    embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(names), -1)
+    writer = GalleryWriter(path, len(names), dim=embeddings.shape[1], dtype=dtype)
+    for i, name in enumerate(names):
+        writer.append(embeddings[i], name,
+                      sources[i] if sources is not None else None,
+                      [bool(augmented[i])] if augmented is not None else None)
+    writer.close()
+
+
+# --- In-Place Updates ---
+# Enrolling a person adds a new segment next to the existing ones and republishes the manifest, so
+# the cost depends only on the new rows. Removing a person only clears their entry in the name
+# table; their rows are masked out of matching and dropped at the next compaction or full retrain.
+
+def _read_manifest(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def append_to_gallery(path, embeddings, name, sources=None, augmented=None):  # Enroll without a rewrite.
+    """
+    Appends the embeddings of one person to an existing gallery as a new segment.
+
+    Args:
+        path (str): Manifest path
+        embeddings (np.ndarray): (k, dim) embeddings
+        name (str): Person name (an existing person gets more rows)
+        sources (list): Optional k source image names
+        augmented (list): Optional k flags, True for augmented copies
+
+    Returns:
+        dict: The published manifest
+    """
+    with manifest_lock(path):  # Read, extend and publish the manifest without another writer in between.
+        manifest = _read_manifest(path)
+        base = os.path.dirname(path)
+        rows = np.asarray(embeddings, dtype=np.float32).reshape(-1, manifest['dim'])
+        rows = rows / np.maximum(np.linalg.norm(rows, axis=1, keepdims=True), 1e-12)  # Store unit-length rows.
+        k = len(rows)
+
+        names = manifest['names']
+        if name in names:  # Existing person: reuse the label.
+            label = names.index(name)
+        else:
+            names.append(name)
+            label = len(names) - 1
+
+        generation = _new_generation()
+        rel = {kind: f"{DATA_DIR_NAME}/{generation}.{kind}" for kind in ('emb.npy', 'labels.npy', 'meta.npz')}
+        os.makedirs(os.path.join(base, DATA_DIR_NAME), exist_ok=True)
+        np.save(os.path.join(base, rel['emb.npy']), rows.astype(manifest['dtype']))
+        np.save(os.path.join(base, rel['labels.npy']), np.full(k, label, dtype=np.int32))
+        np.savez(os.path.join(base, rel['meta.npz']),
+                 sources=np.asarray(sources if sources is not None else [''] * k, dtype=str),
+                 augmented=np.asarray(augmented if augmented is not None else [False] * k, dtype=np.uint8))
+
+        manifest['segments'].append({'embeddings': rel['emb.npy'], 'labels': rel['labels.npy'],
+                                     'meta': rel['meta.npz'], 'count': k})
+        manifest['count'] += k
+        manifest['generation'] = generation
+        _atomic_write_json(path, manifest)  # Publish: running recognizers pick it up from here.
+        return manifest
+
+
+def remove_from_gallery(path, name, max_garbage=0.5):  # Remove without a rewrite.
+    """
+    Removes a person from the gallery by clearing their name table entry.
+
+    Args:
+        path (str): Manifest path
+        name (str): Person to remove
+        max_garbage (float): Compact the gallery once more than this fraction of rows belongs to removed persons
+
+    Returns:
+        int: Number of rows removed (0 if the person was not in the gallery)
+    """
+    with manifest_lock(path):  # Compaction below runs under the same lock.
+        manifest = _read_manifest(path)
+        if name not in manifest['names']:
+            return 0
+        label = manifest['names'].index(name)
+        manifest['names'][label] = None
+        manifest['generation'] = _new_generation()
+
+        # Count the dead rows from the label files (small int32 arrays, memory-mapped).
+        base = os.path.dirname(path)
+        dead = np.array([n is None for n in manifest['names']], dtype=bool)
+        removed, dead_rows = 0, 0
+        for seg in manifest['segments']:
+            labels = np.load(os.path.join(base, seg['labels']), mmap_mode='r')
+            removed += int(np.count_nonzero(labels == label))
+            dead_rows += int(np.count_nonzero(dead[labels]))
+        _atomic_write_json(path, manifest)
+
+        if manifest['count'] and dead_rows > max_garbage * manifest['count']:
+            compact_gallery(path)
+        return removed
+
+
+def compact_gallery(path):  # Merge all segments and drop removed rows.
+    """Rewrites the gallery as one segment without the rows of removed persons."""
+    with manifest_lock(path):  # No segment may be added between reading and replacing the gallery.
+        gallery = load_gallery(path)
+        sources, augmented = gallery.sources()
+        live = np.array([n is not None for n in gallery.names] or [True], dtype=bool)
+        total = sum(int(np.count_nonzero(live[labels])) for _, labels in gallery.segments)
+        writer = GalleryWriter(path, total, dim=gallery.dim, dtype=gallery.manifest.get('dtype', 'float32'))
+        offset = 0
+        for emb, labels in gallery.segments:  # One person of one segment at a time.
+            labels = np.asarray(labels)
+            for label in np.unique(labels):
+                if not live[label]:
+                    continue
+                rows = np.flatnonzero(labels == label)
+                writer.append(np.asarray(emb[rows], dtype=np.float32), gallery.names[label],
+                              list(sources[offset + rows]) if sources is not None else None,
+                              list(augmented[offset + rows]) if augmented is not None else None)
+            offset += len(labels)
+        gallery = emb = labels = None  # Release the old maps so their files can be removed (required on Windows).
+        writer.close()
+        return total
+
+
+def cleanup_data_files(path):  # Remove files no longer referenced by the manifest.
+    """Deletes data files that the current manifest does not reference.
+
+    Files newer than the manifest, and files of a GalleryWriter that is still writing, belong to a
+    gallery that is not published yet and are kept. Files still mapped by a running recognizer
+    cannot be deleted on Windows; they are left in place and removed by a later write.
+    """
+    base = os.path.dirname(path)
+    data_dir = os.path.join(base, DATA_DIR_NAME)
+    with manifest_lock(path):
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        keep = set()
+        for seg in manifest['segments']:
+            keep.update(os.path.basename(seg[k]) for k in ('embeddings', 'labels', 'meta') if seg.get(k))
+        published = manifest.get('generation') or ''
+        files = os.listdir(data_dir)
+        writing = set()
+        for name in files:
+            if name.endswith('.writing'):
+                marker = os.path.join(data_dir, name)
+                try:
+                    if time.time() - os.path.getmtime(marker) < STALE_WRITING_SECONDS:
+                        writing.add(name.split('.')[0])
+                    else:  # Left behind by a writer that crashed.
+                        os.remove(marker)
+                except OSError:
+                    pass
+        for name in files:
+            generation = name.split('.')[0]
+            if name in keep or name.endswith('.writing') or generation in writing or generation > published:
+                continue
+            try:
+                os.remove(os.path.join(data_dir, name))
+            except OSError:  # Still in use by a reader.
+                pass
+
+
+def convert_pickle(pickle_path, gallery_path, dtype='float32'):  # Legacy converter.
+    """Converts a legacy embeddings.pkl into the memory-mapped gallery format."""
+    with open(pickle_path, 'rb') as f:
+        data = pickle.load(f)
+    write_gallery(gallery_path, np.vstack(data["embeddings"]), data["names"],
+                  data.get("sources"), data.get("augmented"), dtype=dtype)
+    return len(data["names"])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gallery file tools.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    conv = sub.add_parser('convert', help="Convert a legacy embeddings.pkl into the memory-mapped gallery format.")
+    conv.add_argument('pickle', nargs='?', default='models/embeddings.pkl', help="Default is models/embeddings.pkl.")
+    conv.add_argument('--out', default='models/gallery.json', help="Manifest path. Default is models/gallery.json.")
+    conv.add_argument('--dtype', choices=['float32', 'float16'], default='float32',
+                      help="Storage precision. float16 halves the file size. Default is float32.")
+    info = sub.add_parser('info', help="Show what a gallery contains.")
+    info.add_argument('path', nargs='?', default='models/gallery.json', help="Default is models/gallery.json.")
+    compact = sub.add_parser('compact', help="Merge enrollment segments and drop the rows of removed persons.")
+    compact.add_argument('path', nargs='?', default='models/gallery.json', help="Default is models/gallery.json.")
+    args = parser.parse_args()
+
+    if args.command == 'convert':
+        if not os.path.exists(args.pickle):
+            print(f"Error: Embeddings file not found at '{args.pickle}'")
+            raise SystemExit(1)
+        rows = convert_pickle(args.pickle, args.out, dtype=args.dtype)
+        print(f"Converted {rows} embeddings from '{args.pickle}' to '{args.out}' ({args.dtype})")
+    elif args.command == 'compact':
+        rows = compact_gallery(args.path)
+        print(f"Compacted '{args.path}' to {rows} embeddings in one segment")
+    else:
+        start = time.perf_counter()
+        gallery = load_gallery(args.path)
+        elapsed = time.perf_counter() - start
+        print(f"Gallery: {args.path} (generation {gallery.version})")
+        print(f"Rows: {gallery.count} | Dim: {gallery.dim} | Persons: {len(gallery.live_names())} | "
+              f"Segments: {len(gallery.segments)} | Loaded in {elapsed * 1000:.1f} ms")
+        labels = gallery.labels()
+        for label, name in enumerate(gallery.names):
+            if name is not None:
+                print(f"  • {name}: {int((labels == label).sum())} embeddings")
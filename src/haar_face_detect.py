@@ -1,38 +1,43 @@
-
 # Import the OpenCV library for computer vision tasks
 import cv2
+# Import argparse to read the command-line options
+import argparse
+# Import the shared detector factory, so this script finds faces exactly like training and recognition do.
+from face_detectors import create_detector, add_detector_arguments, detector_options
 
-# CASCADE_PATH is a variable that stores the full path to the Haar Cascade XML file for face detection.
-# cv2.data.haarcascades gives the directory where OpenCV stores its pre-trained Haar Cascade files.
-# 'haarcascade_frontalface_default.xml' is a pre-trained model for detecting front-facing human faces.
-CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-
-# face_cascade is a variable that holds the loaded Haar Cascade classifier object.
-# cv2.CascadeClassifier loads the XML file so it can be used to detect faces in images.
-face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
+# HAAR_DETECTOR holds the options of the default detector: OpenCV's frontal-face Haar cascade
+# ('haarcascade_frontalface_default.xml'), loaded by face_detectors.create_detector().
+# --detector on the command line picks another backend (see face_detectors.py).
+HAAR_DETECTOR = {'backend': 'haar'}
 
 
-def detect_faces(image_path, show_result=True):
+def detect_faces(image_path, show_result=True, detector=None):
     """
-    Detect faces in an image using Haar Cascade.
+    Detect faces in an image using Haar Cascade (or another face_detectors backend).
     Args:
         image_path (str): Path to the input image file (e.g., 'photo.jpg').
         show_result (bool): If True, show the image with rectangles drawn around detected faces.
+        detector (dict): Options for face_detectors.create_detector() (None = the Haar cascade).
     Returns:
         faces (list): List of rectangles (x, y, w, h) for each detected face.
     """
+    # Load the face detector. create_detector() prints the reason and returns None if a model is missing.
+    face_detector = create_detector(**(detector or HAAR_DETECTOR))
+    if face_detector is None:
+        return []
     # Read the image from the given file path. img will be a numpy array representing the image.
     img = cv2.imread(image_path)
     # If the image could not be loaded (e.g., wrong path), raise an error.
     if img is None:
         raise FileNotFoundError(f"Image not found: {image_path}")
-    # Convert the image to grayscale (face detection works better on grayscale images).
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    # Detect faces in the grayscale image using the loaded Haar Cascade classifier.
-    # detectMultiScale returns a list of rectangles, each representing a detected face.
-    # scaleFactor=1.1 means the image is reduced by 10% at each scale.
-    # minNeighbors=5 means each candidate rectangle should have at least 5 neighbors to be retained.
-    faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
+    # Detect faces in the image. The detector converts to grayscale itself for the Haar cascade.
+    # The Haar cascade's defaults: scaleFactor=1.1 means the image is reduced by 10% at each scale,
+    # and minNeighbors=5 means each candidate rectangle should have at least 5 neighbors to be retained.
+    # Every backend returns (N, 15) rows (box, five landmarks, score) or None if there is no face.
+    face_detector.setInputSize((img.shape[1], img.shape[0]))
+    _, found = face_detector.detect(img)
+    # Keep only the boxes, as whole-pixel (x, y, w, h) rectangles.
+    faces = [] if found is None else [tuple(int(v) for v in row[:4]) for row in found]
     # If show_result is True, draw rectangles around detected faces and display the image.
     if show_result:
         for (x, y, w, h) in faces:
@@ -49,11 +54,11 @@ def detect_faces(image_path, show_result=True):
 
 # This block runs only if the script is executed directly (not imported as a module).
 if __name__ == "__main__":
-    # Import the sys module to access command-line arguments.
-    import sys
-    # If the user did not provide an image path, print usage instructions.
-    if len(sys.argv) < 2:
-        print("Usage: python haar_face_detect.py <image_path>")
-    else:
-        # Call the detect_faces function with the image path provided by the user.
-        detect_faces(sys.argv[1])
+    # Read the command-line options: the image path and the detector settings.
+    parser = argparse.ArgumentParser(description="Detect faces in an image with a Haar cascade.")
+    parser.add_argument('image_path', help="Path to the input image file.")
+    add_detector_arguments(parser)  # --detector and the Haar cascade settings.
+    parser.set_defaults(detector='haar')  # This script's default is the Haar cascade.
+    args = parser.parse_args()
+    # Call the detect_faces function with the image path provided by the user.
+    detect_faces(args.image_path, detector=detector_options(args))
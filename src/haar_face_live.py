@@ -4,59 +4,297 @@
 
 # Import the OpenCV library for computer vision tasks
 import cv2
+# Import os to tell video files from cameras
+import os
+# Import math to turn the camera's field of view into a focal length
+import math
+# Import time to measure frames per second
+import time
+# Import threading so detection can run next to capture and display
+import threading
+# Import argparse to read the command-line options
+import argparse
+# Import the shared detector factory, so this demo finds faces exactly like training and recognition do
+from face_detectors import create_detector, add_detector_arguments, detector_options
 
-# CASCADE_PATH is a variable that stores the full path to the Haar Cascade XML file for face detection.
-# cv2.data.haarcascades gives the directory where OpenCV stores its pre-trained Haar Cascade files.
-# 'haarcascade_frontalface_default.xml' is a pre-trained model for detecting front-facing human faces.
-CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+# HAAR_DETECTOR holds the options of the default detector: OpenCV's frontal-face Haar cascade
+# ('haarcascade_frontalface_default.xml'), loaded by face_detectors.create_detector().
+# The normal mode can use any backend (--detector); the fast mode always uses the cascade of the
+# Haar backend, because its size-limited and ROI searches are cascade features.
+HAAR_DETECTOR = {'backend': 'haar'}
 
-# face_cascade is a variable that holds the loaded Haar Cascade classifier object.
-# cv2.CascadeClassifier loads the XML file so it can be used to detect faces in images.
-face_cascade = cv2.CascadeClassifier(CASCADE_PATH)
+# --- Fast Mode Settings ---
+# The fast mode avoids most of the work the normal mode repeats on every frame:
+# - the frame is shrunk before detection, as far as the smallest expected face allows;
+# - the detection pyramid only covers the face sizes the camera can actually see (min/max size),
+#   worked out from the camera's field of view and the nearest and farthest distance of a person;
+# - between full scans, only the regions around the faces of the previous detection are searched,
+#   and only at sizes close to those faces; a full scan every FULL_SCAN_EVERY detections finds new people;
+# - detection runs on its own thread, so capture and display never wait for it.
+FAST_SCALE_FACTOR = 1.2  # Pyramid step of the fast mode (the normal mode uses 1.1).
+CAMERA_FOV_DEGREES = 60.0  # Horizontal field of view of a typical webcam.
+MIN_DISTANCE_M = 0.4  # Nearest distance of a face to the camera.
+MAX_DISTANCE_M = 2.5  # Farthest distance at which faces should still be found.
+FACE_WIDTH_M = 0.15  # Approximate width of a human face.
+CASCADE_WINDOW = 24  # The cascade's own window size; smaller faces can never be found.
+FULL_SCAN_EVERY = 10  # Detections between full-frame scans.
+ROI_MARGIN = 0.5  # A previous face is searched again in its box plus this fraction of its size around it.
+ROI_SIZE_RANGE = (0.7, 1.4)  # ...and only for faces between these multiples of its previous size.
 
-def detect_faces_live():
+
+def face_size_range(frame_width, fov_degrees=CAMERA_FOV_DEGREES, min_distance=MIN_DISTANCE_M,
+                    max_distance=MAX_DISTANCE_M, face_width=FACE_WIDTH_M):
+    """
+    Returns the (smallest, largest) face width in pixels a camera can see, from its geometry.
+    Args:
+        frame_width (int): Width of the camera frames in pixels.
+        fov_degrees (float): Horizontal field of view of the camera.
+        min_distance, max_distance (float): Nearest and farthest distance of a face in meters.
+        face_width (float): Width of a face in meters.
+    """
+    # The focal length in pixels: half the frame width covers half the field of view.
+    focal_px = (frame_width / 2) / math.tan(math.radians(fov_degrees) / 2)
+    # A face of face_width meters at distance d meters is face_width * focal_px / d pixels wide.
+    return face_width * focal_px / max_distance, min(frame_width, face_width * focal_px / min_distance)
+
+
+def _overlap(a, b):
+    """Intersection over union of two (x, y, w, h) rectangles."""
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    return inter / float(a[2] * a[3] + b[2] * b[3] - inter)
+
+
+class FastFaceDetector:
+    """
+    Haar detection with a downscaled, size-limited pyramid and region-of-interest search around the previous faces.
+    Args:
+        frame_width (int): Width of the camera frames; the face size range is derived from it.
+        cascade (cv2.CascadeClassifier): The loaded cascade (the `cascade` of a face_detectors.HaarDetector).
+        downscale (float): Shrink factor before detection. None chooses the largest one that still keeps
+                           the smallest expected face at the cascade's 24 pixel window.
+        scale_factor (float): Pyramid step.
+        full_scan_every (int): Detections between full-frame scans.
+        fov_degrees, min_distance, max_distance: Camera geometry (see face_size_range).
+    """
+
+    def __init__(self, frame_width, cascade, downscale=None, scale_factor=FAST_SCALE_FACTOR, full_scan_every=FULL_SCAN_EVERY,
+                 fov_degrees=CAMERA_FOV_DEGREES, min_distance=MIN_DISTANCE_M, max_distance=MAX_DISTANCE_M):
+        self.cascade = cascade
+        self.min_face, self.max_face = face_size_range(frame_width, fov_degrees, min_distance, max_distance)
+        # Downscale as far as the smallest expected face allows.
+        self.downscale = downscale if downscale else max(1.0, self.min_face / CASCADE_WINDOW)
+        self.scale_factor = scale_factor
+        self.full_scan_every = full_scan_every
+        self.faces = []  # Faces of the previous detection, (x, y, w, h) in full-frame pixels.
+        self.count = 0  # Detections so far.
+
+    def _detect(self, gray, min_size, max_size):
+        """Runs the cascade on a (downscaled) grayscale image; sizes are in full-frame pixels."""
+        lo = max(CASCADE_WINDOW, int(min_size / self.downscale))
+        hi = max(lo, int(max_size / self.downscale))
+        return self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=5,
+                                             minSize=(lo, lo), maxSize=(hi, hi))
+
+    def detect(self, frame):
+        """Returns the faces in a BGR frame as a list of (x, y, w, h) rectangles in full-frame pixels."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.downscale > 1.0:  # Shrink once; every search below works on the small image.
+            gray = cv2.resize(gray, (int(gray.shape[1] / self.downscale), int(gray.shape[0] / self.downscale)),
+                              interpolation=cv2.INTER_AREA)
+        d = self.downscale
+        found = []
+        if self.count % self.full_scan_every == 0 or not self.faces:
+            # Full scan, limited to the face sizes the camera can see.
+            found = [(x * d, y * d, w * d, h * d) for (x, y, w, h) in self._detect(gray, self.min_face, self.max_face)]
+        else:
+            # Search only around the previous faces, at sizes close to theirs.
+            for (px, py, pw, ph) in self.faces:
+                m = ROI_MARGIN * pw
+                x0, y0 = int(max(0, (px - m) / d)), int(max(0, (py - m) / d))
+                x1, y1 = int(min(gray.shape[1], (px + pw + m) / d)), int(min(gray.shape[0], (py + ph + m) / d))
+                roi = gray[y0:y1, x0:x1]
+                for (x, y, w, h) in self._detect(roi, pw * ROI_SIZE_RANGE[0], pw * ROI_SIZE_RANGE[1]):
+                    face = ((x + x0) * d, (y + y0) * d, w * d, h * d)
+                    if all(_overlap(face, other) < 0.3 for other in found):  # Regions can overlap.
+                        found.append(face)
+        self.count += 1
+        self.faces = [tuple(int(v) for v in face) for face in found]
+        return self.faces
+
+
+class DetectionThread(threading.Thread):
+    """Runs a FastFaceDetector on the newest frame, so capture and display never wait for detection."""
+
+    def __init__(self, detector):
+        super().__init__(daemon=True)
+        self.detector = detector
+        self.frame = None  # Newest frame waiting for detection (older ones are simply replaced).
+        self.faces = []  # Faces of the last finished detection.
+        self.detections = 0  # Finished detections, for the FPS report.
+        self.running = True
+        self.condition = threading.Condition()
+
+    def submit(self, frame):
+        """Hands the newest frame to the detection thread."""
+        with self.condition:
+            self.frame = frame
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.frame is None and self.running:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                frame, self.frame = self.frame, None
+            faces = self.detector.detect(frame)
+            self.faces = faces  # Replacing the list is atomic; the display thread reads it any time.
+            self.detections += 1
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+
+def detect_faces_live(camera_index=0, fast=False, show_window=True, max_frames=None, downscale=None,
+                      fov_degrees=CAMERA_FOV_DEGREES, min_distance=MIN_DISTANCE_M, max_distance=MAX_DISTANCE_M,
+                      detector=None):
     """
     Detect faces in real-time from webcam using Haar Cascade.
     Press 'q' to quit the live window.
+    Args:
+        camera_index (int or str): Webcam number, or a video file / stream URL.
+        fast (bool): Use the fast mode (downscaled, size-limited, ROI search, detection thread).
+        show_window (bool): Show the live window. Without it, the run ends at max_frames or the end of the video.
+        max_frames (int): Stop after this many frames (None = until 'q' or the end of the video).
+        downscale (float): Fast mode shrink factor (None = derived from the camera geometry).
+        fov_degrees, min_distance, max_distance: Camera geometry for the fast mode's face size range.
+        detector (dict): Options for face_detectors.create_detector() (None = the Haar cascade). The fast
+                         mode takes only the cascade file from them.
+    Returns:
+        stats (dict): frames, seconds, display FPS, detections per second and frames with a face shown.
     """
+    # Load the face detector: the chosen backend for the normal mode, the Haar cascade for the fast mode.
+    # create_detector() prints the reason and returns None if a model is missing.
+    options = detector or HAAR_DETECTOR
+    if fast:
+        options = dict(HAAR_DETECTOR, cascade_path=options.get('cascade_path'))
+    face_detector = create_detector(**options)
+    if face_detector is None:
+        return None
     # Open the default webcam (0 is usually the built-in camera, 1 for external)
-    cap = cv2.VideoCapture(0)
+    cap = cv2.VideoCapture(camera_index)
     # Check if the webcam opened successfully
     if not cap.isOpened():
         print("Error: Could not open webcam.")
-        return
+        return None
     print("Webcam opened successfully. Press 'q' to quit.")
-    while True:
+    # A video file is played at its own frame rate, like a camera, so both modes see the same frames in time
+    file_fps = cap.get(cv2.CAP_PROP_FPS) if isinstance(camera_index, str) and os.path.isfile(camera_index) else 0
+    detection_thread = None  # Only used by the fast mode.
+    frames = detections = frames_with_faces = 0  # Counters for the FPS report.
+    start = time.perf_counter()
+    while max_frames is None or frames < max_frames:
         # Read a frame from the webcam
         ret, frame = cap.read()
         # ret is True if frame is read correctly, frame is the image from webcam
         if not ret:
             print("Error: Failed to capture frame.")
             break
-        # Convert the frame to grayscale (face detection works better on grayscale images)
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        # Detect faces in the grayscale frame using the loaded Haar Cascade classifier
-        # detectMultiScale returns a list of rectangles, each representing a detected face
-        # scaleFactor=1.1 means the image is reduced by 10% at each scale
-        # minNeighbors=5 means each candidate rectangle should have at least 5 neighbors to be retained
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5)
+        if file_fps > 0:  # Wait until this frame of the video is due (no wait if we are behind).
+            delay = start + frames / file_fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if fast:
+            # Fast mode: hand the frame to the detection thread and draw the newest faces it has found.
+            if detection_thread is None:  # Start it with the first frame, which gives the frame size.
+                detector = FastFaceDetector(frame.shape[1], face_detector.cascade, downscale, fov_degrees=fov_degrees,
+                                            min_distance=min_distance, max_distance=max_distance)
+                print(f"Fast mode: faces {detector.min_face:.0f}-{detector.max_face:.0f} px, "
+                      f"downscale {detector.downscale:.2f}, full scan every {detector.full_scan_every} detections.")
+                detection_thread = DetectionThread(detector)
+                detection_thread.start()
+            # A copy, because the boxes and FPS text below are drawn onto `frame` while the thread detects;
+            # the cascade would otherwise see old boxes right where it searches next.
+            detection_thread.submit(frame.copy())
+            faces = detection_thread.faces
+        else:
+            # Detect faces in the whole frame with the loaded detector (the Haar cascade converts to grayscale itself)
+            # The Haar cascade's defaults: scaleFactor=1.1 means the image is reduced by 10% at each scale,
+            # and minNeighbors=5 means each candidate rectangle should have at least 5 neighbors to be retained
+            face_detector.setInputSize((frame.shape[1], frame.shape[0]))
+            _, found = face_detector.detect(frame)
+            # Keep only the boxes (x, y, w, h) of the (N, 15) rows every backend returns
+            faces = [] if found is None else [tuple(int(v) for v in row[:4]) for row in found]
+            detections += 1
+        frames += 1
+        frames_with_faces += len(faces) > 0
         # For each detected face, draw a blue rectangle (BGR: 255,0,0) around it
         for (x, y, w, h) in faces:
             cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
-        # Show the frame with rectangles in a window titled 'Live Face Detection (Press q to quit)'
-        cv2.imshow('Live Face Detection (Press q to quit)', frame)
-        # Wait for 1 millisecond for a key press; if 'q' is pressed, exit the loop
-        # cv2.waitKey returns a 32-bit integer; & 0xFF gets the last 8 bits (the key code)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            print("'q' pressed. Exiting...")
-            break
+        if show_window:
+            # Show the current frames per second in the top-left corner
+            fps = frames / max(time.perf_counter() - start, 1e-9)
+            cv2.putText(frame, f"FPS: {fps:.1f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+            # Show the frame with rectangles in a window titled 'Live Face Detection (Press q to quit)'
+            cv2.imshow('Live Face Detection (Press q to quit)', frame)
+            # Wait for 1 millisecond for a key press; if 'q' is pressed, exit the loop
+            # cv2.waitKey returns a 32-bit integer; & 0xFF gets the last 8 bits (the key code)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                print("'q' pressed. Exiting...")
+                break
+    seconds = time.perf_counter() - start
+    if detection_thread is not None:
+        detection_thread.stop()
+        detection_thread.join()
+        detections = detection_thread.detections
     # Release the webcam resource
     cap.release()
     # Close all OpenCV windows
-    cv2.destroyAllWindows()
+    if show_window:
+        cv2.destroyAllWindows()
     print("Webcam released and windows closed.")
+    # Report the speed: frames shown per second, and how many of them got a fresh detection
+    stats = {'frames': frames, 'seconds': seconds, 'fps': frames / max(seconds, 1e-9),
+             'detections_per_second': detections / max(seconds, 1e-9), 'frames_with_faces': frames_with_faces}
+    print(f"{'Fast' if fast else 'Normal'} mode: {stats['fps']:.1f} FPS, {stats['detections_per_second']:.1f} detections/s "
+          f"over {frames} frames, a face shown on {frames_with_faces} of them.")
+    return stats
 
 # This block runs only if the script is executed directly (not imported as a module)
 if __name__ == "__main__":
-    # Call the live face detection function
-    detect_faces_live()
+    # Read the command-line options
+    parser = argparse.ArgumentParser(description="Live face detection with a Haar cascade.")
+    add_detector_arguments(parser)  # --detector (normal mode) and the Haar cascade settings.
+    parser.set_defaults(detector='haar')  # This demo's default is the Haar cascade.
+    parser.add_argument('--camera', type=str, default='0', help="Camera index, video file or stream URL. Default is 0.")
+    parser.add_argument('--fast', action='store_true', help="Downscaled, size-limited detection with ROI search on its own thread.")
+    parser.add_argument('--compare', action='store_true', help="Run the normal and the fast mode one after the other and compare their FPS.")
+    parser.add_argument('--frames', type=int, default=None, help="Stop after this many frames (default: until 'q').")
+    parser.add_argument('--no-window', action='store_true', help="Don't show the window (for measuring).")
+    parser.add_argument('--downscale', type=float, default=None, help="Fast mode shrink factor (default: from the camera geometry).")
+    parser.add_argument('--fov', type=float, default=CAMERA_FOV_DEGREES, help=f"Horizontal field of view in degrees. Default is {CAMERA_FOV_DEGREES:g}.")
+    parser.add_argument('--min-distance', type=float, default=MIN_DISTANCE_M, help=f"Nearest face distance in meters. Default is {MIN_DISTANCE_M:g}.")
+    parser.add_argument('--max-distance', type=float, default=MAX_DISTANCE_M, help=f"Farthest face distance in meters. Default is {MAX_DISTANCE_M:g}.")
+    args = parser.parse_args()
+    try:  # Try to convert the camera argument to an integer.
+        camera_source = int(args.camera)
+    except ValueError:  # If it fails (e.g., a video file), use it as a string.
+        camera_source = args.camera
+    options = dict(show_window=not args.no_window, max_frames=args.frames, downscale=args.downscale,
+                   fov_degrees=args.fov, min_distance=args.min_distance, max_distance=args.max_distance,
+                   detector=detector_options(args))
+    if args.compare:
+        # Same source and frame count for both modes
+        normal = detect_faces_live(camera_source, fast=False, **options)
+        fast = detect_faces_live(camera_source, fast=True, **options)
+        if normal and fast:
+            print(f"Fast mode: {fast['fps'] / max(normal['fps'], 1e-9):.1f}x the FPS and "
+                  f"{fast['detections_per_second'] / max(normal['detections_per_second'], 1e-9):.1f}x the detections/s of the normal mode.")
+    else:
+        # Call the live face detection function
+        detect_faces_live(camera_source, fast=args.fast, **options)
@@ -0,0 +1,197 @@
+# --- Import Necessary Libraries ---
+import cv2  # Import OpenCV to decode the photos and run the models.
+import os  # Import os to walk the photo folders.
+import sys  # Import sys to write results to stdout.
+import csv  # Import csv for the CSV output.
+import json  # Import json for the JSONL output.
+import time  # Import time to report the processing speed.
+import argparse  # Import argparse to parse command-line arguments when running the script directly.
+from collections import deque  # Import deque for the prefetch queue.
+from concurrent.futures import ThreadPoolExecutor  # Import the thread pool that decodes photos ahead of the models.
+from multiprocessing import Pool  # Import Pool to identify photos in parallel worker processes.
+from gallery import load_gallery  # Import the gallery loader.
+from train_model import DETECTION_CONF_THRESHOLD  # Faces are accepted with the same confidence as in training.
+
+# --- Batch Photo Identification ---
+# Identifies every face in a folder tree or list of photos: YuNet detection, SFace embedding and
+# one gallery matrix product per photo, spread over a pool of worker processes. Every worker starts
+# a few threads once, which read and decode the next photos while the models run on the current one
+# (OpenCV releases the GIL while decoding), so the models never wait for the disk. Results are
+# written as soon as a batch of photos is done.
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp', '.tif', '.tiff')
+MAX_WIDTH = 1280  # Larger photos are downscaled to this width for detection (group photos keep small faces).
+BATCH_SIZE = 16  # Photos per worker task; results are written after every batch.
+PREFETCH_THREADS = 2  # Decoding threads per worker.
+PREFETCH_DEPTH = 4  # Photos decoded ahead of the one being identified.
+RESULT_FIELDS = ['path', 'face', 'x', 'y', 'w', 'h', 'detection_score', 'name', 'score', 'error']
+
+_worker = None  # (detector, recognizer, gallery, threshold, max width, min detection score), once per worker process.
+_prefetch = None  # The decoding thread pool of this worker process, shared by all of its batches.
+
+
+def find_photos(paths):  # Expand folders.
+    """Returns the photo files in `paths` (files are kept as given, folders are searched recursively)."""
+    photos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()  # Deterministic order.
+                photos.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            photos.append(path)
+    return photos
+
+
+def _init_worker(models_dir, gallery_path, threshold, max_width, min_score):  # Runs once in every worker process.
+    """Loads the models and the (memory-mapped, shared) gallery and starts the prefetch threads for this worker."""
+    global _worker, _prefetch
+    cv2.setNumThreads(1)  # Parallelism comes from the processes, not from OpenCV's internal threads.
+    _worker = (cv2.FaceDetectorYN.create(os.path.join(models_dir, 'face_detection_yunet_2023mar.onnx'), "", (0, 0)),
+               cv2.FaceRecognizerSF.create(os.path.join(models_dir, 'face_recognition_sface_2021dec.onnx'), ""),
+               load_gallery(gallery_path), threshold, max_width, min_score)
+    _prefetch = ThreadPoolExecutor(PREFETCH_THREADS)  # Started once, not per batch.
+
+
+def _decode(path):  # Runs on a prefetch thread.
+    """Reads and decodes one photo, downscaled to the detection width."""
+    image = cv2.imread(path)
+    if image is None:
+        return None, 1.0
+    h, w = image.shape[:2]
+    max_width = _worker[4]
+    if w <= max_width:
+        return image, 1.0
+    scale = max_width / w
+    return cv2.resize(image, (max_width, int(h * scale)), interpolation=cv2.INTER_AREA), scale
+
+
+def identify_image(image, scale, path):  # Every face of one decoded photo.
+    """Returns one result row per face (or one row with an error) for a decoded photo."""
+    face_detector, face_recognizer, gallery, threshold, _, min_score = _worker
+    if image is None:
+        return [dict(path=path, face=-1, error="could not read")]
+    h, w = image.shape[:2]
+    face_detector.setInputSize((w, h))
+    _, faces = face_detector.detect(image)
+    faces = [f for f in (faces if faces is not None else []) if f[-1] >= min_score]
+    if not faces:
+        return [dict(path=path, face=-1, error="no face detected")]
+    features = [face_recognizer.feature(face_recognizer.alignCrop(image, f)) for f in faces]
+    names, scores, _ = gallery.match_many([f.ravel() for f in features])  # One matrix product for all faces.
+    rows = []
+    for i, (face, name, score) in enumerate(zip(faces, names, scores)):
+        x, y, bw, bh = (int(round(v / scale)) for v in face[:4])  # Back to the photo's own pixels.
+        rows.append(dict(path=path, face=i, x=x, y=y, w=bw, h=bh, detection_score=round(float(face[-1]), 3),
+                         name=name if score > threshold else "Unknown", score=round(float(score), 4)))
+    return rows
+
+
+def _identify_batch(paths):  # Runs in a worker process for every batch.
+    """Identifies a batch of photos while the prefetch threads decode the next ones."""
+    rows = []
+    pending = deque()
+    queue = iter(paths)
+    for path in queue:  # Fill the prefetch queue.
+        pending.append((path, _prefetch.submit(_decode, path)))
+        if len(pending) >= PREFETCH_DEPTH:
+            break
+    while pending:
+        path, future = pending.popleft()
+        next_path = next(queue, None)
+        if next_path is not None:  # Keep the queue full.
+            pending.append((next_path, _prefetch.submit(_decode, next_path)))
+        try:
+            image, scale = future.result()
+            rows.extend(identify_image(image, scale, path))
+        except Exception as e:  # Never let one bad photo kill the batch.
+            rows.append(dict(path=path, face=-1, error=str(e)))
+    return rows
+
+
+def identify_photos(paths, output_path=None, gallery_path='models/gallery.json', confidence_threshold=0.8, workers=0,
+                    max_width=MAX_WIDTH, min_score=DETECTION_CONF_THRESHOLD, batch_size=BATCH_SIZE):  # Main function.
+    """
+    Identifies the faces in many photos in parallel and streams one row per face to CSV or JSONL.
+
+    Args:
+        paths (list): Photo files and folders (searched recursively)
+        output_path (str): `.csv` or `.jsonl` file, or None for JSONL on stdout
+        gallery_path (str): Gallery manifest (a legacy embeddings.pkl also works)
+        confidence_threshold (float): Minimum similarity for a name; below it the face is "Unknown"
+        workers (int): Worker processes (0 = all cores)
+        max_width (int): Larger photos are downscaled to this width for detection
+        min_score (float): Minimum YuNet detection score
+        batch_size (int): Photos per worker task
+
+    Returns:
+        dict: {'photos', 'faces', 'known', 'errors', 'seconds'}
+    """
+    models_dir = os.path.dirname(gallery_path)
+    for path in (gallery_path, os.path.join(models_dir, 'face_detection_yunet_2023mar.onnx'),
+                 os.path.join(models_dir, 'face_recognition_sface_2021dec.onnx')):
+        if not os.path.exists(path):
+            print(f"Error: '{path}' not found.", file=sys.stderr)
+            return None
+    photos = find_photos(paths)
+    batches = [photos[i:i + batch_size] for i in range(0, len(photos), batch_size)]
+    print(f"Identifying {len(photos)} photo(s)...", file=sys.stderr)
+
+    # --- Output ---
+    if output_path:
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        out = open(output_path, 'w', newline='')
+    else:
+        out = sys.stdout
+    as_csv = bool(output_path) and output_path.lower().endswith('.csv')
+    writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS, restval='') if as_csv else None
+    if writer:
+        writer.writeheader()
+
+    # --- Identify in parallel, writing each batch as it finishes ---
+    stats = {'photos': 0, 'faces': 0, 'known': 0, 'errors': 0}
+    start = time.time()
+    workers = workers or os.cpu_count() or 1
+    try:
+        with Pool(max(1, min(workers, len(batches))), initializer=_init_worker,
+                  initargs=(models_dir, gallery_path, confidence_threshold, max_width, min_score)) as pool:
+            for rows in pool.imap_unordered(_identify_batch, batches):
+                for row in rows:
+                    if writer:
+                        writer.writerow(row)
+                    else:
+                        out.write(json.dumps(row) + '\n')
+                    stats['faces'] += row['face'] >= 0
+                    stats['known'] += row.get('name', "Unknown") != "Unknown"
+                    stats['errors'] += row['face'] < 0
+                out.flush()  # Stream: results are readable while the run continues.
+                stats['photos'] += len({row['path'] for row in rows})
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    stats['seconds'] = time.time() - start
+    print(f"✓ {stats['photos']} photos, {stats['faces']} faces ({stats['known']} known), {stats['errors']} without a face "
+          f"in {stats['seconds']:.1f}s ({stats['photos'] / max(stats['seconds'], 1e-9):.1f} photos/s)", file=sys.stderr)
+    return stats
+
+
+if __name__ == '__main__':  # This block runs only when this script is executed directly.
+    parser = argparse.ArgumentParser(description="Identify the faces in many photos against the gallery.")
+    parser.add_argument('paths', nargs='*', help="Photos and folders (searched recursively).")
+    parser.add_argument('--list', help="Text file with one photo path per line.")
+    parser.add_argument('--out', default=None, help="Output .csv or .jsonl file (default: JSONL on stdout).")
+    parser.add_argument('--gallery', default='models/gallery.json', help="Gallery manifest. Default is models/gallery.json.")
+    parser.add_argument('--confidence', type=float, default=0.8, help="Recognition threshold (0.0 to 1.0). Default is 0.8.")
+    parser.add_argument('--workers', type=int, default=0, help="Worker processes (0 = all cores).")
+    parser.add_argument('--max-width', type=int, default=MAX_WIDTH, help=f"Detection width for large photos. Default is {MAX_WIDTH}.")
+    args = parser.parse_args()
+
+    paths = list(args.paths)
+    if args.list:
+        with open(args.list, 'r') as f:
+            paths.extend(line.strip() for line in f if line.strip())
+    if not paths:
+        parser.error("no photos given")
+    identify_photos(paths, args.out, gallery_path=args.gallery, confidence_threshold=args.confidence,
+                    workers=args.workers, max_width=args.max_width)
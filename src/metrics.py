@@ -0,0 +1,188 @@
+# --- Import Necessary Libraries ---
+import os  # Import os for atomic file replacement.
+import json  # Import json for the JSON export format.
+import time  # Import time for the low-overhead perf_counter clock.
+import numpy as np  # Import numpy to compute percentiles at export time.
+
+# --- Pipeline Metrics ---
+# Timings are recorded into fixed-size rings (a plain Python list and an index), so recording a
+# sample is a couple of list operations and never allocates. Percentiles are only computed when the
+# metrics are exported, every few seconds. With metrics disabled the pipeline gets a NullMetrics
+# whose methods do nothing.
+DEFAULT_WINDOW = 2048  # Samples kept per stage for the rolling percentiles.
+DEFAULT_INTERVAL = 10.0  # Seconds between exports.
+QUANTILES = (0.5, 0.95, 0.99)
+METRIC_PREFIX = 'face_rec'  # Prometheus metric name prefix.
+
+
+class _Ring:  # Rolling window of samples.
+    __slots__ = ('values', 'index', 'filled', 'count', 'total')
+
+    def __init__(self, size):
+        self.values = [0.0] * size
+        self.index = 0
+        self.filled = False
+        self.count = 0  # All-time sample count (Prometheus summary _count).
+        self.total = 0.0  # All-time sum (Prometheus summary _sum).
+
+    def add(self, value):
+        self.values[self.index] = value
+        self.index += 1
+        if self.index == len(self.values):
+            self.index, self.filled = 0, True
+        self.count += 1
+        self.total += value
+
+    def window(self):
+        return np.asarray(self.values if self.filled else self.values[:self.index])
+
+
+class Metrics:  # Enabled instrumentation.
+    """
+    Low-overhead stage timers, rolling percentiles and counters with periodic export.
+
+    Usage in a loop:
+        t = metrics.start()
+        ...capture...
+        t = metrics.lap('capture', t)   # records the time since t and returns the current time
+        ...detect...
+        t = metrics.lap('detect', t)
+
+    Args:
+        export_path (str): File to export to. `.prom` writes the Prometheus text format (for the
+            node_exporter textfile collector); anything else writes JSON. None keeps metrics in memory.
+        interval (float): Seconds between exports
+        window (int): Samples kept per stage for the percentiles
+    """
+
+    enabled = True
+
+    def __init__(self, export_path=None, interval=DEFAULT_INTERVAL, window=DEFAULT_WINDOW):  # The constructor method.
+        self.export_path = export_path
+        self.interval = interval
+        self.window = window
+        self.timings = {}  # stage -> _Ring of seconds
+        self.values = {}  # name -> _Ring of observed values (e.g. faces per frame)
+        self.counters = {}  # name -> int
+        self.started = time.time()
+        self._next_export = time.perf_counter() + interval
+
+    # --- Recording ---
+    start = staticmethod(time.perf_counter)  # Current time for the first lap.
+
+    def lap(self, stage, t0):  # The hot path.
+        """Records the time since `t0` for `stage` and returns the current time."""
+        t = time.perf_counter()
+        ring = self.timings.get(stage)
+        if ring is None:
+            ring = self.timings[stage] = _Ring(self.window)
+        ring.add(t - t0)
+        return t
+
+    def observe(self, name, value):  # A distribution that is not a duration.
+        """Records one value of a distribution such as faces per frame."""
+        ring = self.values.get(name)
+        if ring is None:
+            ring = self.values[name] = _Ring(self.window)
+        ring.add(value)
+
+    def count(self, name, n=1):  # A monotonic counter.
+        """Adds `n` to a counter such as gallery comparisons."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    # --- Reporting ---
+    def summary(self):  # Snapshot for export and telemetry.
+        """Returns {'stages': {stage: {p50, p95, p99, mean, count}}, 'values': {...}, 'counters': {...}}."""
+        def describe(rings, scale):
+            out = {}
+            for name, ring in rings.items():
+                window = ring.window()
+                if window.size == 0:
+                    continue
+                q = np.quantile(window, QUANTILES) * scale
+                out[name] = {'p50': float(q[0]), 'p95': float(q[1]), 'p99': float(q[2]),
+                             'mean': float(window.mean() * scale), 'count': ring.count, 'sum': ring.total * scale}
+            return out
+        return {'uptime_seconds': time.time() - self.started,
+                'stages_ms': describe(self.timings, 1000.0),
+                'values': describe(self.values, 1.0),
+                'counters': dict(self.counters)}
+
+    def maybe_export(self, now=None):  # Called once per frame.
+        """Exports the metrics if the export interval has passed. Returns True if it exported."""
+        now = time.perf_counter() if now is None else now
+        if now < self._next_export:
+            return False
+        self._next_export = now + self.interval
+        if self.export_path:
+            self.export()
+        return True
+
+    def export(self, path=None):  # Write the export file.
+        """Atomically writes the metrics as JSON or Prometheus text (by file extension)."""
+        path = path or self.export_path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        summary = self.summary()
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            if path.endswith('.prom'):
+                f.write(self._prometheus(summary))
+            else:
+                json.dump(summary, f, indent=2)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _prometheus(summary):  # Prometheus text exposition format.
+        lines = [f"# HELP {METRIC_PREFIX}_stage_seconds Time spent per pipeline stage.",
+                 f"# TYPE {METRIC_PREFIX}_stage_seconds summary"]
+        for stage, s in summary['stages_ms'].items():
+            for q in QUANTILES:
+                key = f"p{int(round(q * 100))}"
+                lines.append(f'{METRIC_PREFIX}_stage_seconds{{stage="{stage}",quantile="{q}"}} {s[key] / 1000.0:.9f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{stage}"}} {s["sum"] / 1000.0:.9f}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{stage}"}} {s["count"]}')
+        for name, s in summary['values'].items():
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} summary")
+            for q in QUANTILES:
+                key = f"p{int(round(q * 100))}"
+                lines.append(f'{METRIC_PREFIX}_{name}{{quantile="{q}"}} {s[key]:g}')
+            lines.append(f"{METRIC_PREFIX}_{name}_sum {s['sum']:g}")
+            lines.append(f"{METRIC_PREFIX}_{name}_count {s['count']}")
+        for name, value in summary['counters'].items():
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            lines.append(f"{METRIC_PREFIX}_{name}_total {value}")
+        lines.append(f"{METRIC_PREFIX}_uptime_seconds {summary['uptime_seconds']:.1f}")
+        return '\n'.join(lines) + '\n'
+
+
+class NullMetrics:  # Disabled instrumentation.
+    """Same interface as Metrics; every call does nothing, so disabled metrics cost nothing measurable."""
+
+    enabled = False
+
+    @staticmethod
+    def start():
+        return 0.0
+
+    @staticmethod
+    def lap(stage, t0):
+        return 0.0
+
+    def observe(self, name, value):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def maybe_export(self, now=None):
+        return False
+
+    def summary(self):
+        return {'uptime_seconds': 0.0, 'stages_ms': {}, 'values': {}, 'counters': {}}
+
+
+def create_metrics(export_path=None, interval=DEFAULT_INTERVAL, enabled=True):  # Factory used by the pipeline.
+    """Returns a Metrics instance, or a NullMetrics if `enabled` is False."""
+    return Metrics(export_path, interval) if enabled else NullMetrics()
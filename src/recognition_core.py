@@ -0,0 +1,368 @@
+# --- Import Necessary Libraries ---
+import cv2  # Import OpenCV for resizing, alignment and drawing.
+import time  # Import time for the default clock.
+import numpy as np  # Import numpy for the detection boxes.
+from collections import Counter  # Import Counter for the skip statistics.
+from metrics import NullMetrics  # Import the no-op metrics used when timing is disabled.
+from face_quality import landmark_quality, face_quality, weakest_factor, MIN_QUALITY  # Import the face quality gate.
+from track_table import TrackTable  # Import the tracker state arrays.
+
+# --- Recognition Core ---
+# The per-frame work of the live system: resize, detect, track, recognize, vote and alert. It knows
+# nothing about cameras, windows, keyboards or output devices, so the same code runs behind the live
+# camera (recognize_face.py), the benchmarks and offline tools. Side effects such as logging, audio,
+# email and snapshots go through an event handler, and the clock is a parameter of process_frame().
+#
+# - Recognition: each track keeps a quality-weighted mean of its face embeddings, and the mean, not
+#   the single frame, is matched against the gallery. A confirmed track whose mean matched its name
+#   STABLE_MATCHES times in a row is only re-embedded every RECHECK_INTERVAL frames.
+# - Re-identification: expired tracks are remembered for a few seconds (track_table.py). A face that
+#   reappears near its last position with a similar embedding continues its old track, so an occluded
+#   person is not welcomed or logged again and an unknown keeps its alert timer.
+# - Repeat alerts: alerted unknown faces are remembered in a fixed-size ring (RecentUnknowns) for
+#   UNKNOWN_COOLDOWN_SECONDS; a face matching one of them with the adaptive threshold raises a repeat
+#   alert instead of a new one.
+
+# --- Configuration Parameters ---
+# (Tracker parameters such as TRACKER_TTL and the re-identification memory are in track_table.py.)
+DETECTION_WIDTH = 640  # Frames are resized to this width before detection.
+CONFIRMATION_THRESHOLD = 3  # How many times a name must be seen consecutively to be "confirmed".
+UNKNOWN_ALERT_DURATION = 5.0  # How long (in seconds) an unknown person must be visible to trigger an alert.
+UNKNOWN_COOLDOWN_SECONDS = 300  # 5 minutes: How long to remember an unknown face to prevent sending duplicate alerts.
+UNKNOWN_MEMORY_SIZE = 1024  # At most this many alerted unknown faces are remembered (the oldest are forgotten first).
+STABLE_MATCHES = 3  # Once a confirmed track's mean embedding matched its name this many times in a row, it is no longer embedded...
+RECHECK_INTERVAL = 15  # ...except once every this many frames, to notice a swap.
+
+
+def get_iou(boxA, boxB):  # Helper function to calculate "Intersection over Union" (IoU) of two bounding boxes.
+    """Calculates the IoU to determine if a new detection is the same face as an existing tracker."""
+    xA = max(boxA[0], boxB[0])  # Get the largest x-coordinate of the top-left corners.
+    yA = max(boxA[1], boxB[1])  # Get the largest y-coordinate of the top-left corners.
+    xB = min(boxA[2], boxB[2])  # Get the smallest x-coordinate of the bottom-right corners.
+    yB = min(boxA[3], boxB[3])  # Get the smallest y-coordinate of the bottom-right corners.
+    interArea = max(0, xB - xA) * max(0, yB - yA)  # Calculate the area of the intersection rectangle.
+    boxAArea = (boxA[2] - boxA[0]) * (boxA[3] - boxA[1])  # Calculate the area of the first box.
+    boxBArea = (boxB[2] - boxB[0]) * (boxB[3] - boxB[1])  # Calculate the area of the second box.
+    iou = interArea / float(boxAArea + boxBArea - interArea)  # Calculate the IoU score.
+    return iou  # Return the score.
+
+
+class NullEvents:  # Event handler that does nothing.
+    """
+    Event handler interface. The live system logs, speaks, emails and saves snapshots; benchmarks
+    and offline tools use this class (or record the calls) so no alert ever leaves the machine.
+    `track` is a dict with the track's 'id', 'name', 'confirmed_name', 'score', 'first_seen' and 'box'.
+    """
+
+    def known_person(self, name, track, frame, now):  # A track was confirmed as a known person.
+        pass
+
+    def unknown_alert(self, track, frame, now, repeat):  # An unknown face stayed longer than UNKNOWN_ALERT_DURATION.
+        pass  # `repeat` is True when the face matches an unknown alerted within UNKNOWN_COOLDOWN_SECONDS.
+
+
+class RecentUnknowns:  # Short-term memory of alerted unknown faces.
+    """
+    A time-ordered ring of unit embeddings in one preallocated matrix. Faces are added in time order, so
+    the expired ones are always at the old end and are dropped by moving its index; when the ring is full
+    the oldest face is overwritten. Checking a face against everyone remembered is one matrix product.
+
+    Args:
+        capacity (int): Maximum number of remembered faces
+        ttl (float): Seconds a face is remembered
+        dim (int): Embedding length
+    """
+
+    def __init__(self, capacity=UNKNOWN_MEMORY_SIZE, ttl=UNKNOWN_COOLDOWN_SECONDS, dim=128):  # The constructor method.
+        self.capacity = max(1, capacity)
+        self.ttl = ttl
+        self.rows = np.zeros((self.capacity, dim), dtype=np.float32)
+        self.times = np.zeros(self.capacity)
+        self.start = 0  # Index of the oldest face.
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def expire(self, now):  # Drop faces older than `ttl` from the old end.
+        while self.size and now - self.times[self.start] >= self.ttl:
+            self.start = (self.start + 1) % self.capacity
+            self.size -= 1
+
+    def best_match(self, feature):  # Highest similarity to a remembered face.
+        """Returns the highest cosine similarity between `feature` and the remembered faces (-1.0 if none)."""
+        if not self.size:
+            return -1.0
+        unit = np.asarray(feature, dtype=np.float32).reshape(-1)
+        unit = unit / max(float(np.linalg.norm(unit)), 1e-12)
+        end = self.start + self.size
+        if end <= self.capacity:
+            similarity = self.rows[self.start:end] @ unit
+        else:  # The live part wraps around the end of the matrix.
+            similarity = np.concatenate([self.rows[self.start:] @ unit, self.rows[:end - self.capacity] @ unit])
+        return float(similarity.max())
+
+    def add(self, feature, now):  # Remember a face.
+        unit = np.asarray(feature, dtype=np.float32).reshape(-1)
+        i = (self.start + self.size) % self.capacity
+        self.rows[i] = unit / max(float(np.linalg.norm(unit)), 1e-12)
+        self.times[i] = now
+        if self.size == self.capacity:  # Full: the oldest face is overwritten.
+            self.start = (self.start + 1) % self.capacity
+        else:
+            self.size += 1
+
+
+class RecognitionPipeline:  # Detection, tracking and recognition state for one video stream.
+    """
+    Processes frames one at a time and keeps the tracker state between them.
+
+    Args:
+        face_detector: cv2.FaceDetectorYN or another face_detectors.py backend
+        face_recognizer: cv2.FaceRecognizerSF instance
+        gallery (Gallery): Known faces (see gallery.py)
+        rl_tracker (ReinforcementTracker): Adaptive thresholds and prediction log, or None for the fixed threshold
+        confidence_threshold (float): Threshold without an RL tracker
+        events: Event handler (see NullEvents)
+        metrics: Metrics for per-stage timings (see metrics.py), or None
+        detection_width (int): Width frames are resized to before detection
+        min_quality (float): Faces below this quality (see face_quality.py) are not embedded and do not
+            vote; 0 embeds every face
+        unknown_cooldown (float): Seconds an alerted unknown face is remembered; it raises no new alert in that time
+        unknown_memory (int): Maximum number of remembered unknown faces
+
+    Attributes:
+        tracks (TrackTable): State of the tracked faces; `tracks.records()` lists them as dicts
+        quality_skipped (Counter): Faces skipped by the quality gate, by their weakest factor
+            ('size', 'pose', 'score' or 'sharpness')
+    """
+
+    def __init__(self, face_detector, face_recognizer, gallery, rl_tracker=None, confidence_threshold=0.8,
+                 events=None, metrics=None, detection_width=DETECTION_WIDTH, min_quality=MIN_QUALITY,
+                 unknown_cooldown=UNKNOWN_COOLDOWN_SECONDS, unknown_memory=UNKNOWN_MEMORY_SIZE):  # The constructor method.
+        self.face_detector = face_detector
+        self.face_recognizer = face_recognizer
+        self.gallery = gallery
+        self.rl_tracker = rl_tracker
+        self.confidence_threshold = confidence_threshold
+        self.events = events or NullEvents()
+        self.metrics = metrics or NullMetrics()
+        self.detection_width = detection_width
+        self.min_quality = min_quality
+        self.quality_skipped = Counter()
+
+        # `tracks` holds the state of every face being tracked, one slot per track (see track_table.py).
+        # Besides the name votes, every track keeps the quality-weighted sum of its unit embeddings; the
+        # mean direction of that sum is what is matched against the gallery, so one blurred or half-turned
+        # frame no longer flips a vote. Expired tracks stay in the table for a while as lost tracks: a
+        # face that was occluded for longer than TRACKER_TTL frames gets a new track, and on its first
+        # embedding it is compared with all lost tracks at once and, if one is similar and close enough,
+        # continues as that track (name, confirmation and alert state).
+        self.tracks = TrackTable()
+        # Features of unknown faces for which we've recently sent an alert. It acts as a short-term
+        # memory to prevent spamming alerts for the same person.
+        self.recent_unknowns = RecentUnknowns(capacity=unknown_memory, ttl=unknown_cooldown)
+        self.last_prediction = None  # Last recognized face, for feedback.
+        self.frame_count = 0
+
+    def set_gallery(self, gallery):  # Swap in a retrained gallery.
+        """Uses `gallery` from the next frame on. Trackers are kept; only names that were removed are forgotten."""
+        self.gallery = gallery
+        live_names = set(gallery.live_names())
+        tracks = self.tracks
+        for slot in np.flatnonzero(tracks.active | tracks.lost):  # Lost tracks must not bring a removed name back.
+            if tracks.confirmed_name[slot] != "Unknown" and tracks.confirmed_name[slot] not in live_names:
+                tracks.reset_name(slot)
+
+    def threshold_for(self, name):  # Person-specific or global threshold.
+        return self.rl_tracker.get_threshold(name) if self.rl_tracker else self.confidence_threshold
+
+    def process_frame(self, frame, now=None, frame_id=None, detections=None):  # The per-frame work.
+        """
+        Detects, tracks and recognizes the faces in one BGR frame.
+
+        Args:
+            frame (np.ndarray): BGR frame at full resolution (not modified)
+            now (float): Timestamp of the frame in seconds. Alert durations and cooldowns are measured
+                with it, so recorded timestamps replay exactly. Default is the current time.
+            frame_id (int): Frame number for the prediction log (default: a running count)
+            detections (np.ndarray): YuNet output for this frame at `detection_width`, e.g. recorded
+                with the session (see session_record.py). Detection is skipped when given.
+
+        Returns:
+            list: One dict per detected face: {'id', 'box' (x1, y1, x2, y2 in frame pixels), 'name',
+                'score', 'threshold', 'confirmed', 'quality', 'skipped' (True if the quality gate skipped it),
+                'stable' (True if the name was kept without embedding the face)}
+        """
+        now = time.time() if now is None else now
+        self.frame_count = self.frame_count + 1 if frame_id is None else frame_id
+        metrics = self.metrics
+        t = metrics.start()
+
+        # --- Performance Optimization: Resize frame before detection ---
+        # High-resolution frames are great, but detection is much faster on smaller images.
+        orig_h, orig_w = frame.shape[:2]  # Get the original frame dimensions.
+        scale = self.detection_width / orig_w  # Calculate the scaling factor to maintain aspect ratio.
+        detection_frame = cv2.resize(frame, (self.detection_width, int(orig_h * scale)))  # Resize the frame.
+        t = metrics.lap('resize', t)
+
+        # --- Face Detection ---
+        if detections is None:
+            h, w = detection_frame.shape[:2]  # Get the dimensions of the resized detection frame.
+            self.face_detector.setInputSize((w, h))  # Set the input size for the detector.
+            _, faces = self.face_detector.detect(detection_frame)  # Run face detection.
+        else:
+            faces = detections if len(detections) else None
+        current_detections = faces if faces is not None else []  # Ensure `current_detections` is always a list.
+        t = metrics.lap('detect', t)
+        metrics.observe('faces_per_frame', len(current_detections))
+
+        # --- Match current detections with existing trackers ---
+        tracks = self.tracks
+        if len(current_detections):
+            xywh = np.asarray(current_detections)[:, :4].astype(np.int64)  # Bounding boxes [x, y, width, height].
+            boxes = np.hstack([xywh[:, :2], xywh[:, :2] + xywh[:, 2:]])  # [x1, y1, x2, y2], relative to the small detection_frame.
+        else:
+            boxes = np.zeros((0, 4), dtype=np.int64)
+        slots = tracks.associate(boxes)  # The track each face continues, or -1.
+        for i in np.flatnonzero(slots < 0):  # Otherwise, create a new tracker for this new face.
+            slots[i] = tracks.new(now)
+        t = metrics.lap('associate', t)
+
+        results = []
+        for i, face in enumerate(current_detections):  # Loop through each face detected in the current frame.
+            slot, current_box = int(slots[i]), boxes[i]
+
+            # --- Stable Tracks ---
+            # A confirmed face whose mean embedding keeps matching its name is only embedded once every
+            # RECHECK_INTERVAL frames; in between it keeps its name and score.
+            aligned_face = feature = None
+            tracks.since_embed[slot] += 1
+            stable = tracks.stable[slot] >= STABLE_MATCHES and tracks.since_embed[slot] < RECHECK_INTERVAL
+
+            # --- Quality Gate ---
+            # Profile views, tiny and blurred faces are neither embedded nor counted as votes. The landmark
+            # checks need no pixels; only faces that pass them are aligned and checked for blur.
+            quality, factors = landmark_quality(face)
+            if stable:
+                metrics.count('stable_reused')
+                current_name, best_score = tracks.confirmed_name[slot], float(tracks.score[slot])
+                adaptive_threshold = self.threshold_for(current_name)
+            elif quality >= self.min_quality:
+                aligned_face = self.face_recognizer.alignCrop(detection_frame, face)  # Align and crop the detected face.
+                t = metrics.lap('align', t)
+                if self.min_quality > 0:
+                    quality, factors = face_quality(face, aligned_face)
+            t = metrics.lap('quality', t)
+            skipped = not stable and quality < self.min_quality
+            if skipped:
+                self.quality_skipped[weakest_factor(factors)] += 1
+                metrics.count('quality_skipped')
+                current_name, best_score = tracks.name[slot], float(tracks.score[slot])  # Keep showing the last result.
+                adaptive_threshold = self.threshold_for(current_name)
+            elif not stable:
+                # --- Perform Recognition ---
+                feature = self.face_recognizer.feature(aligned_face)  # Extract the 128-d feature vector (embedding).
+                t = metrics.lap('embed', t)
+
+                # --- Re-identification ---
+                # A new tracker may belong to a face that was only occluded: continue the lost track, so a
+                # confirmed person is not welcomed and logged again and an unknown is not alerted again.
+                if not tracks.has_embedding[slot] and tracks.lost.any():
+                    found = tracks.relink(slot, feature, current_box)
+                    if found != slot:
+                        slot = int(found)
+                        metrics.count('relinked')
+                    t = metrics.lap('reid', t)
+                tracks.since_embed[slot] = 0
+
+                # Compare the track's mean embedding (this face included, weighted by quality) against all
+                # known embeddings in one matrix product (the same cosine similarity as FaceRecognizerSF.match,
+                # for every row at once).
+                mean_embedding, restarted = tracks.add_embedding(slot, feature, quality)
+                if restarted:
+                    metrics.count('aggregate_resets')
+                current_name, best_score, _ = self.gallery.match(mean_embedding)
+                t = metrics.lap('match', t)
+                metrics.count('gallery_comparisons', self.gallery.count)
+
+                # --- Apply Adaptive Threshold ---
+                adaptive_threshold = self.threshold_for(current_name)  # Person-specific or global adaptive threshold.
+
+                # Add the current prediction to this tracker's history for smoothing.
+                if best_score > adaptive_threshold:
+                    candidate_name = tracks.add_vote(slot, current_name)
+                    if self.rl_tracker:  # Log prediction for potential feedback.
+                        self.rl_tracker.log_prediction(embedding=feature, predicted_name=current_name,
+                                                       similarity=best_score, frame_id=self.frame_count)
+                    self.last_prediction = {'frame_id': self.frame_count, 'name': current_name, 'similarity': best_score}
+                else:
+                    candidate_name = tracks.add_vote(slot, "Unknown")
+                if tracks.confirmed_name[slot] != "Unknown" and current_name == tracks.confirmed_name[slot] \
+                        and best_score > adaptive_threshold:
+                    tracks.stable[slot] += 1
+                else:
+                    tracks.stable[slot] = 0
+
+            # --- Get Smoothed & Confirmed Name ---
+            name = "Unknown"
+            if skipped or stable:  # No new vote: keep the confirmed name, if any.
+                name = tracks.confirmed_name[slot]
+            else:  # `candidate_name` is the most common name in the history.
+                # --- Stronger Confirmation Logic to "lock in" a name ---
+                if tracks.confirmed_name[slot] != "Unknown":  # Already confirmed as a known person.
+                    name = tracks.confirmed_name[slot]
+                elif candidate_name != "Unknown":
+                    tracks.streak[slot] += 1
+                    if tracks.streak[slot] >= CONFIRMATION_THRESHOLD:  # Lock in the name.
+                        tracks.confirmed_name[slot] = candidate_name
+                        name = candidate_name
+                        if not tracks.logged[slot]:  # Welcome and log ONCE per confirmation.
+                            self.events.known_person(name, tracks.info(slot), frame, now)
+                            tracks.logged[slot] = True
+            t = metrics.lap('vote', t)
+
+            # --- Intelligent Alerting Logic ---
+            if name == "Unknown" and not tracks.alert_sent[slot]:
+                if now - tracks.first_seen[slot] > UNKNOWN_ALERT_DURATION:  # Visible longer than the alert duration.
+                    if tracks.has_embedding[slot]:  # The mean of every embedding of this face so far.
+                        feature = tracks.embeddings[slot].reshape(1, -1).copy()
+                    elif feature is None:  # Skipped by the quality gate: embed anyway, so nobody avoids alerts by looking away.
+                        if aligned_face is None:
+                            aligned_face = self.face_recognizer.alignCrop(detection_frame, face)
+                        feature = self.face_recognizer.feature(aligned_face)
+                    # Forget unknowns older than the cooldown, then check whether this face is one of them
+                    # (with the same adaptive threshold that decides whether a face is known).
+                    self.recent_unknowns.expire(now)
+                    is_new_unknown = self.recent_unknowns.best_match(feature) <= self.threshold_for(None)
+                    if is_new_unknown:
+                        self.recent_unknowns.add(feature, now)
+                    self.events.unknown_alert(tracks.info(slot), frame, now, repeat=not is_new_unknown)
+                    tracks.alert_sent[slot] = True  # Prevent re-triggering for this tracker.
+
+            # --- Update Tracker State ---
+            tracks.touch(slot, current_box)  # Last known position; resets the Time To Live.
+            slots[i] = slot  # May have changed by re-identification.
+            tracks.name[slot] = name  # Displayed name and score.
+            tracks.score[slot] = best_score
+            t = metrics.lap('alert', t)
+
+            results.append({'id': int(tracks.ids[slot]),
+                            'box': tuple(int(v / scale) for v in current_box),  # Back to full-resolution pixels.
+                            'name': name, 'score': float(best_score), 'threshold': adaptive_threshold,
+                            'confirmed': tracks.confirmed_name[slot] != "Unknown", 'quality': float(quality),
+                            'skipped': skipped, 'stable': stable})
+
+        # --- Clean up old trackers ---
+        tracks.age(slots, now)  # Unseen tracks count down; expired ones become lost tracks.
+        return results
+
+
+def draw_results(frame, results):  # Annotate a frame in place.
+    """Draws the box, name, score and threshold of every result of process_frame() onto `frame`."""
+    for r in results:
+        x1, y1, x2, y2 = r['box']
+        color = (0, 255, 0) if r['name'] != "Unknown" else (0, 0, 255)  # Green for known, red for unknown.
+        cv2.putText(frame, f"T:{r['threshold']:.2f}", (x1, y2 + 20), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, f"{r['name']} ({r['score']:.2f})", (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
@@ -0,0 +1,309 @@
+# --- Import Necessary Libraries ---
+import cv2  # Import OpenCV to decode the uploads and run the models.
+import os  # Import os to check the model paths.
+import json  # Import json for the responses.
+import time  # Import time for the batching window.
+import queue  # Import queue to collect concurrent requests into batches.
+import threading  # Import threading for the batching thread.
+import argparse  # Import argparse to parse command-line arguments when running the script directly.
+import numpy as np  # Import numpy to stack the embeddings.
+from concurrent.futures import Future  # Import Future to hand each request its part of a batch result.
+from email import policy  # Import policy and BytesParser to read multipart uploads (the cgi module is gone).
+from email.parser import BytesParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler  # Import the standard-library HTTP server.
+from multiprocessing import Pool  # Import Pool for the warm model workers.
+from gallery import load_gallery, GalleryWatcher  # Import the gallery loader and the hot-reload watcher.
+from train_model import DETECTION_CONF_THRESHOLD  # Faces are accepted with the same confidence as in training.
+
+# --- Local Recognition Service ---
+# Door controllers, the visitor kiosk and other local systems POST a photo and get the identities
+# back as JSON, without embedding OpenCV models themselves:
+#
+#   POST /identify   body: one image (image/jpeg, image/png, ...) or multipart/form-data with several
+#                    -> {"faces": [{"box": [x, y, w, h], "detection_score", "name", "score"}]}
+#                    -> {"results": [{"filename", "faces": [...]}]}   (multipart)
+#   GET  /health     -> {"status": "ok", "workers", "requests", "batches", "expired", "mean_batch", ...}
+#
+# The models stay loaded in a pool of worker processes. Requests that arrive while all workers are
+# busy (or within MAX_WAIT_MS of each other) are merged into one batch: every image is detected
+# separately, but all of the batch's faces go through SFace in one forward pass and are matched
+# against the gallery in one matrix product. The service listens on 127.0.0.1 by default.
+DEFAULT_PORT = 8765
+MAX_BATCH = 16  # Images per batch.
+MAX_WAIT_MS = 5.0  # How long a free worker waits for more requests to join a batch.
+MAX_UPLOAD_BYTES = 20 * 2 ** 20  # Larger request bodies are rejected.
+MAX_WIDTH = 1280  # Larger images are downscaled to this width for detection.
+REQUEST_TIMEOUT = 30.0  # Seconds a request waits for its result.
+
+_worker = None  # (detector, embedder, gallery watcher, threshold), created once per worker process.
+_gallery = None  # This worker's current gallery.
+
+
+class BatchEmbedder:  # SFace over many aligned faces at once.
+    """
+    Runs SFace on a list of aligned faces in one forward pass. The preprocessing is the same as
+    FaceRecognizerSF.feature() (112x112, BGR to RGB, no scaling), so the embeddings are identical.
+    A model exported with a fixed batch size falls back to one face at a time.
+    """
+
+    def __init__(self, recognizer_path):  # The constructor method.
+        self.recognizer = cv2.FaceRecognizerSF.create(recognizer_path, "")  # alignCrop() and the fallback.
+        self.net = cv2.dnn.readNet(recognizer_path)
+        self.batched = True
+
+    def features(self, aligned_faces):  # (N, 128) embeddings.
+        if not aligned_faces:
+            return np.zeros((0, 128), dtype=np.float32)
+        if self.batched:
+            try:
+                self.net.setInput(cv2.dnn.blobFromImages(aligned_faces, 1.0, (112, 112), (0, 0, 0), True, False))
+                return self.net.forward().reshape(len(aligned_faces), -1)
+            except cv2.error:
+                self.batched = False  # Fixed batch size; use the per-face path from now on.
+        return np.vstack([self.recognizer.feature(face) for face in aligned_faces])
+
+
+def _init_worker(models_dir, gallery_path, threshold):  # Runs once in every worker process.
+    """Loads the models and the gallery and starts watching the gallery for retraining."""
+    global _worker, _gallery
+    cv2.setNumThreads(1)  # Parallelism comes from the processes, not from OpenCV's internal threads.
+    _gallery = load_gallery(gallery_path)
+    _worker = (cv2.FaceDetectorYN.create(os.path.join(models_dir, 'face_detection_yunet_2023mar.onnx'), "", (0, 0)),
+               BatchEmbedder(os.path.join(models_dir, 'face_recognition_sface_2021dec.onnx')),
+               GalleryWatcher(gallery_path, current=_gallery).start(), threshold)
+
+
+def _identify_many(images):  # Runs in a worker process for every batch.
+    """Returns, for each encoded image, {'faces': [...]} or {'error': ...}."""
+    global _gallery
+    face_detector, embedder, watcher, threshold = _worker
+    new_gallery = watcher.poll()  # A retrained gallery is used from the next batch on.
+    if new_gallery is not None:
+        _gallery = new_gallery
+
+    # --- Detect and align every image ---
+    results, aligned, owners = [], [], []
+    for i, data in enumerate(images):
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            results.append({'error': "could not decode image"})
+            continue
+        h, w = image.shape[:2]
+        scale = min(1.0, MAX_WIDTH / w)
+        if scale < 1.0:
+            image = cv2.resize(image, (MAX_WIDTH, int(h * scale)), interpolation=cv2.INTER_AREA)
+        face_detector.setInputSize((image.shape[1], image.shape[0]))
+        _, faces = face_detector.detect(image)
+        results.append({'faces': []})
+        for face in (faces if faces is not None else []):
+            if face[-1] < DETECTION_CONF_THRESHOLD:
+                continue
+            aligned.append(embedder.recognizer.alignCrop(image, face))
+            owners.append((i, face, scale))
+
+    # --- Embed and match all faces of the batch at once ---
+    if aligned:
+        names, scores, _ = _gallery.match_many(embedder.features(aligned))
+        for (i, face, scale), name, score in zip(owners, names, scores):
+            results[i]['faces'].append({'box': [int(round(v / scale)) for v in face[:4]],
+                                        'detection_score': round(float(face[-1]), 3),
+                                        'name': name if score > threshold else "Unknown",
+                                        'score': round(float(score), 4)})
+    return results
+
+
+class MicroBatcher:  # Merges concurrent requests into worker batches.
+    """
+    Queues requests and sends them to the worker pool in batches.
+
+    One batch per worker is in flight at a time. While all workers are busy, new requests wait in
+    the queue, so under load the next batch is already full when a worker becomes free; when idle,
+    a request waits at most `max_wait_ms` for company. A worker process that dies (e.g. OpenCV
+    crashing on a malformed upload) never reports back, so batches without an answer after
+    REQUEST_TIMEOUT fail and give their worker slot back.
+    """
+
+    def __init__(self, pool, workers, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS):  # The constructor method.
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._free_workers = threading.Semaphore(workers)
+        self._in_flight = {}  # batch id -> [dispatch time, batch, AsyncResult]
+        self._lock = threading.Lock()  # Guards _in_flight: results and expiry run on different threads.
+        self._next_id = 0
+        self.requests = self.images = self.batches = self.expired = 0
+        threading.Thread(target=self._run, name='MicroBatcher', daemon=True).start()
+
+    def submit(self, images):  # Called by the request threads.
+        """Queues a list of encoded images. Returns a Future with one result per image."""
+        future = Future()
+        self._queue.put((images, future))
+        return future
+
+    def _run(self):  # The batching loop.
+        while True:
+            try:
+                batch = [self._queue.get(timeout=1.0)]
+            except queue.Empty:
+                self._expire()  # Also when idle, so a dead worker's slot comes back soon.
+                continue
+            while not self._free_workers.acquire(timeout=1.0):  # Requests keep queuing while every worker is busy.
+                self._expire()  # ...unless a worker died with its batch.
+            count = len(batch[0][0])
+            deadline = time.perf_counter() + self.max_wait
+            while count < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                batch.append(item)
+                count += len(item[0])
+            self.requests += len(batch)
+            self.images += count
+            self.batches += 1
+            images = [image for request_images, _ in batch for image in request_images]
+            batch_id, self._next_id = self._next_id, self._next_id + 1
+            entry = [time.perf_counter(), batch, None]
+            with self._lock:
+                self._in_flight[batch_id] = entry
+            entry[2] = self.pool.apply_async(_identify_many, (images,),
+                                             callback=lambda results, i=batch_id: self._done(i, results),
+                                             error_callback=lambda error, i=batch_id: self._done(i, None, error))
+
+    def _expire(self):  # Give up on batches whose worker never answered.
+        now = time.perf_counter()
+        with self._lock:
+            expired = [i for i, (started, _, result) in self._in_flight.items()
+                       if now - started > REQUEST_TIMEOUT and not (result is not None and result.ready())]
+            batches = [self._in_flight.pop(i)[1] for i in expired]
+        for batch in batches:
+            self.expired += 1
+            self._free_workers.release()
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(TimeoutError("the worker did not answer (it may have crashed)"))
+
+    def _done(self, batch_id, results, error=None):  # Runs on the pool's result thread.
+        with self._lock:
+            entry = self._in_flight.pop(batch_id, None)
+        if entry is None:  # Expired already; its requests have been answered.
+            return
+        self._free_workers.release()
+        batch = entry[1]
+        offset = 0
+        for images, future in batch:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[offset:offset + len(images)])
+            offset += len(images)
+
+
+class _Handler(BaseHTTPRequestHandler):  # One instance per request.
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so clients don't reconnect for every photo.
+    server_version = 'FaceRecognitionService/1.0'
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._reply(404, {'error': "not found"})
+        batcher = self.server.batcher
+        self._reply(200, {'status': 'ok', 'workers': self.server.workers, 'requests': batcher.requests,
+                          'images': batcher.images, 'batches': batcher.batches, 'expired': batcher.expired,
+                          'mean_batch': round(batcher.images / batcher.batches, 2) if batcher.batches else 0.0})
+
+    def do_POST(self):
+        if self.path != '/identify':
+            return self._reply(404, {'error': "not found"})
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            return self._reply(400, {'error': "invalid Content-Length"})
+        if length <= 0 or length > MAX_UPLOAD_BYTES:
+            return self._reply(413 if length else 400, {'error': f"body must be 1 byte to {MAX_UPLOAD_BYTES} bytes"})
+        body = self.rfile.read(length)
+        content_type = self.headers.get('Content-Type', '')
+        multipart = content_type.startswith('multipart/form-data')
+        if multipart:  # Several files in one request.
+            message = BytesParser(policy=policy.HTTP).parsebytes(
+                b'Content-Type: ' + content_type.encode('latin-1') + b'\r\n\r\n' + body)
+            files = [(part.get_filename() or part.get_param('name', header='content-disposition'), part.get_payload(decode=True))
+                     for part in message.iter_parts()]
+            files = [(name, data) for name, data in files if data]
+            if not files:
+                return self._reply(400, {'error': "no files in the multipart body"})
+        else:
+            files = [(None, body)]
+        try:
+            results = self.server.batcher.submit([data for _, data in files]).result(timeout=REQUEST_TIMEOUT)
+        except Exception as e:
+            return self._reply(503, {'error': f"recognition failed: {e}"})
+        if multipart:
+            return self._reply(200, {'results': [dict(r, filename=name) for (name, _), r in zip(files, results)]})
+        self._reply(200 if 'error' not in results[0] else 422, results[0])
+
+    def log_message(self, format, *args):  # Per-request logging only with --verbose.
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, gallery_path='models/gallery.json', confidence_threshold=0.8,
+          workers=0, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, verbose=False):  # Main service function.
+    """
+    Runs the recognition service until Ctrl+C.
+
+    Args:
+        host (str): Interface to listen on (127.0.0.1 = this machine only)
+        port (int): TCP port
+        gallery_path (str): Gallery manifest; a retrained gallery is picked up while running
+        confidence_threshold (float): Minimum similarity for a name
+        workers (int): Model worker processes (0 = all cores)
+        max_batch (int): Images per batch
+        max_wait_ms (float): Batching window when idle
+        verbose (bool): Log every request
+    """
+    models_dir = os.path.dirname(gallery_path)
+    for path in (gallery_path, os.path.join(models_dir, 'face_detection_yunet_2023mar.onnx'),
+                 os.path.join(models_dir, 'face_recognition_sface_2021dec.onnx')):
+        if not os.path.exists(path):
+            print(f"Error: '{path}' not found.")
+            return
+
+    workers = workers or os.cpu_count() or 1
+    pool = Pool(workers, initializer=_init_worker, initargs=(models_dir, gallery_path, confidence_threshold))
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.batcher = MicroBatcher(pool, workers, max_batch, max_wait_ms)
+    server.workers = workers
+    server.verbose = verbose
+    print(f"✓ Recognition service on http://{host}:{server.server_port} ({workers} workers). Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.terminate()
+    print("Service stopped.")
+
+
+if __name__ == '__main__':  # This block runs only when this script is executed directly.
+    parser = argparse.ArgumentParser(description="Local HTTP face recognition service.")
+    parser.add_argument('--host', default='127.0.0.1', help="Interface to listen on. Default is 127.0.0.1.")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port. Default is {DEFAULT_PORT}.")
+    parser.add_argument('--gallery', default='models/gallery.json', help="Gallery manifest. Default is models/gallery.json.")
+    parser.add_argument('--confidence', type=float, default=0.8, help="Recognition threshold (0.0 to 1.0). Default is 0.8.")
+    parser.add_argument('--workers', type=int, default=0, help="Model worker processes (0 = all cores).")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help=f"Images per batch. Default is {MAX_BATCH}.")
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS, help=f"Batching window. Default is {MAX_WAIT_MS:g}.")
+    parser.add_argument('--verbose', action='store_true', help="Log every request.")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.gallery, args.confidence, args.workers, args.max_batch, args.max_wait_ms, args.verbose)
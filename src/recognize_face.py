@@ -2,35 +2,99 @@
 import cv2  # Import OpenCV for video capture, image processing, and drawing on the screen.
 import os  # Import os to check if files and directories exist.
 import argparse  # Import argparse to parse command-line arguments when running the script directly.
-import pickle  # Import pickle to load the saved embeddings file.
 import numpy as np  # Import numpy for numerical operations (not directly used here but good practice with OpenCV).
-from collections import deque, Counter  # Import deque for efficient fixed-size lists and Counter for majority voting.
 import time  # Import time for calculating FPS and handling time-based events.
 from notifications import send_alert_email  # Import our custom function for sending email alerts.
 from logger import SecurityLogger  # Import our custom class for logging events to a CSV file.
 from audio_alerts import AudioNotifier  # Import our custom class for playing audio alerts.
 from reinforcement_learning import ReinforcementTracker  # Import RL tracker for adaptive learning.
-
-def recognize_faces_live(embeddings_path='models/embeddings.pkl', camera_index=0, confidence_threshold=0.8):  # Main function for live recognition.
+from gallery import load_gallery, GalleryWatcher  # Import the gallery loader and the hot-reload watcher.
+from control_channel import ControlClient  # Import the command/telemetry link to the GUI.
+from frame_bus import open_capture, FrameBus  # Import the capture opener and the shared-memory bus for the GUI preview.
+from metrics import create_metrics, DEFAULT_INTERVAL  # Import the per-stage latency instrumentation.
+from recognition_core import RecognitionPipeline, NullEvents, draw_results, UNKNOWN_ALERT_DURATION, UNKNOWN_COOLDOWN_SECONDS, UNKNOWN_MEMORY_SIZE  # Import the per-frame core.
+from face_detectors import create_detector, add_detector_arguments, detector_options  # Import the detector backends.
+from face_quality import MIN_QUALITY  # Import the default of the face quality gate.
+from clip_recorder import ClipRecorder, CLIP_BEFORE_SECONDS, CLIP_AFTER_SECONDS  # Import the alert clip recorder.
+
+# --- GUI Preview ---
+PREVIEW_WIDTH = 480  # Width of the frames published for the GUI preview.
+PREVIEW_FPS = 15.0  # Maximum preview frames per second; recognition runs at full speed regardless.
+
+class LiveEvents(NullEvents):  # What the live system does when the pipeline reports an event.
+    """Logs, speaks and emails the events of a RecognitionPipeline and saves alert snapshots and clips."""
+
+    def __init__(self, logger, audio_notifier, alerts_dir='data/alerts', recorder=None):  # The constructor method.
+        self.logger = logger
+        self.audio_notifier = audio_notifier
+        self.alerts_dir = alerts_dir
+        self.recorder = recorder  # ClipRecorder for alert clips, or None.
+
+    def known_person(self, name, track, frame, now):  # Welcome message and log entry, once per confirmation.
+        self.logger.log_event('KNOWN_PERSON_ENTRY', name)  # Log the entry event.
+        self.audio_notifier.welcome(name)  # Play the welcome message.
+
+    def unknown_alert(self, track, frame, now, repeat):  # Unknown person visible for too long.
+        if repeat:
+            print(f"INFO: Re-detected a recent unknown person. Suppressing new alert.")  # Log this.
+            return
+        print(f"ALERT: New unknown person detected for over {UNKNOWN_ALERT_DURATION} seconds.")  # ...print an alert.
+        snapshot_path = os.path.join(self.alerts_dir, f"alert_{int(now)}.jpg")  # ...create a path for the snapshot.
+        cv2.imwrite(snapshot_path, frame)  # ...save the current frame as an image.
+        details = f"Snapshot saved to {snapshot_path}"
+        if self.recorder:  # ...and the seconds before and after the alert as a clip (written in the background).
+            details += f", clip to {self.recorder.trigger(now, name='alert')}"
+        self.logger.log_event('UNKNOWN_PERSON_ALERT', details=details)  # ...log the event.
+        send_alert_email(snapshot_path)  # ...send the email alert.
+        self.audio_notifier.unknown_alert()  # ...play the audio alert.
+
+
+def recognize_faces_live(embeddings_path='models/gallery.json', camera_index=0, confidence_threshold=0.8, control_port=None,
+                         preview_bus=None, show_window=True, metrics_path=None,
+                         metrics_interval=DEFAULT_INTERVAL, replay_speed=1.0, recorded_detections=False,
+                         detector=None, min_quality=MIN_QUALITY, unknown_cooldown=UNKNOWN_COOLDOWN_SECONDS,
+                         unknown_memory=UNKNOWN_MEMORY_SIZE, clip_before=CLIP_BEFORE_SECONDS,
+                         clip_after=CLIP_AFTER_SECONDS):  # Main function for live recognition.
     """Captures video, detects faces, tracks them, and performs recognition with alerts and logging."""
     # --- Argument Explanations ---
-    # embeddings_path (str): The file path of the saved embeddings pickle file.
-    # camera_index (int or str): The number for the webcam (e.g., 0) or a URL for a video stream.
+    # embeddings_path (str): The gallery manifest written by train_model.py (a legacy embeddings.pkl also works).
+    # camera_index (int or str): The number for the webcam (e.g., 0), a URL for a video stream, or "bus:<name>" to read
+    #                            frames from a frame bus published by `python src/frame_bus.py` (see frame_bus.py),
+    #                            or a session recorded with `python src/session_record.py record` (.frec).
     # confidence_threshold (float): The threshold for recognition. Higher is stricter (0.0 to 1.0).
+    # control_port (int): Port of the GUI's control channel (set by app_gui.py). None when run on its own.
+    # preview_bus (str): Name of a frame bus to publish downscaled, annotated RGB frames to (the GUI preview).
+    # show_window (bool): Show the OpenCV window. The GUI turns it off and shows its own preview instead.
+    # metrics_path (str): Export per-stage latencies here every `metrics_interval` seconds (.prom = Prometheus text,
+    #                     anything else = JSON). None disables the instrumentation.
+    # replay_speed (float): For a recorded session: 1.0 = real time, 0 = as fast as possible. Alert timing always
+    #                       follows the recorded timestamps.
+    # recorded_detections (bool): For a session recorded with --detections: use the stored detections instead of YuNet.
+    # detector (dict): Face detector options for face_detectors.create_detector() (backend, Haar settings).
+    #                  None uses YuNet.
+    # min_quality (float): Faces below this quality (pose, size, detector score, blur; see face_quality.py) are not
+    #                      embedded and do not vote. 0 recognizes every face.
+    # unknown_cooldown (float): Seconds an alerted unknown face is remembered so it does not raise a new alert.
+    # unknown_memory (int): Maximum number of remembered unknown faces (the oldest are forgotten first).
+    # clip_before, clip_after (float): Seconds of video saved from before and after an unknown-person alert
+    #                                  (see clip_recorder.py). 0 for both saves only the snapshot.
 
     # --- Initial Checks ---
+    watch_path = embeddings_path  # Retraining writes this manifest; it is watched even if we start from a legacy pickle.
+    legacy_path = os.path.join(os.path.dirname(embeddings_path), 'embeddings.pkl')  # Galleries trained before the new format.
+    if not os.path.exists(embeddings_path) and os.path.exists(legacy_path):  # Fall back to the old pickle...
+        print(f"Note: Using legacy '{legacy_path}'. Run 'python src/gallery.py convert' for faster startup.")
+        embeddings_path = legacy_path  # ...which is converted in memory.
     if not os.path.exists(embeddings_path):  # Check if the embeddings file exists.
         print(f"Error: Embeddings file not found at '{embeddings_path}'. Please run the training script first.")  # Print an error if not found.
         return  # Exit the function.
 
     # --- Load Deep Learning Models ---
     models_dir = os.path.dirname(embeddings_path)  # Get the directory where models are stored.
-    # Load the DNN face detector model (YuNet).
-    detector_path = os.path.join(models_dir, 'face_detection_yunet_2023mar.onnx')  # Path to the detector model.
-    if not os.path.exists(detector_path):  # Check if the model file exists.
-        print(f"Error: Face detector model not found at '{detector_path}'")  # Print an error.
+    # Load the face detector (YuNet by default, or a Haar cascade backend; see face_detectors.py).
+    face_detector = create_detector(models_dir=models_dir, **(detector or {}))  # Create the face detector object.
+    if face_detector is None:  # A model is missing (the reason has been printed).
         return  # Exit.
-    face_detector = cv2.FaceDetectorYN.create(detector_path, "", (0, 0))  # Create the face detector object.
 
     # Load the DNN face recognizer model (SFace).
     recognizer_path = os.path.join(models_dir, 'face_recognition_sface_2021dec.onnx')  # Path to the recognizer model.
@@ -40,37 +104,15 @@ def recognize_faces_live(embeddings_path='models/embeddings.pkl', camera_index=0
     face_recognizer = cv2.FaceRecognizerSF.create(recognizer_path, "")  # Create the face recognizer object.
     
     # --- Load the Trained Data ---
-    with open(embeddings_path, 'rb') as f:  # Open the embeddings file in read-binary mode ('rb').
-        data = pickle.load(f)  # Load the data from the pickle file.
-    known_embeddings = data["embeddings"]  # Get the list of face embeddings.
-    known_names = data["names"]  # Get the corresponding list of names.
+    # The gallery is memory-mapped: startup does not depend on its size, and several recognizer
+    # processes share the same pages. Rows are already L2-normalized for cosine matching.
+    gallery = load_gallery(embeddings_path)  # Load the known faces.
+    print(f"Gallery loaded: {gallery.count} embeddings of {len(gallery.live_names())} people.")
 
-    # --- Face Tracking and Smoothing Logic ---
-    # We will track faces across frames to make the recognition more stable.
-    
-    # `tracked_faces` is a dictionary that will store information about each face being tracked.
-    # The key is a unique `tracker_id`, and the value is another dictionary containing that tracker's info.
-    tracked_faces = {}  # Initialize an empty dictionary for active trackers.
-    next_tracker_id = 0  # Initialize a counter to assign unique IDs to new trackers.
-    
-    def get_iou(boxA, boxB):  # Helper function to calculate "Intersection over Union" (IoU) of two bounding boxes.
-        """Calculates the IoU to determine if a new detection is the same face as an existing tracker."""
-        xA = max(boxA[0], boxB[0])  # Get the largest x-coordinate of the top-left corners.
-        yA = max(boxA[1], boxB[1])  # Get the largest y-coordinate of the top-left corners.
-        xB = min(boxA[2], boxB[2])  # Get the smallest x-coordinate of the bottom-right corners.
-        yB = min(boxA[3], boxB[3])  # Get the smallest y-coordinate of the bottom-right corners.
-        interArea = max(0, xB - xA) * max(0, yB - yA)  # Calculate the area of the intersection rectangle.
-        boxAArea = (boxA[2] - boxA[0]) * (boxA[3] - boxA[1])  # Calculate the area of the first box.
-        boxBArea = (boxB[2] - boxB[0]) * (boxB[3] - boxB[1])  # Calculate the area of the second box.
-        iou = interArea / float(boxAArea + boxBArea - interArea)  # Calculate the IoU score.
-        return iou  # Return the score.
-
-    # --- Configuration Parameters ---
-    PREDICTION_HISTORY_SIZE = 10  # How many of the last predictions to store for smoothing.
-    TRACKER_TTL = 5  # Time To Live: How many frames a tracker can exist without being re-detected before it's deleted.
-    CONFIRMATION_THRESHOLD = 3  # How many times a name must be seen consecutively to be "confirmed".
-    UNKNOWN_ALERT_DURATION = 5.0  # How long (in seconds) an unknown person must be visible to trigger an alert.
-    UNKNOWN_COOLDOWN_SECONDS = 300  # 5 minutes: How long to remember an unknown face to prevent sending duplicate alerts.
+    # --- Watch for Retraining ---
+    # When the GUI retrains (e.g. after "Add Person via Upload"), the new gallery is loaded in the
+    # background and swapped in between frames, without restarting the camera or losing trackers.
+    gallery_watcher = GalleryWatcher(watch_path, current=gallery).start()
 
     os.makedirs('data/alerts', exist_ok=True)  # Create a directory to store snapshot images for alerts.
 
@@ -87,244 +129,194 @@ def recognize_faces_live(embeddings_path='models/embeddings.pkl', camera_index=0
     rl_tracker.load()  # Load previous learning state if available
     print(f"✓ RL Tracker initialized | Adaptive threshold: {rl_tracker.threshold:.3f}")
     print("  Feedback controls: 'y' = Correct | 'n' = Wrong | 's' = Statistics | 'r' = Reset feedback")
+
+    # --- Connect to the GUI ---
+    # The GUI sends feedback and commands over this channel and receives live telemetry from it.
+    control = None
+    if control_port:
+        try:
+            control = ControlClient(control_port)
+            print(f"✓ Connected to GUI control channel on port {control_port}")
+        except Exception as e:  # Keep running without the GUI link.
+            print(f"Warning: Could not connect to GUI control channel: {e}")
     
-    # This list will store features of unknown faces for which we've recently sent an alert.
-    # It acts as a short-term memory to prevent spamming alerts for the same person.
-    recent_unknowns = []  # Initialize an empty list.
+    # --- Per-Stage Metrics ---
+    # Each stage records the time since the previous lap into a rolling window (a fraction of a
+    # microsecond per lap). Disabled metrics are a NullMetrics whose calls do nothing.
+    metrics = create_metrics(metrics_path, metrics_interval, enabled=metrics_path is not None)
+    if metrics.enabled:
+        print(f"✓ Exporting pipeline metrics to '{metrics_path}' every {metrics_interval:g}s")
+
+    # --- Alert Clips ---
+    # The last `clip_before` seconds are kept in memory as JPEGs by a background thread; an alert writes
+    # them and the next `clip_after` seconds to data/alerts/alert_<time>.avi next to the snapshot.
+    recorder = ClipRecorder('data/alerts', before=clip_before, after=clip_after) if clip_before or clip_after else None
+
+    # --- Recognition Pipeline ---
+    # Detection, tracking, recognition and alert decisions live in recognition_core.py; this loop
+    # feeds it camera frames and turns its events into logs, audio, email and snapshots.
+    pipeline = RecognitionPipeline(face_detector, face_recognizer, gallery, rl_tracker=rl_tracker,
+                                   confidence_threshold=confidence_threshold,
+                                   events=LiveEvents(logger, audio_notifier, recorder=recorder), metrics=metrics,
+                                   min_quality=min_quality, unknown_cooldown=unknown_cooldown,
+                                   unknown_memory=unknown_memory)
+    del gallery  # From here on the current gallery is pipeline.gallery (hot reloads replace it there).
 
     # --- Start Video Capture ---
-    cap = cv2.VideoCapture(camera_index)  # Initialize video capture from the specified camera index or URL.
+    cap = open_capture(camera_index, replay_speed=replay_speed)  # Camera index, URL, frame bus or recorded session.
     if not cap.isOpened():  # Check if the camera was opened successfully.
         print(f"Error: Could not open camera with index '{camera_index}'.")  # Print an error if not.
         return  # Exit the function.
 
     print("Camera opened successfully. Press 'q' in the video window to quit.")  # Inform the user.
 
+    # --- Recorded Sessions ---
+    # A replayed session supplies its own clock, so alert delays and cooldowns see the recorded
+    # timestamps even when the replay runs faster than real time.
+    frame_clock = getattr(cap, 'frame_time', None)
+    if recorded_detections and getattr(cap, 'detection_width', None) != pipeline.detection_width:
+        print("Warning: The source has no recorded detections at this detection width; running the detector.")
+        recorded_detections = False
+
     last_frame_time = time.time()  # Initialize a variable to store the time of the last frame for FPS calculation.
     frame_count = 0  # Frame counter for unique identification
-    last_prediction = None  # Store last prediction for feedback
+    fps_avg = 0.0  # Smoothed FPS for telemetry.
+    preview = None  # Frame bus for the GUI preview, created once the frame size is known.
+    last_preview_time = 0.0
     
     while True:  # Start the main loop to process video frames.
+        frame_start = t = metrics.start()  # Start of this frame's timing.
         ret, frame = cap.read()  # Read a single frame from the camera.
+        t = metrics.lap('capture', t)  # Time spent waiting for the camera.
         if not ret:  # If the frame was not captured successfully (e.g., camera disconnected)...
-            print("Error: Failed to capture frame.")  # ...print an error...
+            print("End of recorded session." if frame_clock else "Error: Failed to capture frame.")  # ...print an error...
             break  # ...and exit the loop.
         
         frame_count += 1  # Increment frame counter
 
+        # --- Swap in a Retrained Gallery ---
+        new_gallery = gallery_watcher.poll()  # Returns immediately; loading happened in the background.
+        if new_gallery is not None:
+            pipeline.set_gallery(new_gallery)  # Every match from now on uses the new gallery.
+            print(f"✓ Gallery reloaded: {new_gallery.count} embeddings of {len(new_gallery.live_names())} people.")
+
         # --- FPS Calculation ---
         current_time = time.time()  # Get the current time.
         fps = 1 / (current_time - last_frame_time)  # Calculate Frames Per Second.
         last_frame_time = current_time  # Update the last frame time for the next iteration.
-
-        # --- Performance Optimization: Resize frame before detection ---
-        # High-resolution frames are great, but detection is much faster on smaller images.
-        orig_h, orig_w, _ = frame.shape  # Get the original frame dimensions.
-        target_width = 640  # Define a standard width for detection.
-        scale = target_width / orig_w  # Calculate the scaling factor to maintain aspect ratio.
-        detection_frame = cv2.resize(frame, (target_width, int(orig_h * scale)))  # Resize the frame.
-
-        # --- Face Detection ---
-        h, w, _ = detection_frame.shape  # Get the dimensions of the resized detection frame.
-        face_detector.setInputSize((w, h))  # Set the input size for the detector.
-        _, faces = face_detector.detect(detection_frame)  # Run face detection.
-        current_detections = faces if faces is not None else []  # Ensure `current_detections` is always a list.
-        
-        # --- Match current detections with existing trackers ---
-        matched_tracker_ids = set()  # Create a set to keep track of trackers that have been matched in this frame.
-        for face in current_detections:  # Loop through each face detected in the current frame.
-            box = list(map(int, face[:4]))  # Get the bounding box coordinates [x, y, width, height].
-            x, y, w, h = box  # Unpack the coordinates.
-            current_box = [x, y, x + w, y + h]  # Convert to [x1, y1, x2, y2] format, relative to the small detection_frame.
-
-            # Find the best matching existing tracker for the current detected face.
-            best_iou = 0  # Initialize the best IoU score.
-            best_tracker_id = None  # Initialize the ID of the best matching tracker.
-            for tracker_id, tracker_data in tracked_faces.items():  # Loop through all active trackers.
-                iou = get_iou(current_box, tracker_data['box'])  # Calculate the IoU between the current face and the tracker.
-                if iou > best_iou:  # If this IoU is better than the previous best...
-                    best_iou = iou  # ...update the best score...
-                    best_tracker_id = tracker_id  # ...and store the tracker's ID.
-
-            # If a good match is found (IoU > 0.5), update the existing tracker.
-            if best_iou > 0.5 and best_tracker_id not in matched_tracker_ids:  # Check for a good overlap and that the tracker hasn't been matched already.
-                tracker = tracked_faces[best_tracker_id]  # Get the matched tracker.
-                matched_tracker_ids.add(best_tracker_id)  # Add its ID to the set of matched trackers for this frame.
-            else:  # Otherwise, if no good match is found, create a new tracker for this new face.
-                tracker = {  # Create a new dictionary to hold the new tracker's information.
-                    'id': next_tracker_id,  # Assign a unique ID.
-                    'predictions': deque(maxlen=PREDICTION_HISTORY_SIZE),  # A deque to store recent name predictions.
-                    'confirmed_name': "Unknown",  # The stable, confirmed name for this person.
-                    'confirmation_streak': 0,  # A counter for consecutive same-name predictions.
-                    'first_seen': time.time(),  # Timestamp of when this tracker was created.
-                    'alert_sent': False,  # A flag to ensure we only send one alert per unknown person.
-                    'log_and_audio_triggered': False  # A flag to ensure we only log/welcome a person once.
-                }
-                tracked_faces[next_tracker_id] = tracker  # Add the new tracker to our main dictionary.
-                matched_tracker_ids.add(next_tracker_id)  # Add its ID to the set of matched trackers.
-                next_tracker_id += 1  # Increment the ID counter for the next new face.
-
-            # --- Perform Recognition ---
-            aligned_face = face_recognizer.alignCrop(detection_frame, face)  # Align and crop the detected face.
-            feature = face_recognizer.feature(aligned_face)  # Extract the 128-d feature vector (embedding).
-            
-            # --- Use Adaptive Threshold from RL Tracker ---
-            # Compare the current face's feature against all known embeddings.
-            best_score = -1  # Initialize the best score.
-            current_name = "Unknown"  # Initialize the current prediction.
-            best_match_index = -1  # Track which embedding matched best
-            
-            for i, emb in enumerate(known_embeddings):  # Loop through all known embeddings.
-                score = face_recognizer.match(feature, emb, cv2.FaceRecognizerSF_FR_COSINE)  # Calculate the cosine similarity score.
-                if score > best_score:  # If this score is the best so far...
-                    best_score = score  # ...update the best score...
-                    current_name = known_names[i]  # ...store the corresponding name.
-                    best_match_index = i  # ...store the index.
-            
-            # --- Apply Adaptive Threshold ---
-            # Get person-specific or global adaptive threshold
-            adaptive_threshold = rl_tracker.get_threshold(current_name)
-            
-            # Add the current prediction to this tracker's history for smoothing.
-            if best_score > adaptive_threshold:  # Use adaptive threshold instead of fixed
-                tracker['predictions'].append(current_name)  # ...add the recognized name to the history.
-                
-                # Log prediction for potential feedback
-                rl_tracker.log_prediction(
-                    embedding=feature,
-                    predicted_name=current_name,
-                    similarity=best_score,
-                    frame_id=frame_count
-                )
-                last_prediction = {
-                    'frame_id': frame_count,
-                    'name': current_name,
-                    'similarity': best_score
-                }
-            else:  # Otherwise...
-                tracker['predictions'].append("Unknown")  # ...add "Unknown" to the history.
-
-            # --- Get Smoothed & Confirmed Name ---
-            name = "Unknown"  # Default name is "Unknown".
-            if tracker['predictions']:  # If there are any predictions in the history...
-                most_common = Counter(tracker['predictions']).most_common(1)[0]  # Find the most common name in the history.
-                candidate_name = most_common[0]  # This is our best guess for the name.
-
-                # --- Stronger Confirmation Logic to "lock in" a name ---
-                if tracker['confirmed_name'] != "Unknown":  # If this tracker is already confirmed as a known person...
-                    name = tracker['confirmed_name']  # ...use that locked-in name.
-                elif candidate_name != "Unknown":  # Otherwise, if the current candidate is a known person...
-                    tracker['confirmation_streak'] += 1  # ...increment the confirmation streak.
-                    if tracker['confirmation_streak'] >= CONFIRMATION_THRESHOLD:  # If the streak reaches the threshold...
-                        tracker['confirmed_name'] = candidate_name  # ...lock in the name.
-                        name = candidate_name  # And use it for display.
-
-                        # --- Trigger Welcome Message and Log Entry ONCE per confirmation ---
-                        if not tracker['log_and_audio_triggered']:  # Check if we haven't already welcomed this person.
-                            logger.log_event('KNOWN_PERSON_ENTRY', name)  # Log the entry event.
-                            audio_notifier.welcome(name)  # Play the welcome message.
-                            tracker['log_and_audio_triggered'] = True  # Set the flag to prevent re-triggering.
-
-            # --- Intelligent Alerting Logic ---
-            if name == "Unknown" and not tracker['alert_sent']:  # If the person is Unknown and we haven't sent an alert for this tracker yet...
-                time_visible = time.time() - tracker['first_seen']  # ...calculate how long they've been visible.
-                if time_visible > UNKNOWN_ALERT_DURATION:  # If they've been visible longer than our alert duration...
-                    is_new_unknown = True  # ...assume it's a new unknown person by default.
-                    # Clean up old entries from our recent unknowns list to keep it from growing indefinitely.
-                    recent_unknowns = [u for u in recent_unknowns if time.time() - u['timestamp'] < UNKNOWN_COOLDOWN_SECONDS]
-                    
-                    for unknown in recent_unknowns:  # Loop through the faces of recently alerted unknown people.
-                        score = face_recognizer.match(feature, unknown['feature'], cv2.FaceRecognizerSF_FR_COSINE)  # Compare the current face to the stored one.
-                        if score > confidence_threshold:  # If they are very similar...
-                            is_new_unknown = False  # ...it's not a new unknown person.
-                            print(f"INFO: Re-detected a recent unknown person. Suppressing new alert.")  # Log this.
-                            break  # Stop checking.
-
-                    if is_new_unknown:  # If it is genuinely a new unknown person...
-                        print(f"ALERT: New unknown person detected for over {UNKNOWN_ALERT_DURATION} seconds.")  # ...print an alert.
-                        snapshot_path = f"data/alerts/alert_{int(time.time())}.jpg"  # ...create a path for the snapshot.
-                        cv2.imwrite(snapshot_path, frame)  # ...save the current frame as an image.
-                        logger.log_event('UNKNOWN_PERSON_ALERT', details=f"Snapshot saved to {snapshot_path}")  # ...log the event.
-                        send_alert_email(snapshot_path)  # ...send the email alert.
-                        audio_notifier.unknown_alert()  # ...play the audio alert.
-                        # Add this new unknown person's feature to our short-term memory.
-                        recent_unknowns.append({'feature': feature, 'timestamp': time.time()})
-
-                    tracker['alert_sent'] = True  # Mark the alert as sent for this specific tracker to prevent it from re-triggering immediately.
-
-            # --- Update Tracker State ---
-            tracker['box'] = current_box  # Update the tracker's last known position.
-            tracker['ttl'] = TRACKER_TTL  # Reset the tracker's Time To Live since it was just seen.
-
-            # --- Draw on Original Frame ---
-            # We need to scale the bounding box coordinates from the small `detection_frame` back to the large original `frame`.
-            orig_x = int(current_box[0] / scale)  # Scale the x-coordinate.
-            orig_y = int(current_box[1] / scale)  # Scale the y-coordinate.
-            orig_w_box = int((current_box[2] - current_box[0]) / scale)  # Scale the width.
-            orig_h_box = int((current_box[3] - current_box[1]) / scale)  # Scale the height.
-            color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)  # Green for known, red for unknown.
-            text = f"{name} ({best_score:.2f})"  # Create the text to display (Name and Score).
-            
-            # Display adaptive threshold being used
-            threshold_text = f"T:{adaptive_threshold:.2f}"
-            cv2.putText(frame, threshold_text, (orig_x, orig_y + orig_h_box + 20), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
-            
+        fps_avg = fps if fps_avg == 0 else 0.9 * fps_avg + 0.1 * fps  # Exponential moving average.
+
+        # --- Detection, Tracking and Recognition ---
+        frame_time = frame_clock() if frame_clock else current_time  # Recorded timestamp when replaying.
+        if recorder:
+            recorder.add(frame, frame_time)  # Before anything is drawn on it; returns at once.
+        results = pipeline.process_frame(frame, now=frame_time, frame_id=frame_count,  # Times its own stages.
+                                         detections=cap.detections if recorded_detections else None)
+        t = metrics.start()
+
+        # --- Draw on Original Frame ---
+        draw_results(frame, results)
+        if results:
             cv2.putText(frame, f"FPS: {fps:.1f}", (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)  # Draw the FPS counter.
-            cv2.rectangle(frame, (orig_x, orig_y), (orig_x + orig_w_box, orig_y + orig_h_box), color, 2)  # Draw the bounding box.
-            cv2.putText(frame, text, (orig_x, orig_y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)  # Draw the name text above the box.
-
-        # --- Clean up old trackers ---
-        dead_trackers = []  # Create a list to hold IDs of trackers to be deleted.
-        for tracker_id, tracker in tracked_faces.items():  # Loop through all active trackers.
-            if tracker_id not in matched_tracker_ids:  # If a tracker was NOT matched in the current frame...
-                tracker['ttl'] -= 1  # ...decrement its Time To Live.
-            if tracker['ttl'] <= 0:  # If its TTL has reached zero...
-                dead_trackers.append(tracker_id)  # ...mark it for deletion.
-        
-        for tracker_id in dead_trackers:  # Loop through the trackers marked for deletion.
-            del tracked_faces[tracker_id]  # Remove them from the active trackers dictionary.
+        t = metrics.lap('annotate', t)
 
         # --- Display RL Statistics on Frame ---
         stats = rl_tracker.get_statistics()
         stats_text = f"Adaptive T: {stats['global_threshold']:.3f} | Acc: {stats['overall_accuracy']:.1%} | Feedback: {stats['total_feedback']}"
         cv2.putText(frame, stats_text, (10, 45), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
         
-        cv2.imshow('Live Face Recognition (Press q to quit)', frame)  # Display the final frame in a window.
+        if show_window:
+            cv2.imshow('Live Face Recognition (Press q to quit)', frame)  # Display the final frame in a window.
+
+        # --- GUI Preview ---
+        # A small RGB copy goes into shared memory at a capped rate. Publishing never waits for the GUI:
+        # it just overwrites the oldest slot, so a slow preview drops frames instead of slowing us down.
+        if preview_bus and current_time - last_preview_time >= 1.0 / PREVIEW_FPS:
+            last_preview_time = current_time
+            preview_size = (PREVIEW_WIDTH, int(frame.shape[0] * PREVIEW_WIDTH / frame.shape[1]))
+            small = cv2.cvtColor(cv2.resize(frame, preview_size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+            if preview is None:
+                preview = FrameBus(preview_bus, shape=small.shape, slots=3, create=True)
+            if small.shape == preview.shape:  # The camera changed resolution; skip rather than reallocate.
+                preview.publish(small, frame_id=frame_count)
+        t = metrics.lap('render', t)  # Overlay, window and GUI preview.
+
+        # --- GUI Control Channel ---
+        stop_requested = False
+        if control:
+            # Live status for the GUI, built and sent at most a few times per second.
+            control.publish_telemetry(lambda: {
+                'frame': frame_count,
+                'fps': round(fps_avg, 1),
+                'threshold': stats['global_threshold'],
+                'accuracy': stats['recent_accuracy'],
+                'total_feedback': stats['total_feedback'],
+                'gallery': {'embeddings': pipeline.gallery.count, 'persons': len(pipeline.gallery.live_names())},
+                'last_prediction': {'name': pipeline.last_prediction['name'], 'similarity': float(pipeline.last_prediction['similarity'])} if pipeline.last_prediction else None,
+                'tracks': [{'id': t['id'], 'name': t['name'], 'confirmed': t['confirmed_name'] != "Unknown",
+                            'score': round(t['score'], 3)} for t in pipeline.tracks.records()],
+            })
+            for command in control.poll_commands():  # Commands are applied here, so the RL tracker is only used by this loop.
+                if command['type'] == 'feedback':  # ✓/✗ buttons in the GUI.
+                    if pipeline.last_prediction:
+                        result = rl_tracker.provide_feedback(
+                            pipeline.last_prediction['frame_id'],
+                            is_correct=command['correct'],
+                            true_name=None if command['correct'] else (command.get('true_name') or pipeline.last_prediction['name'])
+                        )
+                        pipeline.last_prediction = None
+                    else:
+                        result = {'success': False, 'message': "No recent prediction to provide feedback on"}
+                    print(f"{'✓' if result['success'] else '⚠'} GUI feedback: {result['message']}")
+                    control.send({'type': 'feedback_result', 'success': result['success'],
+                                  'message': result['message'], 'threshold': rl_tracker.threshold})
+                elif command['type'] == 'get_stats':  # 📊 button in the GUI.
+                    control.send({'type': 'stats', 'stats': rl_tracker.get_statistics()})
+                elif command['type'] == 'stop':  # Graceful stop, so the RL state is saved.
+                    stop_requested = True
+                elif command['type'] == 'disconnected':
+                    print("Warning: GUI control channel closed.")
+        metrics.lap('frame', frame_start)  # Whole frame, before waiting for a key.
+        metrics.count('frames')
+        metrics.count('faces', len(results))
+        metrics.maybe_export()  # Writes the export file every `metrics_interval` seconds.
+        if stop_requested:
+            print("Stop requested by the GUI. Exiting...")
+            break
 
         # --- Keyboard Controls for RL Feedback ---
-        key = cv2.waitKey(1) & 0xFF
+        key = cv2.waitKey(1) & 0xFF if show_window else 0xFF  # Without a window, control comes from the GUI only.
         
         if key == ord('q'):  # Wait for 1ms for a key press; if it's 'q'...
             print("'q' pressed. Exiting...")  # ...log the exit...
             break  # ...and break the main loop.
         
         elif key == ord('y'):  # 'y' = Correct prediction
-            if last_prediction:
+            if pipeline.last_prediction:
                 result = rl_tracker.provide_feedback(
-                    last_prediction['frame_id'],
+                    pipeline.last_prediction['frame_id'],
                     is_correct=True
                 )
                 if result['success']:
                     print(f"✓ Feedback: {result['message']}")
-                last_prediction = None
+                pipeline.last_prediction = None
             else:
                 print("⚠ No recent prediction to provide feedback on")
         
         elif key == ord('n'):  # 'n' = Wrong prediction
-            if last_prediction:
-                print(f"Wrong prediction. Predicted: {last_prediction['name']}")
+            if pipeline.last_prediction:
+                print(f"Wrong prediction. Predicted: {pipeline.last_prediction['name']}")
                 print("Enter the correct name (or press Enter to skip): ", end='')
                 # Note: For command-line input during video, this will pause the video
                 # In GUI version, we'll handle this better
                 result = rl_tracker.provide_feedback(
-                    last_prediction['frame_id'],
+                    pipeline.last_prediction['frame_id'],
                     is_correct=False,
-                    true_name=last_prediction['name']  # Will be enhanced in GUI
+                    true_name=pipeline.last_prediction['name']  # Will be enhanced in GUI
                 )
                 if result['success']:
                     print(f"✗ Feedback: {result['message']}")
-                last_prediction = None
+                pipeline.last_prediction = None
             else:
                 print("⚠ No recent prediction to provide feedback on")
         
@@ -355,19 +347,61 @@ def recognize_faces_live(embeddings_path='models/embeddings.pkl', camera_index=0
             # This will pause video - better handled in GUI version
 
     # --- Final Cleanup ---
+    gallery_watcher.stop()  # Stop watching the gallery.
+    if control:
+        control.close()  # Close the GUI control channel.
     rl_tracker.save()  # Save RL learning state before exit
     rl_tracker.export_statistics_json()  # Export statistics for analysis
+    if metrics.enabled:
+        metrics.export()  # Final metrics, so short runs are reported too.
+        print(f"✓ Pipeline metrics written to '{metrics_path}'")
+    if pipeline.quality_skipped:  # How much recognition work the quality gate saved.
+        print(f"Quality gate skipped {sum(pipeline.quality_skipped.values())} faces ("
+              + ", ".join(f"{reason}: {n}" for reason, n in pipeline.quality_skipped.most_common()) + ")")
     
+    if recorder:
+        recorder.close()  # Finish a clip that is still recording.
+        if recorder.dropped:
+            print(f"Alert clips: {recorder.dropped} frames dropped because encoding fell behind.")
+
     cap.release()  # Release the camera resource.
-    cv2.destroyAllWindows()  # Close all OpenCV windows.
+    if preview is not None:
+        preview.close()  # The GUI preview sees the bus closed.
+    if show_window:
+        cv2.destroyAllWindows()  # Close all OpenCV windows.
     print("Camera released and windows closed.")  # Print a final message.
 
 if __name__ == '__main__':  # This block runs only when this script is executed directly from the command line.
     parser = argparse.ArgumentParser(description="Live face recognition using a trained model.")  # Create an argument parser.
     parser.add_argument('--camera', type=str, default='0',  # Add an argument for the camera source.
-                        help="Camera index or video stream URL. Default is 0.")
+                        help="Camera index, video stream URL, or bus:<name> for a shared-memory frame bus. Default is 0.")
     parser.add_argument('--confidence', type=float, default=0.8,  # Add an argument for the confidence threshold.
                         help="Confidence threshold for recognition (0.0 to 1.0). Default is 0.8.")
+    parser.add_argument('--preview-bus', default=None,  # Set by app_gui.py.
+                        help="Publish downscaled annotated frames to this shared-memory frame bus (for the GUI preview).")
+    parser.add_argument('--no-window', action='store_true',  # Set by app_gui.py.
+                        help="Don't open the OpenCV window (stop the system from the GUI).")
+    parser.add_argument('--control-port', type=int, default=None,  # Set by app_gui.py.
+                        help="Port of the GUI control channel. The key is read from the FACE_REC_CONTROL_KEY environment variable.")
+    parser.add_argument('--metrics', default=None, metavar='PATH',
+                        help="Export per-stage latency metrics to PATH (.prom for Prometheus text, otherwise JSON).")
+    parser.add_argument('--metrics-interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f"Seconds between metrics exports. Default is {DEFAULT_INTERVAL:g}.")
+    parser.add_argument('--replay-speed', type=float, default=1.0,
+                        help="Replay speed for a recorded .frec session (1 = real time, 0 = as fast as possible). Default is 1.")
+    parser.add_argument('--recorded-detections', action='store_true',
+                        help="Use the detections stored in a recorded session instead of running the detector.")
+    add_detector_arguments(parser)  # --detector and the Haar cascade settings.
+    parser.add_argument('--min-quality', type=float, default=MIN_QUALITY,
+                        help=f"Skip recognition of faces below this quality (0 = recognize every face). Default is {MIN_QUALITY}.")
+    parser.add_argument('--unknown-cooldown', type=float, default=UNKNOWN_COOLDOWN_SECONDS,
+                        help=f"Seconds an alerted unknown face raises no new alert. Default is {UNKNOWN_COOLDOWN_SECONDS}.")
+    parser.add_argument('--unknown-memory', type=int, default=UNKNOWN_MEMORY_SIZE,
+                        help=f"Maximum number of remembered unknown faces. Default is {UNKNOWN_MEMORY_SIZE}.")
+    parser.add_argument('--clip-before', type=float, default=CLIP_BEFORE_SECONDS,
+                        help=f"Seconds of video saved from before an unknown-person alert. Default is {CLIP_BEFORE_SECONDS:g}.")
+    parser.add_argument('--clip-after', type=float, default=CLIP_AFTER_SECONDS,
+                        help=f"Seconds of video saved after an unknown-person alert (0 for both: snapshot only). Default is {CLIP_AFTER_SECONDS:g}.")
     
     args = parser.parse_args()  # Parse the provided arguments.
 
@@ -376,4 +410,10 @@ if __name__ == '__main__':  # This block runs only when this script is executed
     except ValueError:  # If it fails (e.g., it's a URL), use it as a string.
         camera_source = args.camera
 
-    recognize_faces_live(camera_index=camera_source, confidence_threshold=args.confidence)  # Call the main function with the parsed arguments.
\ No newline at end of file
+    recognize_faces_live(camera_index=camera_source, confidence_threshold=args.confidence, control_port=args.control_port,
+                         preview_bus=args.preview_bus, show_window=not args.no_window,
+                         metrics_path=args.metrics, metrics_interval=args.metrics_interval,
+                         replay_speed=args.replay_speed, recorded_detections=args.recorded_detections,
+                         detector=detector_options(args), min_quality=args.min_quality,
+                         unknown_cooldown=args.unknown_cooldown, unknown_memory=args.unknown_memory,
+                         clip_before=args.clip_before, clip_after=args.clip_after)  # Call the main function with the parsed arguments.
\ No newline at end of file
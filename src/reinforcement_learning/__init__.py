@@ -6,5 +6,19 @@ to adaptively improve recognition accuracy over time through user feedback.
 """
 
 from .hitl_trainer import ReinforcementTracker
+from .threshold_analysis import (
+    roc_curve,
+    roc_from_histograms,
+    equal_error_rate,
+    optimal_threshold,
+    per_person_thresholds,
+)
 
-__all__ = ['ReinforcementTracker']
+__all__ = [
+    'ReinforcementTracker',
+    'roc_curve',
+    'roc_from_histograms',
+    'equal_error_rate',
+    'optimal_threshold',
+    'per_person_thresholds',
+]
@@ -0,0 +1,381 @@
+"""
+Offline Threshold Analysis for the HITL Tracker
+
+The live `ReinforcementTracker` only nudges its threshold by `learning_rate`
+per feedback click. This module uses all of the recorded similarities instead:
+1. ROC / DET curves over the correct (genuine) and incorrect (impostor) scores
+2. Equal-error rate (EER) and a cost-optimal global threshold
+3. Per-person thresholds computed from `feedback_history`
+4. Optional write-back of the results into `data/rl_tracker.pkl`
+
+Every curve is built with one sort and cumulative sums, so a million samples
+are analysed in a fraction of a second.
+
+Usage:
+    python src/reinforcement_learning/threshold_analysis.py --state data/rl_tracker.pkl
+    python src/reinforcement_learning/threshold_analysis.py --write --write-global
+"""
+
+import argparse
+import os
+import pickle
+
+import numpy as np
+
+
+def roc_curve(genuine, impostor):
+    """
+    Compute the ROC / DET curve for an "accept if score >= threshold" rule.
+
+    Args:
+        genuine (array-like): Similarities of correct matches (positives)
+        impostor (array-like): Similarities of incorrect matches (negatives)
+
+    Returns:
+        dict: 'thresholds' (descending), 'tpr', 'fpr', 'fnr' arrays plus the
+              'positives' / 'negatives' sample counts. The first point is the
+              "accept nothing" operating point (threshold = +inf).
+    """
+    genuine = np.asarray(genuine, dtype=np.float64).ravel()
+    impostor = np.asarray(impostor, dtype=np.float64).ravel()
+    scores = np.concatenate([genuine, impostor])
+    labels = np.concatenate([np.ones(genuine.size, dtype=np.int64),
+                             np.zeros(impostor.size, dtype=np.int64)])
+
+    # One descending sort; cumulative sums give TP/FP counts at every cut
+    order = np.argsort(-scores, kind='stable')
+    scores = scores[order]
+    labels = labels[order]
+    tps = np.cumsum(labels)
+    fps = np.arange(1, scores.size + 1) - tps
+
+    # Keep only the last index of each run of tied scores
+    distinct = np.flatnonzero(np.diff(scores)) if scores.size else np.array([], dtype=np.int64)
+    cut = np.r_[distinct, scores.size - 1] if scores.size else distinct
+
+    positives = max(genuine.size, 1)
+    negatives = max(impostor.size, 1)
+    tpr = np.r_[0.0, tps[cut] / positives]
+    fpr = np.r_[0.0, fps[cut] / negatives]
+
+    return {
+        'thresholds': np.r_[np.inf, scores[cut]],
+        'tpr': tpr,
+        'fpr': fpr,
+        'fnr': 1.0 - tpr,
+        'positives': int(genuine.size),
+        'negatives': int(impostor.size),
+    }
+
+
+def roc_from_histograms(genuine_hist, impostor_hist, bin_edges):
+    """
+    Compute a ROC / DET curve from pre-binned score histograms.
+
+    Used when the raw scores are too many to keep (e.g. all gallery pairs).
+    Each bin's lower edge is treated as the threshold for accepting that bin.
+
+    Args:
+        genuine_hist (np.ndarray): Counts of genuine scores per bin
+        impostor_hist (np.ndarray): Counts of impostor scores per bin
+        bin_edges (np.ndarray): Bin edges (len(hist) + 1), ascending
+
+    Returns:
+        dict: Same layout as `roc_curve`.
+    """
+    genuine_hist = np.asarray(genuine_hist, dtype=np.float64)
+    impostor_hist = np.asarray(impostor_hist, dtype=np.float64)
+    positives = genuine_hist.sum()
+    negatives = impostor_hist.sum()
+
+    # Reverse cumulative sums: everything at or above each bin is accepted
+    tps = np.cumsum(genuine_hist[::-1])
+    fps = np.cumsum(impostor_hist[::-1])
+    tpr = np.r_[0.0, tps / max(positives, 1)]
+    fpr = np.r_[0.0, fps / max(negatives, 1)]
+
+    return {
+        'thresholds': np.r_[np.inf, np.asarray(bin_edges[:-1], dtype=np.float64)[::-1]],
+        'tpr': tpr,
+        'fpr': fpr,
+        'fnr': 1.0 - tpr,
+        'positives': int(positives),
+        'negatives': int(negatives),
+    }
+
+
+def equal_error_rate(roc):
+    """
+    Find the equal-error rate (FPR == FNR) on a ROC curve.
+
+    Args:
+        roc (dict): Output of `roc_curve` or `roc_from_histograms`
+
+    Returns:
+        tuple: (eer, threshold) linearly interpolated between curve points
+    """
+    diff = roc['fpr'] - roc['fnr']  # Goes from -1 (accept nothing) up to +1
+    idx = int(np.argmax(diff >= 0))
+    if idx == 0:
+        return float(roc['fpr'][0]), float(roc['thresholds'][0])
+
+    # Interpolate between the two points that straddle the crossing
+    d0, d1 = diff[idx - 1], diff[idx]
+    w = 0.0 if d1 == d0 else -d0 / (d1 - d0)
+    eer = roc['fpr'][idx - 1] + w * (roc['fpr'][idx] - roc['fpr'][idx - 1])
+    t0, t1 = roc['thresholds'][idx - 1], roc['thresholds'][idx]
+    threshold = t1 if not np.isfinite(t0) else t0 + w * (t1 - t0)
+    return float(eer), float(threshold)
+
+
+def optimal_threshold(roc, fp_cost=1.0, fn_cost=1.0):
+    """
+    Pick the threshold that minimises fp_cost * FPR + fn_cost * FNR.
+
+    The returned value sits halfway between the lowest accepted score and the
+    next lower score, so it works with both `>` and `>=` comparisons.
+
+    Args:
+        roc (dict): Output of `roc_curve` or `roc_from_histograms`
+        fp_cost (float): Relative cost of a false accept
+        fn_cost (float): Relative cost of a false reject
+
+    Returns:
+        dict: 'threshold', 'fpr', 'fnr' and 'cost' at the optimum
+    """
+    cost = fp_cost * roc['fpr'] + fn_cost * roc['fnr']
+    idx = int(np.argmin(cost))
+    thresholds = roc['thresholds']
+
+    if idx == 0:
+        # Accepting nothing is cheapest: sit just above the highest score
+        threshold = thresholds[1] + 1e-3 if thresholds.size > 1 else 1.0
+    elif idx + 1 < thresholds.size:
+        threshold = 0.5 * (thresholds[idx] + thresholds[idx + 1])
+    else:
+        threshold = thresholds[idx] - 1e-3
+
+    return {
+        'threshold': float(threshold),
+        'fpr': float(roc['fpr'][idx]),
+        'fnr': float(roc['fnr'][idx]),
+        'cost': float(cost[idx]),
+    }
+
+
+def per_person_thresholds(feedback_history, min_samples=5, fp_cost=1.0, fn_cost=1.0,
+                          threshold_bounds=(0.65, 0.92)):
+    """
+    Compute a cost-optimal threshold for every predicted name.
+
+    Thresholds are grouped by the *predicted* name because that is the key
+    `ReinforcementTracker.get_threshold()` is queried with at runtime.
+    All groups are solved together with one lexsort and cumulative sums.
+
+    Args:
+        feedback_history (list): `ReinforcementTracker.feedback_history` entries
+        min_samples (int): Minimum feedback count per person
+        fp_cost (float): Relative cost of a false accept
+        fn_cost (float): Relative cost of a false reject
+        threshold_bounds (tuple): (min, max) limits applied to every result
+
+    Returns:
+        dict: {person_name: {'threshold', 'samples', 'correct', 'incorrect', 'cost'}}
+              Persons without both correct and incorrect feedback are skipped.
+    """
+    if not feedback_history:
+        return {}
+
+    names = np.array([f['predicted'] for f in feedback_history])
+    sims = np.array([f['similarity'] for f in feedback_history], dtype=np.float64)
+    correct = np.array([bool(f['is_correct']) for f in feedback_history], dtype=np.int64)
+
+    # Sort by person, then by descending similarity inside each person
+    uniq, group = np.unique(names, return_inverse=True)
+    order = np.lexsort((-sims, group))
+    group, sims, correct = group[order], sims[order], correct[order]
+
+    counts = np.bincount(group, minlength=uniq.size)
+    positives = np.bincount(group, weights=correct, minlength=uniq.size)
+    negatives = counts - positives
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+
+    # Per-group cumulative TP/FP counts from one global cumsum
+    tp_all = np.cumsum(correct)
+    offset = np.r_[0, tp_all][starts]
+    tps = tp_all - offset[group]
+    rank = np.arange(group.size) - starts[group] + 1
+    fps = rank - tps
+
+    pos_g = np.maximum(positives[group], 1)
+    neg_g = np.maximum(negatives[group], 1)
+    cost = fp_cost * fps / neg_g + fn_cost * (1.0 - tps / pos_g)
+
+    # Only the last row of a run of tied scores is a valid cut
+    last_in_group = np.r_[group[1:] != group[:-1], True]
+    next_sim = np.r_[sims[1:], -np.inf]
+    valid = last_in_group | (next_sim != sims)
+    cost = np.where(valid, cost, np.inf)
+
+    # Cheapest cut per group: sort by (group, cost) and take each group's first row
+    best = np.lexsort((cost, group))
+    first = best[np.r_[True, group[best][1:] != group[best][:-1]]]
+
+    lo, hi = threshold_bounds
+    results = {}
+    for idx in first:
+        g = group[idx]
+        if counts[g] < min_samples or positives[g] == 0 or negatives[g] == 0:
+            continue
+        # "Accept nothing" is also an option for this person
+        if fn_cost < cost[idx]:
+            threshold, best_cost = sims[starts[g]] + 1e-3, fn_cost
+        else:
+            below = next_sim[idx] if not last_in_group[idx] else sims[idx] - 2e-3
+            threshold, best_cost = 0.5 * (sims[idx] + below), cost[idx]
+        results[str(uniq[g])] = {
+            'threshold': float(np.clip(threshold, lo, hi)),
+            'samples': int(counts[g]),
+            'correct': int(positives[g]),
+            'incorrect': int(negatives[g]),
+            'cost': float(best_cost),
+        }
+    return results
+
+
+def load_tracker_state(path='data/rl_tracker.pkl'):
+    """
+    Load the raw dictionary saved by `ReinforcementTracker.save()`.
+
+    Args:
+        path (str): Path to the tracker pickle
+
+    Returns:
+        dict: Saved state, or None if the file does not exist
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def write_thresholds(path, person_thresholds, global_threshold=None):
+    """
+    Write analysed thresholds back into a saved tracker state.
+
+    Existing per-person thresholds that were not re-computed are kept.
+    The file is replaced atomically so a crash never leaves it half written.
+
+    Args:
+        path (str): Path to the tracker pickle
+        person_thresholds (dict): {person_name: threshold}
+        global_threshold (float): New global threshold (None = unchanged)
+    """
+    data = load_tracker_state(path)
+    if data is None:
+        raise FileNotFoundError(f"No RL state found at {path}")
+
+    data.setdefault('person_thresholds', {}).update(person_thresholds)
+    if global_threshold is not None:
+        data['threshold'] = global_threshold
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def analyze_tracker_state(data, fp_cost=1.0, fn_cost=1.0, min_samples=5):
+    """
+    Run the full analysis on a saved tracker state.
+
+    Args:
+        data (dict): Output of `load_tracker_state`
+        fp_cost (float): Relative cost of a false accept
+        fn_cost (float): Relative cost of a false reject
+        min_samples (int): Minimum feedback count for a per-person threshold
+
+    Returns:
+        dict: 'roc', 'eer', 'eer_threshold', 'optimal' and 'person_thresholds'
+    """
+    bounds = tuple(data.get('threshold_bounds', (0.65, 0.92)))
+    roc = roc_curve(data.get('similarity_correct', []), data.get('similarity_incorrect', []))
+    eer, eer_threshold = equal_error_rate(roc)
+    optimal = optimal_threshold(roc, fp_cost=fp_cost, fn_cost=fn_cost)
+    optimal['threshold'] = float(np.clip(optimal['threshold'], *bounds))
+
+    return {
+        'roc': roc,
+        'eer': eer,
+        'eer_threshold': eer_threshold,
+        'optimal': optimal,
+        'person_thresholds': per_person_thresholds(
+            data.get('feedback_history', []), min_samples=min_samples,
+            fp_cost=fp_cost, fn_cost=fn_cost, threshold_bounds=bounds),
+    }
+
+
+def save_curve_csv(roc, path):
+    """Save the ROC / DET points as CSV (threshold, tpr, fpr, fnr)."""
+    table = np.column_stack([roc['thresholds'], roc['tpr'], roc['fpr'], roc['fnr']])
+    np.savetxt(path, table, delimiter=',', header='threshold,tpr,fpr,fnr', comments='', fmt='%.6f')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Offline threshold sweep over recorded RL feedback.")
+    parser.add_argument('--state', default='data/rl_tracker.pkl',
+                        help="Path to the saved RL tracker state. Default is data/rl_tracker.pkl.")
+    parser.add_argument('--fp-cost', type=float, default=1.0,
+                        help="Relative cost of a false accept. Default is 1.0.")
+    parser.add_argument('--fn-cost', type=float, default=1.0,
+                        help="Relative cost of a false reject. Default is 1.0.")
+    parser.add_argument('--min-samples', type=int, default=5,
+                        help="Minimum feedback per person for a custom threshold. Default is 5.")
+    parser.add_argument('--curve-out', default=None,
+                        help="Optional CSV path for the ROC / DET curve points.")
+    parser.add_argument('--write', action='store_true',
+                        help="Write the per-person thresholds back into the state file.")
+    parser.add_argument('--write-global', action='store_true',
+                        help="Also write the optimal global threshold back into the state file.")
+    args = parser.parse_args()
+
+    state = load_tracker_state(args.state)
+    if state is None:
+        print(f"ℹ RL: No learning state found at {args.state}")
+        raise SystemExit(1)
+
+    result = analyze_tracker_state(state, fp_cost=args.fp_cost, fn_cost=args.fn_cost,
+                                   min_samples=args.min_samples)
+    roc = result['roc']
+
+    print("=" * 60)
+    print("📈 OFFLINE THRESHOLD ANALYSIS")
+    print("=" * 60)
+    print(f"Samples: {roc['positives']} correct | {roc['negatives']} incorrect")
+    print(f"Current Global Threshold: {state.get('threshold', 0.80):.3f}")
+    print(f"Equal Error Rate: {result['eer']:.2%} at threshold {result['eer_threshold']:.3f}")
+    opt = result['optimal']
+    print(f"Optimal Threshold: {opt['threshold']:.3f} (FPR {opt['fpr']:.2%} | FNR {opt['fnr']:.2%})")
+
+    if result['person_thresholds']:
+        print("\nPer-Person Thresholds:")
+        current = state.get('person_thresholds', {})
+        for name, info in sorted(result['person_thresholds'].items()):
+            old = current.get(name)
+            old_text = f"{old:.3f}" if old is not None else "global"
+            print(f"  • {name}: {old_text} → {info['threshold']:.3f} "
+                  f"({info['correct']}/{info['samples']} correct)")
+    print("=" * 60)
+
+    if args.curve_out:
+        save_curve_csv(roc, args.curve_out)
+        print(f"✓ Saved ROC / DET curve to {args.curve_out}")
+
+    if args.write or args.write_global:
+        print("⚠ Make sure the recognition system is stopped; it overwrites this file on exit.")
+        write_thresholds(
+            args.state,
+            {name: info['threshold'] for name, info in result['person_thresholds'].items()} if args.write else {},
+            global_threshold=opt['threshold'] if args.write_global else None,
+        )
+        print(f"✓ RL: Wrote analysed thresholds to {args.state}")
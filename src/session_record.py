@@ -0,0 +1,286 @@
+# --- Import Necessary Libraries ---
+import os  # Import os to check paths and create the output folder.
+import json  # Import json for the file header.
+import time  # Import time for capture timestamps and replay pacing.
+import struct  # Import struct for the fixed-size record headers.
+import argparse  # Import argparse to parse command-line arguments when running the script directly.
+import cv2  # Import OpenCV for capture, encoding and decoding.
+import numpy as np  # Import numpy for the stored detections.
+
+# --- Session File Format (.frec) ---
+# A recorded camera session, so performance and false-alarm problems can be replayed exactly on a
+# machine without a camera.
+#
+#   magic (8 bytes) | header length (uint32) | JSON header {width, height, codec, detection_width, ...}
+#   then per frame: timestamp (float64, seconds since the epoch) | image bytes (uint32) | faces (uint32)
+#                   | encoded image | faces x 15 float32 (YuNet output at `detection_width`, optional)
+#
+# Frames are stored encoded (JPEG by default, PNG for lossless), so a minute of 720p is tens of MB
+# instead of gigabytes. A file cut short by a crash replays up to its last complete frame.
+SESSION_MAGIC = b'FRECSES1'
+SESSION_EXT = '.frec'
+RECORD_HEADER = struct.Struct('<dII')
+FACE_FIELDS = 15  # Values per YuNet detection: box (4), 5 landmarks (10), score (1).
+
+
+class SessionWriter:  # Appends frames to a session file.
+    """
+    Writes a session file frame by frame.
+
+    Args:
+        path (str): Output `.frec` file
+        width, height (int): Frame size (stored for information; frames keep their own size)
+        codec (str): '.jpg' or '.png'
+        quality (int): JPEG quality (1-100)
+        detection_width (int): Width the stored detections refer to, or None when none are stored
+        source (str): Description of the camera, stored in the header
+    """
+
+    def __init__(self, path, width, height, codec='.jpg', quality=90, detection_width=None, source=''):  # The constructor method.
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.codec = codec
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality] if codec == '.jpg' else []
+        self.frames = 0
+        self.bytes = 0
+        header = json.dumps({'width': width, 'height': height, 'codec': codec, 'quality': quality,
+                             'detection_width': detection_width, 'source': str(source),
+                             'created': time.strftime('%Y-%m-%d %H:%M:%S')}).encode('utf-8')
+        self._file = open(path, 'wb')
+        self._file.write(SESSION_MAGIC + struct.pack('<I', len(header)) + header)
+
+    def write(self, frame, timestamp, detections=None):  # One frame.
+        """Encodes and appends one BGR frame with its capture timestamp and optional YuNet detections."""
+        ok, encoded = cv2.imencode(self.codec, frame, self.params)
+        if not ok:
+            raise ValueError("Could not encode frame")
+        faces = np.zeros((0, FACE_FIELDS), dtype=np.float32) if detections is None else \
+            np.asarray(detections, dtype=np.float32).reshape(-1, FACE_FIELDS)
+        self._file.write(RECORD_HEADER.pack(timestamp, encoded.size, len(faces)))
+        self._file.write(encoded.tobytes())
+        self._file.write(faces.tobytes())
+        self.frames += 1
+        self.bytes += RECORD_HEADER.size + encoded.size + faces.nbytes
+
+    def close(self):
+        self._file.close()
+
+
+class SessionReader:  # Reads a session file frame by frame.
+    """
+    Reads a session file written by SessionWriter.
+
+    Attributes:
+        header (dict): The JSON header (width, height, codec, detection_width, source, created)
+    """
+
+    def __init__(self, path):  # The constructor method.
+        self._file = open(path, 'rb')
+        if self._file.read(len(SESSION_MAGIC)) != SESSION_MAGIC:
+            self._file.close()
+            raise ValueError(f"'{path}' is not a session file")
+        (length,) = struct.unpack('<I', self._file.read(4))
+        self.header = json.loads(self._file.read(length).decode('utf-8'))
+
+    def read(self, decode=True):  # Next frame.
+        """Returns (timestamp, frame, detections) of the next frame, or None at the end of the file.
+
+        `detections` is an (N, 15) float32 array (empty if none were recorded). With decode=False
+        the frame is returned as encoded bytes.
+        """
+        raw = self._file.read(RECORD_HEADER.size)
+        if len(raw) < RECORD_HEADER.size:
+            return None
+        timestamp, image_bytes, faces = RECORD_HEADER.unpack(raw)
+        data = self._file.read(image_bytes)
+        det = self._file.read(faces * FACE_FIELDS * 4)
+        if len(data) < image_bytes or len(det) < faces * FACE_FIELDS * 4:  # Truncated last frame.
+            return None
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) if decode else data
+        return timestamp, frame, np.frombuffer(det, dtype=np.float32).reshape(faces, FACE_FIELDS)
+
+    def __iter__(self):
+        while True:
+            record = self.read()
+            if record is None:
+                return
+            yield record
+
+    def close(self):
+        self._file.close()
+
+
+class ReplayCapture:  # Drop-in for cv2.VideoCapture in consumers.
+    """
+    Plays a session file back with the cv2.VideoCapture interface (`read`, `isOpened`, `release`, `get`).
+
+    The recorded timestamp of the last frame is available as `timestamp` (and through `frame_time()`),
+    so time-based logic such as the unknown-person alert delay behaves exactly as it did live,
+    whatever the replay speed.
+
+    Args:
+        path (str): Session file
+        speed (float): 1.0 replays in real time, 2.0 twice as fast, 0 as fast as possible
+    """
+
+    def __init__(self, path, speed=1.0):  # The constructor method.
+        self.speed = speed
+        self.timestamp = None  # Recorded timestamp of the last frame returned.
+        self.detections = None  # Recorded YuNet detections of the last frame returned.
+        self._start = None  # (perf_counter, recorded timestamp) of the first frame, for pacing.
+        try:
+            self.reader = SessionReader(path)
+        except (OSError, ValueError):
+            self.reader = None
+
+    def isOpened(self):
+        return self.reader is not None
+
+    def read(self):  # Same contract as cv2.VideoCapture.read().
+        """Returns (True, frame) with the next recorded frame, or (False, None) at the end."""
+        record = self.reader.read() if self.reader else None
+        if record is None:
+            return False, None
+        timestamp, frame, detections = record
+        if self.speed > 0:  # Wait until the frame is due.
+            if self._start is None:
+                self._start = (time.perf_counter(), timestamp)
+            delay = self._start[0] + (timestamp - self._start[1]) / self.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        self.timestamp, self.detections = timestamp, detections
+        return True, frame
+
+    def frame_time(self):  # Clock for the recognition pipeline.
+        return self.timestamp
+
+    @property
+    def detection_width(self):  # Width the recorded detections refer to (None if none were recorded).
+        return self.reader.header.get('detection_width') if self.reader else None
+
+    def get(self, prop):  # The properties consumers ask for.
+        if self.reader is None:
+            return 0.0
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.reader.header['width'])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.reader.header['height'])
+        return 0.0
+
+    def release(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+def record_session(camera_index=0, output_path='data/sessions/session.frec', seconds=None, detections=False,
+                   codec='.jpg', quality=90, models_dir='models'):  # The recording process.
+    """
+    Records frames from a camera (or stream) with their capture timestamps until the time limit or Ctrl+C.
+
+    Args:
+        camera_index (int or str): Camera index or stream URL
+        output_path (str): Session file to write
+        seconds (float): Stop after this many seconds (default: until Ctrl+C)
+        detections (bool): Also store YuNet detections, so replays can skip detection
+        codec (str): '.jpg' or '.png'
+        quality (int): JPEG quality
+        models_dir (str): Folder with the YuNet model
+    """
+    from recognition_core import DETECTION_WIDTH  # Stored detections use the pipeline's detection width.
+    face_detector = None
+    if detections:
+        detector_path = os.path.join(models_dir, 'face_detection_yunet_2023mar.onnx')
+        if not os.path.exists(detector_path):
+            print(f"Error: Face detector model not found at '{detector_path}'")
+            return
+        face_detector = cv2.FaceDetectorYN.create(detector_path, "", (0, 0))
+
+    cap = cv2.VideoCapture(camera_index)
+    if not cap.isOpened():
+        print(f"Error: Could not open camera with index '{camera_index}'.")
+        return
+    ret, frame = cap.read()
+    if not ret:
+        print("Error: Failed to capture frame.")
+        cap.release()
+        return
+
+    h, w = frame.shape[:2]
+    writer = SessionWriter(output_path, w, h, codec=codec, quality=quality,
+                           detection_width=DETECTION_WIDTH if detections else None, source=camera_index)
+    print(f"Recording {w}x{h} to '{output_path}'. Press Ctrl+C to stop.")
+    start = time.time()
+    try:
+        while ret:
+            timestamp = time.time()  # Capture time; replays use it as the clock.
+            faces = None
+            if face_detector is not None:  # Same resize as RecognitionPipeline.process_frame.
+                scale = DETECTION_WIDTH / frame.shape[1]
+                detection_frame = cv2.resize(frame, (DETECTION_WIDTH, int(frame.shape[0] * scale)))
+                face_detector.setInputSize((detection_frame.shape[1], detection_frame.shape[0]))
+                _, faces = face_detector.detect(detection_frame)
+            writer.write(frame, timestamp, faces)
+            if seconds and timestamp - start >= seconds:
+                break
+            ret, frame = cap.read()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        cap.release()
+    duration = time.time() - start
+    print(f"Recorded {writer.frames} frames in {duration:.1f}s ({writer.bytes / 2 ** 20:.1f} MB).")
+
+
+def session_info(path):  # Summary of a session file.
+    """Prints the header, frame count, duration, frame rate and size of a session file."""
+    reader = SessionReader(path)
+    frames, faces, first, last = 0, 0, None, None
+    while True:
+        record = reader.read(decode=False)  # Headers only; nothing is decoded.
+        if record is None:
+            break
+        timestamp, _, det = record
+        first = timestamp if first is None else first
+        last = timestamp
+        frames += 1
+        faces += len(det)
+    reader.close()
+    header = reader.header
+    duration = (last - first) if frames > 1 else 0.0
+    print(f"Session: {path}")
+    print(f"  Frames: {frames} ({header['width']}x{header['height']} {header['codec']}), {duration:.1f}s"
+          + (f", {(frames - 1) / duration:.1f} fps" if duration > 0 else ""))
+    print(f"  Recorded: {header.get('created')} from '{header.get('source')}'")
+    if header.get('detection_width'):
+        print(f"  Detections: {faces} faces at detection width {header['detection_width']}")
+    else:
+        print("  Detections: not recorded")
+    print(f"  Size: {os.path.getsize(path) / 2 ** 20:.1f} MB")
+
+
+if __name__ == '__main__':  # This block runs only when this script is executed directly.
+    parser = argparse.ArgumentParser(description="Record camera sessions for replay with recognize_face.py --camera <file>.frec.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record', help="Record a session.")
+    rec.add_argument('--camera', type=str, default='0', help="Camera index or video stream URL. Default is 0.")
+    rec.add_argument('--out', default='data/sessions/session.frec', help="Output file. Default is data/sessions/session.frec.")
+    rec.add_argument('--seconds', type=float, default=None, help="Stop after this many seconds (default: Ctrl+C).")
+    rec.add_argument('--detections', action='store_true', help="Also store YuNet detections.")
+    rec.add_argument('--png', action='store_true', help="Store lossless PNG frames instead of JPEG.")
+    rec.add_argument('--quality', type=int, default=90, help="JPEG quality. Default is 90.")
+    info = sub.add_parser('info', help="Summarize a session file.")
+    info.add_argument('path', help="Session file.")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        try:  # Try to convert the camera argument to an integer.
+            camera_source = int(args.camera)
+        except ValueError:  # If it fails (e.g., it's a URL), use it as a string.
+            camera_source = args.camera
+        record_session(camera_source, args.out, seconds=args.seconds, detections=args.detections,
+                       codec='.png' if args.png else '.jpg', quality=args.quality)
+    else:
+        session_info(args.path)
@@ -0,0 +1,255 @@
+# --- Import Necessary Libraries ---
+from collections import deque  # Import deque for the prediction history.
+import numpy as np  # Import numpy for the state arrays.
+
+# --- Track Table ---
+# The tracker state of the recognition pipeline as a struct of arrays: one slot per track, with boxes,
+# time to live, streaks, timestamps, flags and the tracks' embedding sums in preallocated NumPy arrays,
+# so association, aging and expiry are a few array operations per frame instead of Python loops over
+# per-track dicts. Only the names and the prediction history, which are strings, stay in Python lists.
+#
+# Slots are reused through a free list; track ids are never reused. An expired track that was embedded
+# keeps its slot for a while as a "lost" track (the re-identification memory) before the slot is freed.
+
+# --- Configuration Parameters ---
+INITIAL_CAPACITY = 64  # Slots allocated up front; the table doubles when they run out.
+EMBEDDING_DIM = 128  # Length of an SFace embedding.
+PREDICTION_HISTORY_SIZE = 10  # How many of the last predictions to store for smoothing.
+TRACKER_TTL = 5  # Time To Live: How many frames a tracker can exist without being re-detected before it's deleted.
+MATCH_IOU = 0.5  # A detection continues the track it overlaps most if their IoU is above this.
+AGGREGATE_RESET_SIMILARITY = 0.3  # A face less similar than this to its track's mean embedding starts a new mean (tracker swapped faces).
+REID_MEMORY_SECONDS = 10.0  # How long an expired track is remembered for re-identification.
+REID_MEMORY_SIZE = 32  # At most this many expired tracks are remembered (the oldest are forgotten first).
+REID_SIMILARITY = 0.5  # Minimum cosine similarity between a new face and a remembered track's mean embedding...
+REID_MAX_SHIFT = 3.0  # ...whose last box centre is at most this many box widths away.
+
+
+def iou_matrix(boxes_a, boxes_b):  # get_iou for every pair at once.
+    """Returns the (N, M) IoU of (N, 4) and (M, 4) boxes given as x1, y1, x2, y2."""
+    a = np.asarray(boxes_a, dtype=np.float32)[:, None, :]
+    b = np.asarray(boxes_b, dtype=np.float32)[None, :, :]
+    w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = w * h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
+
+
+class TrackTable:  # Tracker state for one video stream.
+    """
+    Preallocated per-track arrays indexed by slot.
+
+    Args:
+        capacity (int): Initial number of slots
+        dim (int): Embedding length
+
+    Attributes:
+        ids (np.ndarray): Track id of each slot (-1 if free)
+        active (np.ndarray): Slots of tracks seen within the last TRACKER_TTL frames
+        lost (np.ndarray): Slots of expired tracks kept for re-identification
+        boxes (np.ndarray): Last box (x1, y1, x2, y2 at the detection width)
+        ttl, streak, stable, since_embed (np.ndarray): Frames left to live, confirmation streak, consecutive
+            stable matches and frames since the last embedding
+        first_seen, lost_time, score (np.ndarray): When the track started and expired, and its displayed score
+        alert_sent, logged (np.ndarray): Flags for the one unknown alert and the one welcome per track
+        embeddings, has_embedding (np.ndarray): Quality-weighted sum of the track's unit embeddings
+        confirmed_name, name, predictions, votes (list): Per-slot Python state
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY, dim=EMBEDDING_DIM):  # The constructor method.
+        self.dim = dim
+        self.capacity = 0
+        self.next_id = 0  # Track ids are never reused.
+        self.free = []  # Free slots; the lowest slot is at the end.
+        self.confirmed_name, self.name, self.predictions, self.votes = [], [], [], []
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+        self.lost = np.zeros(0, dtype=bool)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.ttl = np.zeros(0, dtype=np.int32)
+        self.streak = np.zeros(0, dtype=np.int32)
+        self.stable = np.zeros(0, dtype=np.int32)
+        self.since_embed = np.zeros(0, dtype=np.int32)
+        self.first_seen = np.zeros(0)
+        self.lost_time = np.zeros(0)
+        self.score = np.zeros(0, dtype=np.float32)
+        self.alert_sent = np.zeros(0, dtype=bool)
+        self.logged = np.zeros(0, dtype=bool)
+        self.embeddings = np.zeros((0, dim), dtype=np.float32)
+        self.has_embedding = np.zeros(0, dtype=bool)
+        self.grow(capacity)
+
+    def grow(self, capacity):  # More slots.
+        """Reallocates every array with `capacity` slots, keeping the existing ones."""
+        old = self.capacity
+        for attr in ('ids', 'active', 'lost', 'boxes', 'ttl', 'streak', 'stable', 'since_embed', 'first_seen',
+                     'lost_time', 'score', 'alert_sent', 'logged', 'embeddings', 'has_embedding'):
+            array = getattr(self, attr)
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, attr, grown)
+        self.ids[old:] = -1
+        for attr in ('confirmed_name', 'name'):
+            getattr(self, attr).extend(["Unknown"] * (capacity - old))
+        self.predictions.extend(deque(maxlen=PREDICTION_HISTORY_SIZE) for _ in range(capacity - old))
+        self.votes.extend({} for _ in range(capacity - old))
+        self.free = list(range(capacity - 1, old - 1, -1)) + self.free
+        self.capacity = capacity
+
+    def __len__(self):  # Number of active tracks.
+        return int(self.active.sum())
+
+    def live_slots(self):  # Slots of the active tracks.
+        return np.flatnonzero(self.active)
+
+    # --- Creating and Freeing Tracks ---
+    def new(self, now):  # Start a track.
+        """Takes a free slot for a new track first seen at `now` and returns the slot."""
+        if not self.free:
+            self.grow(self.capacity * 2)
+        slot = self.free.pop()
+        self.ids[slot] = self.next_id
+        self.next_id += 1
+        self.active[slot], self.lost[slot] = True, False
+        self.ttl[slot] = TRACKER_TTL
+        self.streak[slot] = self.stable[slot] = self.since_embed[slot] = 0
+        self.first_seen[slot] = now
+        self.score[slot] = 0.0
+        self.alert_sent[slot] = self.logged[slot] = self.has_embedding[slot] = False
+        self.confirmed_name[slot] = self.name[slot] = "Unknown"
+        self.predictions[slot].clear()
+        self.votes[slot].clear()
+        return slot
+
+    def release(self, slots):  # Free slots.
+        slots = np.atleast_1d(slots)
+        self.active[slots] = self.lost[slots] = False
+        self.ids[slots] = -1
+        self.free.extend(int(s) for s in slots)
+
+    def reset_name(self, slot):  # Forget a confirmed name.
+        self.confirmed_name[slot] = "Unknown"
+        self.streak[slot] = self.stable[slot] = 0
+        self.predictions[slot].clear()
+        self.votes[slot].clear()
+
+    # --- Per-Frame Work ---
+    def associate(self, boxes):  # Detections to tracks.
+        """
+        Matches (N, 4) detection boxes to the active tracks.
+
+        Every detection is compared with every track in one IoU matrix. A detection continues the track
+        it overlaps most if the IoU is above MATCH_IOU and no earlier detection already took that track.
+
+        Returns:
+            np.ndarray: (N,) slot for each detection, or -1 where a new track is needed
+        """
+        slots = np.full(len(boxes), -1, dtype=np.int64)
+        live = self.live_slots()
+        if len(boxes) and len(live):
+            iou = iou_matrix(boxes, self.boxes[live])
+            best = iou.argmax(axis=1)
+            candidates = np.flatnonzero(iou[np.arange(len(boxes)), best] > MATCH_IOU)
+            _, first = np.unique(best[candidates], return_index=True)  # First detection per track, in order.
+            winners = candidates[first]
+            slots[winners] = live[best[winners]]
+        return slots
+
+    def touch(self, slot, box):  # A track was seen in this frame.
+        self.boxes[slot] = box
+        self.ttl[slot] = TRACKER_TTL
+
+    def age(self, seen, now):  # Count down and expire unseen tracks.
+        """
+        Decrements the time to live of every active track not in `seen`. Expired tracks with an embedding
+        become lost tracks (the re-identification memory); the others, and lost tracks that are too old
+        or beyond REID_MEMORY_SIZE, free their slots.
+        """
+        unseen = self.active.copy()
+        unseen[np.asarray(seen, dtype=np.int64)] = False
+        self.ttl[unseen] -= 1
+        dead = np.flatnonzero(self.active & (self.ttl <= 0))
+        if len(dead):
+            self.active[dead] = False
+            remembered = dead[self.has_embedding[dead]]
+            self.lost[remembered] = True
+            self.lost_time[remembered] = now
+            self.release(dead[~self.has_embedding[dead]])
+        lost = np.flatnonzero(self.lost)
+        if len(lost):
+            too_old = now - self.lost_time[lost] >= REID_MEMORY_SECONDS
+            too_old[np.argsort(self.lost_time[lost])[:max(0, len(lost) - REID_MEMORY_SIZE)]] = True
+            if too_old.any():
+                self.release(lost[too_old])
+
+    # --- Embeddings ---
+    def add_embedding(self, slot, feature, quality):  # O(1) update of the track's mean embedding.
+        """
+        Adds a face's embedding, weighted by its quality, to the track's sum.
+
+        Returns:
+            tuple: (sum as a (1, dim) array, True if the face did not resemble the track and the sum restarted)
+        """
+        unit = feature.reshape(-1) / max(float(np.linalg.norm(feature)), 1e-12)
+        weight = max(quality, 1e-3)  # With the gate off, faces with a zero landmark quality still count a little.
+        total = self.embeddings[slot]
+        restart = False
+        if self.has_embedding[slot] and float(unit @ total) < AGGREGATE_RESET_SIMILARITY * np.linalg.norm(total):
+            restart = True  # Someone else: the tracker followed a different face.
+            self.stable[slot] = 0
+        if restart or not self.has_embedding[slot]:
+            total[:] = unit * weight
+            self.has_embedding[slot] = True
+        else:
+            total += unit * weight
+        return total.reshape(1, -1), restart
+
+    def relink(self, slot, feature, box):  # Re-identify a new track.
+        """
+        Compares a new track's first embedding and box with every lost track in one matrix product. On a
+        match the lost track becomes active again and `slot` is freed.
+
+        Returns:
+            int: The slot to continue with (the lost track's, or `slot` if none matched)
+        """
+        lost = np.flatnonzero(self.lost)
+        if not len(lost):
+            return slot
+        sums = self.embeddings[lost]
+        unit = feature.reshape(-1).astype(np.float32) / max(float(np.linalg.norm(feature)), 1e-12)
+        similarity = (sums @ unit) / np.maximum(np.linalg.norm(sums, axis=1), 1e-12)
+        x1, y1, x2, y2 = box
+        last = self.boxes[lost]
+        shift = np.hypot((last[:, 0] + last[:, 2]) / 2 - (x1 + x2) / 2, (last[:, 1] + last[:, 3]) / 2 - (y1 + y2) / 2)
+        widths = np.maximum(last[:, 2] - last[:, 0], x2 - x1)
+        similarity[(similarity < REID_SIMILARITY) | (shift > REID_MAX_SHIFT * widths)] = -np.inf
+        best = int(np.argmax(similarity))
+        if not np.isfinite(similarity[best]):
+            return slot
+        found = lost[best]
+        self.lost[found], self.active[found] = False, True
+        self.release(slot)
+        return int(found)
+
+    # --- Votes ---
+    def add_vote(self, slot, name):  # O(1) update of the vote counts.
+        """Appends `name` to the track's prediction history and returns the name with the most votes."""
+        predictions, votes = self.predictions[slot], self.votes[slot]
+        if len(predictions) == predictions.maxlen:  # The oldest vote drops out of the window.
+            oldest = predictions[0]
+            votes[oldest] -= 1
+            if not votes[oldest]:
+                del votes[oldest]
+        predictions.append(name)
+        votes[name] = votes.get(name, 0) + 1
+        return max(votes, key=votes.get)  # At most PREDICTION_HISTORY_SIZE names.
+
+    # --- Read Access ---
+    def info(self, slot):  # One track as a dict, for event handlers and status reports.
+        return {'id': int(self.ids[slot]), 'name': self.name[slot], 'confirmed_name': self.confirmed_name[slot],
+                'score': float(self.score[slot]), 'first_seen': float(self.first_seen[slot]),
+                'box': tuple(int(v) for v in self.boxes[slot])}
+
+    def records(self):  # All active tracks.
+        return [self.info(slot) for slot in self.live_slots()]
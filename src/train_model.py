@@ -2,17 +2,189 @@
 # --- Import Necessary Libraries ---
 import cv2  # Import OpenCV for image processing and deep learning model inference.
 import os  # Import os to interact with the file system (e.g., reading file paths, creating directories).
+import argparse  # Import argparse to parse command-line arguments when running the script directly.
+import hashlib  # Import hashlib to fingerprint image and model files for the embedding cache.
 import numpy as np  # Import numpy for numerical operations, especially with image arrays.
 import yaml  # Import yaml to save a human-readable list of trained names.
-import pickle  # Import pickle to serialize and save the Python object containing embeddings and names.
 import random  # Import random for data augmentation choices.
+import shutil  # Import shutil to clear the embedding store on a full rebuild.
+import tempfile  # Import tempfile for a throw-away store when caching is disabled.
+from multiprocessing import Pool  # Import Pool to embed images in parallel worker processes.
+from embedding_store import EmbeddingStore  # Import our sharded on-disk store for the extracted embeddings.
+from gallery import GalleryWriter  # Import the writer for the memory-mapped gallery format.
+from face_detectors import create_detector, detector_key, add_detector_arguments, detector_options  # Import the detector backends.
 
-def train_model(data_dir='data/train', embeddings_path='models/embeddings.pkl', labels_path='models/face_labels.yml'):  # Main function to train the model.
+# --- Pipeline Settings ---
+# Anything that changes the extracted embeddings must be part of the cache fingerprint below.
+TARGET_WIDTH = 640  # Images are resized to this width before detection.
+DETECTION_CONF_THRESHOLD = 0.90  # Only faces detected with a score higher than this are used (90% confidence).
+CACHE_VERSION = 2  # Bump this when the embedding pipeline changes in a way the model hashes cannot see.
+
+# --- Data Augmentation: Create more training data from existing images ---
+# By creating slightly modified versions of our training images (e.g., brighter, flipped),
+# we teach the model to be more robust and recognize faces under different conditions.
+
+def augment_brightness_contrast(image, rng=random):  # Function to randomly change brightness and contrast.
+    """Creates a new version of an image with slightly different brightness and contrast."""
+    brightness = rng.randint(-30, 30)  # Choose a random integer for brightness adjustment.
+    contrast = rng.uniform(0.8, 1.2)  # Choose a random float for contrast adjustment.
+    augmented = np.clip(image * contrast + brightness, 0, 255).astype(np.uint8)  # Apply changes and clip values to the valid 0-255 range.
+    return augmented  # Return the modified image.
+
+def augment_flip(image):  # Function to horizontally flip an image.
+    """Creates a mirror image of the face."""
+    return cv2.flip(image, 1)  # Use OpenCV's flip function with code 1 for horizontal flip.
+
+def augment_rotation(image, rng=random):  # Function to slightly rotate an image.
+    """Creates a slightly rotated version of the face."""
+    angle = rng.uniform(-15, 15)  # Choose a random rotation angle between -15 and 15 degrees.
+    h, w = image.shape[:2]  # Get the height and width of the image.
+    center = (w // 2, h // 2)  # Calculate the center of the image.
+    M = cv2.getRotationMatrix2D(center, angle, 1.0)  # Get the 2D rotation matrix.
+    return cv2.warpAffine(image, M, (w, h))  # Apply the rotation to the image.
+
+def embed_image(image_path, face_detector, face_recognizer, num_augmentations, seed=None):  # Process a single training image.
+    """Detects the best face in one image and returns its embedding plus the embeddings of its augmented copies."""
+    # --- Argument Explanations ---
+    # image_path (str): Path of the training image.
+    # face_detector / face_recognizer: The loaded face detector (YuNet or a face_detectors backend) and SFace model.
+    # num_augmentations (int): How many augmented copies to embed in addition to the original.
+    # seed (int): Seed for the augmentation choices. The same image and seed always give the same embeddings,
+    #             no matter which process or in which order it is processed.
+    # Returns (features, message): `features` is an (1 + num_augmentations, 128) array, or None if the image was skipped.
+    image_name = os.path.basename(image_path)  # Used in the skip messages.
+    image = cv2.imread(image_path)  # Read the image from the file.
+    if image is None:  # If the image could not be read...
+        return None, f"Skipping file {image_path}, could not read."  # ...report it and skip the image.
+
+    # --- Pre-processing: Resize image for more consistent detection ---
+    h, w, _ = image.shape  # Get the original image dimensions.
+    scale = TARGET_WIDTH / w  # Calculate the scaling factor.
+    resized_image = cv2.resize(image, (TARGET_WIDTH, int(h * scale)))  # Resize the image while maintaining aspect ratio.
+
+    # Set the input size for the face detector.
+    h_resized, w_resized, _ = resized_image.shape  # Get the new dimensions of the resized image.
+    face_detector.setInputSize((w_resized, h_resized))  # Tell the detector the size of the image it will receive.
+
+    # Detect faces in the resized image.
+    _, faces = face_detector.detect(resized_image)  # Run detection.
+    if faces is None or len(faces) == 0:  # If no faces were detected in the image...
+        return None, f"  - Skipping {image_name}: no face detected."  # ...report it.
+
+    # Find the face with the highest detection score in the image (most likely to be a real face).
+    best_face = max(faces, key=lambda face: face[-1])  # The score is the last element of each face array.
+    if best_face[-1] < DETECTION_CONF_THRESHOLD:  # If the best face's confidence was too low...
+        return None, f"  - Skipping {image_name}: face detection confidence too low ({best_face[-1]:.2f})"  # ...report it.
+
+    # Align the face (rotate and crop it to be upright and centered).
+    original_aligned_face = face_recognizer.alignCrop(resized_image, best_face)  # This is a crucial step for accurate recognition.
+
+    # --- Process the original, non-augmented face first ---
+    features = [face_recognizer.feature(original_aligned_face)]  # Extract the 128-d feature vector (embedding).
+
+    # --- Create and process the "fake" augmented versions ---
+    rng = random.Random(seed)  # A private generator, so results never depend on what other images were processed.
+    for _ in range(num_augmentations):  # Loop to create multiple augmented versions.
+        augmented_image = original_aligned_face.copy()  # Start with a copy of the original aligned face.
+        # Randomly decide whether to apply each type of augmentation.
+        if rng.choice([True, False]):  # 50% chance.
+            augmented_image = augment_brightness_contrast(augmented_image, rng)  # Apply brightness/contrast change.
+        if rng.choice([True, False]):  # 50% chance.
+            augmented_image = augment_flip(augmented_image)  # Apply horizontal flip.
+        if rng.choice([True, False]):  # 50% chance.
+            augmented_image = augment_rotation(augmented_image, rng)  # Apply rotation.
+        features.append(face_recognizer.feature(augmented_image))  # Get the feature embedding from the augmented image.
+
+    return np.vstack(features), None  # One row per embedding.
+
+# --- Parallel Workers ---
+# Each worker process creates its own YuNet and SFace objects once and then takes image tasks
+# from the pool's shared task queue. OpenCV models cannot be shared between processes.
+_worker_models = None  # (face_detector, face_recognizer) of the current worker process.
+
+def _init_worker(models_dir, recognizer_path, detector=None):  # Runs once in every worker process.
+    """Loads the models for this worker and limits OpenCV to one thread so workers don't compete for cores."""
+    global _worker_models
+    cv2.setNumThreads(1)  # Parallelism comes from the processes, not from OpenCV's internal threads.
+    _worker_models = (create_detector(models_dir=models_dir, **(detector or {})),
+                      cv2.FaceRecognizerSF.create(recognizer_path, ""))
+
+def _embed_task(task):  # Runs in a worker process for every image.
+    """Embeds one (image_path, num_augmentations, seed) task with this worker's models."""
+    image_path, num_augmentations, seed = task
+    try:
+        return embed_image(image_path, *_worker_models, num_augmentations, seed=seed)
+    except Exception as e:  # Never let one bad image kill the whole pool.
+        return None, f"Skipping file {image_path}, could not open or read: {e}"
+
+def seed_from_hash(content_hash):  # Derive the augmentation seed from the image content.
+    """Turns an image's content hash into a reproducible augmentation seed."""
+    return int(content_hash[:16], 16)  # The first 64 bits of the SHA-1.
+
+# --- Embedding Cache Helpers ---
+# The cache maps "image content hash + model hash" to the extracted embeddings, so retraining
+# only has to detect and embed images that are new or changed. The embeddings themselves live
+# in an EmbeddingStore (fixed-size shards on disk), so memory does not grow with the dataset.
+
+def file_sha1(path):  # Hash the content of a file.
+    """Returns the SHA-1 hex digest of a file's content, read in 1 MB chunks."""
+    digest = hashlib.sha1()  # Create a new hash object.
+    with open(path, 'rb') as f:  # Open the file in read-binary mode.
+        for chunk in iter(lambda: f.read(1 << 20), b''):  # Read until the end of the file.
+            digest.update(chunk)  # Feed each chunk to the hash.
+    return digest.hexdigest()  # Return the hash as a hex string.
+
+def models_fingerprint(detector_path, recognizer_path, detector=None):  # Hash everything that affects the embeddings.
+    """Returns a hash of both model files, the detector backend settings and the pipeline settings."""
+    digest = hashlib.sha1()  # Create a new hash object.
+    digest.update(file_sha1(detector_path).encode())  # Detector model content.
+    digest.update(file_sha1(recognizer_path).encode())  # Recognizer model content.
+    digest.update(f"{CACHE_VERSION}:{TARGET_WIDTH}:{DETECTION_CONF_THRESHOLD}".encode())  # Pipeline settings.
+    digest.update(detector_key(detector).encode())  # Empty for YuNet, so existing caches stay valid.
+    return digest.hexdigest()[:16]  # A short prefix is plenty to tell model versions apart.
+
+# --- Dynamic Data Augmentation ---
+# We can create more "fake" images for people with fewer photos to balance the dataset.
+# This helps the model learn better from under-represented individuals.
+BASE_AUGMENTATIONS = 2  # Number of augmented images to create for people with enough photos.
+EXTRA_AUGMENTATIONS = 8  # Number of augmented images for people with few photos.
+FEW_IMAGES_THRESHOLD = 10  # The threshold to decide if a person has "few" photos.
+
+def iter_training_images(data_dir):  # Stream the dataset one image at a time.
+    """Yields (person_name, image_name, image_path, num_augmentations) for every training image in sorted order."""
+    # Loop through each item in the main 'data/train' directory.
+    for person_name in sorted(os.listdir(data_dir)):  # 'person_name' will be the name of the subfolder.
+        person_dir = os.path.join(data_dir, person_name)  # Construct the full path to the person's folder.
+        if not os.path.isdir(person_dir):  # Check if it's actually a directory.
+            continue  # If not, skip to the next item.
+
+        print(f"Processing images for {person_name}...")  # Print the name of the person being processed.
+
+        image_files = sorted(f for f in os.listdir(person_dir) if os.path.isfile(os.path.join(person_dir, f)))  # Get a list of all files in the person's folder.
+
+        # Decide how many augmentations to perform for this person based on the number of images they have.
+        if len(image_files) < FEW_IMAGES_THRESHOLD:  # If the number of images is below the threshold...
+            num_augmentations_for_person = EXTRA_AUGMENTATIONS  # ...use the higher number of augmentations.
+            print(f"  -> Low image count ({len(image_files)}). Applying {EXTRA_AUGMENTATIONS} augmentations per image.")  # Inform the user.
+        else:  # Otherwise...
+            num_augmentations_for_person = BASE_AUGMENTATIONS  # ...use the base number.
+
+        for image_name in image_files:  # Loop through each image file for the current person.
+            yield person_name, image_name, os.path.join(person_dir, image_name), num_augmentations_for_person
+
+def train_model(data_dir='data/train', embeddings_path='models/gallery.json', labels_path='models/face_labels.yml',
+                cache_path='models/embedding_cache', workers=1, dtype='float32', detector=None):  # Main function to train the model.
     """Goes through training images, detects faces, extracts deep learning embeddings, and saves them."""
     # --- Argument Explanations ---
     # data_dir (str): The folder where our training images are stored (e.g., 'data/train').
-    # embeddings_path (str): The file path where the extracted embeddings will be saved.
+    # embeddings_path (str): The gallery manifest where the extracted embeddings will be saved (see gallery.py).
     # labels_path (str): The file path where a human-readable list of names will be saved.
+    # cache_path (str): Directory of the embedding store. It doubles as the checkpoint: an interrupted run resumes
+    #                   where it stopped. None uses a temporary store (full retrain, nothing kept).
+    # workers (int): Number of worker processes for embedding new images. 1 = serial, 0 = one per CPU core.
+    # dtype (str): Storage precision of the gallery, 'float32' or 'float16' (half the size).
+    # detector (dict): Face detector options for face_detectors.create_detector() (backend, Haar settings).
+    #                  None uses YuNet.
 
     # --- Initial Checks and Setup ---
     if not os.path.exists(data_dir):  # Check if the training data directory exists.
@@ -23,154 +195,148 @@ def train_model(data_dir='data/train', embeddings_path='models/embeddings.pkl',
     if not os.path.exists(models_dir):  # Check if the models directory exists.
         os.makedirs(models_dir)  # Create it if it doesn't.
 
-    # --- Load Deep Learning Models ---
-    # Load the DNN face detector model (YuNet).
+    # --- Locate Deep Learning Models ---
+    # The SFace recognizer is only loaded (by each worker) if an image is not in the cache. The detector is
+    # created here, so a missing model or cascade file is reported before any work is done.
     detector_path = os.path.join(models_dir, 'face_detection_yunet_2023mar.onnx')  # Path to the detector model.
     if not os.path.exists(detector_path):  # Check if the model file exists.
         print(f"Error: Face detector model not found at '{detector_path}'")  # Print an error.
         print("Please download it and place it in the 'models' folder.")  # Provide instructions.
         return  # Exit.
-    face_detector = cv2.FaceDetectorYN.create(detector_path, "", (0, 0))  # Create the face detector object.
 
-    # Load the DNN face recognizer model (SFace).
     recognizer_path = os.path.join(models_dir, 'face_recognition_sface_2021dec.onnx')  # Path to the recognizer model.
     if not os.path.exists(recognizer_path):  # Check if the model file exists.
         print(f"Error: Face recognizer model not found at '{recognizer_path}'")  # Print an error.
         print("Please download it and place it in the 'models' folder.")  # Provide instructions.
         return  # Exit.
-    face_recognizer = cv2.FaceRecognizerSF.create(recognizer_path, "")  # Create the face recognizer object.
-
-    # Set a confidence threshold for face detection. We will only process faces detected with a score higher than this.
-    DETECTION_CONF_THRESHOLD = 0.90  # A value of 0.9 means 90% confidence.
-
-    # --- Data Augmentation: Create more training data from existing images ---
-    # By creating slightly modified versions of our training images (e.g., brighter, flipped),
-    # we teach the model to be more robust and recognize faces under different conditions.
-
-    def augment_brightness_contrast(image):  # Function to randomly change brightness and contrast.
-        """Creates a new version of an image with slightly different brightness and contrast."""
-        brightness = random.randint(-30, 30)  # Choose a random integer for brightness adjustment.
-        contrast = random.uniform(0.8, 1.2)  # Choose a random float for contrast adjustment.
-        augmented = np.clip(image * contrast + brightness, 0, 255).astype(np.uint8)  # Apply changes and clip values to the valid 0-255 range.
-        return augmented  # Return the modified image.
-
-    def augment_flip(image):  # Function to horizontally flip an image.
-        """Creates a mirror image of the face."""
-        return cv2.flip(image, 1)  # Use OpenCV's flip function with code 1 for horizontal flip.
-
-    def augment_rotation(image):  # Function to slightly rotate an image.
-        """Creates a slightly rotated version of the face."""
-        angle = random.uniform(-15, 15)  # Choose a random rotation angle between -15 and 15 degrees.
-        h, w = image.shape[:2]  # Get the height and width of the image.
-        center = (w // 2, h // 2)  # Calculate the center of the image.
-        M = cv2.getRotationMatrix2D(center, angle, 1.0)  # Get the 2D rotation matrix.
-        return cv2.warpAffine(image, M, (w, h))  # Apply the rotation to the image.
-
-    # --- Dynamic Data Augmentation ---
-    # We can create more "fake" images for people with fewer photos to balance the dataset.
-    # This helps the model learn better from under-represented individuals.
-    BASE_AUGMENTATIONS = 2  # Number of augmented images to create for people with enough photos.
-    EXTRA_AUGMENTATIONS = 8  # Number of augmented images for people with few photos.
-    FEW_IMAGES_THRESHOLD = 10  # The threshold to decide if a person has "few" photos.
-
-    # --- Data Processing Loop ---
-    known_embeddings = []  # Create an empty list to store all face embeddings (features).
-    known_names = []  # Create an empty list to store the corresponding names for each embedding.
-    
+    face_detector = create_detector(models_dir=models_dir, **(detector or {}))  # YuNet unless another backend is chosen.
+    if face_detector is None:  # E.g. the Haar cascade file is missing (the reason has been printed).
+        return  # Exit.
+
+    # --- Embedding Store (cache + checkpoint) ---
+    temp_dir = None
+    if cache_path is None:  # Caching disabled: stream into a temporary store instead.
+        temp_dir = tempfile.mkdtemp(prefix='embedding_store_')
+    store = EmbeddingStore(cache_path or temp_dir)  # Previously extracted embeddings, on disk.
+    model_hash = models_fingerprint(detector_path, recognizer_path, detector)  # Cached entries from other models never match.
+    previous_files = store.load_files()  # (size, mtime_ns, sha1) per image from the last run.
+    seen_files = {}  # Fresh stat index of the current dataset.
+
+    # --- Step 1: List the dataset and look every image up in the store ---
+    plan = []  # One (person_name, source, key, num_augmentations) entry per image, in a fixed sorted order.
+    tasks = {}  # key -> (image_path, num_augmentations, seed) for images that must be processed.
+
     print("Preparing data and extracting embeddings...")  # Print a status message.
-    # Loop through each item in the main 'data/train' directory.
-    for person_name in os.listdir(data_dir):  # 'person_name' will be the name of the subfolder.
-        person_dir = os.path.join(data_dir, person_name)  # Construct the full path to the person's folder.
-        if not os.path.isdir(person_dir):  # Check if it's actually a directory.
-            continue  # If not, skip to the next item.
+    for person_name, image_name, image_path, num_augmentations in iter_training_images(data_dir):
+        source = f"{person_name}/{image_name}"  # Identify the source image for this embedding and its augmentations.
+        try:  # Use a try-except block to handle unreadable files gracefully.
+            # --- Content hash, reusing the previous hash if size and modification time are unchanged ---
+            stat = os.stat(image_path)  # Cheap metadata lookup.
+            previous = previous_files.get(source)
+            if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime_ns:
+                content_hash = previous[2]  # Unchanged file: no need to read it.
+            else:
+                content_hash = file_sha1(image_path)  # New or modified file: hash its content.
+            seen_files[source] = (stat.st_size, stat.st_mtime_ns, content_hash)
+        except Exception as e:  # If the file could not be read...
+            print(f"Skipping file {image_path}, could not open or read: {e}")  # ...print the error...
+            continue  # ...and continue to the next file.
 
-        print(f"Processing images for {person_name}...")  # Print the name of the person being processed.
+        # --- Store lookup ---
+        key = f"{content_hash}:{model_hash}"  # The same photo under another name or path is still a hit.
+        entry = store.get(key)
+        if (entry is None or entry['num_augmentations'] < num_augmentations) and key not in tasks:
+            tasks[key] = (image_path, num_augmentations, seed_from_hash(content_hash))  # Needs processing.
+        plan.append((person_name, source, key, num_augmentations))
 
-        image_files = [f for f in os.listdir(person_dir) if os.path.isfile(os.path.join(person_dir, f))]  # Get a list of all files in the person's folder.
+    # --- Step 2: Detect and embed only the new or changed images, streaming results to disk ---
+    cache_hits = len(plan) - len(tasks)  # Images whose embeddings came from the store.
+    try:
+        if tasks:
+            keys = list(tasks)  # Fixed task order, so results are merged deterministically.
+            if workers == 0:  # 0 means "use every core".
+                workers = os.cpu_count() or 1
+            workers = max(1, min(workers, len(keys)))  # Never start more workers than there are images.
+            print(f"Embedding {len(keys)} new or changed images with {workers} worker(s)...")
 
-        # Decide how many augmentations to perform for this person based on the number of images they have.
-        if len(image_files) < FEW_IMAGES_THRESHOLD:  # If the number of images is below the threshold...
-            num_augmentations_for_person = EXTRA_AUGMENTATIONS  # ...use the higher number of augmentations.
-            print(f"  -> Low image count ({len(image_files)}). Applying {EXTRA_AUGMENTATIONS} augmentations per image.")  # Inform the user.
-        else:  # Otherwise...
-            num_augmentations_for_person = BASE_AUGMENTATIONS  # ...use the base number.
+            if workers == 1:  # Serial mode: run the same task function in this process.
+                global _worker_models
+                _worker_models = (face_detector,  # The face detector object.
+                                  cv2.FaceRecognizerSF.create(recognizer_path, ""))  # Create the face recognizer object.
+                for done, key in enumerate(keys, 1):
+                    features, message = _embed_task(tasks[key])
+                    store.add(key, features, message, tasks[key][1])  # Checkpoints automatically every shard.
+                    if done % 500 == 0:
+                        print(f"  ... {done}/{len(keys)} images embedded")
+            else:  # Parallel mode: imap returns results in task order regardless of which worker finished first.
+                with Pool(workers, initializer=_init_worker, initargs=(models_dir, recognizer_path, detector)) as pool:
+                    results = pool.imap(_embed_task, (tasks[k] for k in keys), chunksize=4)
+                    for done, (key, (features, message)) in enumerate(zip(keys, results), 1):
+                        # Skipped images are stored too, so they are not re-detected next time.
+                        store.add(key, features, message, tasks[key][1])
+                        if done % 500 == 0:
+                            print(f"  ... {done}/{len(keys)} images embedded")
+    finally:
+        store.flush()  # Checkpoint whatever finished, even if the run is interrupted.
 
-        for image_name in image_files:  # Loop through each image file for the current person.
-            image_path = os.path.join(person_dir, image_name)  # Construct the full path to the image.
-            try:  # Use a try-except block to handle corrupted or unreadable files gracefully.
-                image = cv2.imread(image_path)  # Read the image from the file.
-                if image is None:  # If the image could not be read...
-                    print(f"Skipping file {image_path}, could not read.")  # ...print a warning...
-                    continue  # ...and skip to the next image.
-
-                # --- Pre-processing: Resize image for more consistent detection ---
-                target_width = 640  # Define a standard width.
-                h, w, _ = image.shape  # Get the original image dimensions.
-                scale = target_width / w  # Calculate the scaling factor.
-                resized_image = cv2.resize(image, (target_width, int(h * scale)))  # Resize the image while maintaining aspect ratio.
-                
-                # Set the input size for the face detector.
-                h_resized, w_resized, _ = resized_image.shape  # Get the new dimensions of the resized image.
-                face_detector.setInputSize((w_resized, h_resized))  # Tell the detector the size of the image it will receive.
-
-                # Detect faces in the resized image.
-                _, faces = face_detector.detect(resized_image)  # Run detection.
-                
-                if faces is not None and len(faces) > 0:  # Check if at least one face was found.
-                    # Find the face with the highest detection score in the image (most likely to be a real face).
-                    best_face = max(faces, key=lambda face: face[-1])  # The score is the last element of each face array.
-                    if best_face[-1] >= DETECTION_CONF_THRESHOLD:  # Check if the best face's score is above our threshold.
-                        # Align the face (rotate and crop it to be upright and centered).
-                        original_aligned_face = face_recognizer.alignCrop(resized_image, best_face)  # This is a crucial step for accurate recognition.
-                        
-                        # --- Process the original, non-augmented face first ---
-                        feature = face_recognizer.feature(original_aligned_face)  # Extract the 128-d feature vector (embedding).
-                        known_embeddings.append(feature)  # Add the embedding to our list.
-                        known_names.append(person_name)  # Add the corresponding name to the other list.
-
-                        # --- Create and process the "fake" augmented versions ---
-                        for _ in range(num_augmentations_for_person):  # Loop to create multiple augmented versions.
-                            augmented_image = original_aligned_face.copy()  # Start with a copy of the original aligned face.
-                            # Randomly decide whether to apply each type of augmentation.
-                            if random.choice([True, False]):  # 50% chance.
-                                augmented_image = augment_brightness_contrast(augmented_image)  # Apply brightness/contrast change.
-                            if random.choice([True, False]):  # 50% chance.
-                                augmented_image = augment_flip(augmented_image)  # Apply horizontal flip.
-                            if random.choice([True, False]):  # 50% chance.
-                                augmented_image = augment_rotation(augmented_image)  # Apply rotation.
-                            
-                            # Get the feature embedding from our newly created augmented image.
-                            aug_feature = face_recognizer.feature(augmented_image)  # Extract the feature.
-                            known_embeddings.append(aug_feature)  # Add the new embedding to our list.
-                            known_names.append(person_name)  # Add the corresponding name.
-                    else:  # If the best face's confidence was too low...
-                        print(f"  - Skipping {image_name}: face detection confidence too low ({best_face[-1]:.2f})")  # ...print a warning.
-                else:  # If no faces were detected in the image...
-                    print(f"  - Skipping {image_name}: no face detected.")  # ...print a warning.
-
-            except Exception as e:  # If any other error occurred while processing the file...
-                print(f"Skipping file {image_path}, could not open or read: {e}")  # ...print the error...
-                continue  # ...and continue to the next file.
+    # --- Step 3: Merge the stored embeddings into the gallery in dataset order ---
+    # Rows are streamed from the memory-mapped shards straight into the memory-mapped gallery file,
+    # so the merge needs no more memory than one image's embeddings.
+    used_keys = set(key for _, _, key, _ in plan)  # Store entries referenced by the current dataset; the rest are pruned below.
+    total_rows = 0  # Final gallery size, needed to create the output file.
+    for person_name, source, key, num_augmentations in plan:
+        total_rows += min(store.get(key)['count'], 1 + num_augmentations)
+
+    known_names = set()  # Persons that ended up with at least one embedding.
+    if total_rows:
+        writer = GalleryWriter(embeddings_path, total_rows, dtype=dtype)
+        for person_name, source, key, num_augmentations in plan:
+            features = store.features(key)
+            if features is None:  # The image had no usable face.
+                print(store.get(key)['message'])  # Print the reason it was skipped.
+                continue
+            features = features[:1 + num_augmentations]  # The original first, then its augmented copies.
+            writer.append(features, person_name, source, [i > 0 for i in range(len(features))])  # Row 0 is the original image.
+            known_names.add(person_name)
+        writer.close()  # Atomically publishes the new gallery; running recognizers keep their old copy.
+
+    # --- Update the Store (deleted or changed images are pruned from it) ---
+    store.prune(used_keys)  # Forget images that are gone; compacts the shards if many rows are dead.
+    store.save_files(seen_files)  # Forget files that were deleted.
+    store.close()
+    if temp_dir:
+        shutil.rmtree(temp_dir, ignore_errors=True)  # Nothing is kept when caching is disabled.
+    else:
+        print(f"Embedding cache: {cache_hits} cached, {len(tasks)} processed.")  # Show how much work was saved.
 
     # --- Finalization and Saving ---
-    if not known_embeddings:  # After all loops, check if any embeddings were extracted.
+    if not total_rows:  # After all loops, check if any embeddings were extracted.
         print("No faces processed. Please check the training data and image quality.")  # If not, print an error.
         return  # Exit the function.
 
-    print(f"\nExtracted {len(known_embeddings)} total embeddings from the training data.")  # Print a summary.
-
-    # Save the embeddings and names to a binary pickle file for fast loading.
-    data = {"embeddings": known_embeddings, "names": known_names}  # Create a dictionary to hold our two lists.
-    with open(embeddings_path, 'wb') as f:  # Open the output file in write-binary mode ('wb').
-        pickle.dump(data, f)  # Use pickle to serialize and save the dictionary to the file.
+    print(f"\nExtracted {total_rows} total embeddings from the training data.")  # Print a summary.
 
     # Save a unique, sorted list of names to a human-readable YAML file (optional but good practice).
-    unique_names = {i: name for i, name in enumerate(sorted(list(set(known_names))))}  # Create a dictionary mapping an index to each unique name.
+    unique_names = {i: name for i, name in enumerate(sorted(known_names))}  # Create a dictionary mapping an index to each unique name.
     with open(labels_path, 'w') as f:  # Open the YAML file in write mode.
         yaml.dump(unique_names, f, default_flow_style=False)  # Save the dictionary in a clean, block style.
-        
+
     print(f"Embeddings saved to '{embeddings_path}'")  # Print a final confirmation message.
     print(f"Label map saved to '{labels_path}'")  # Print a final confirmation message.
 
 if __name__ == '__main__':  # This block runs only when this script is executed directly.
-    train_model()  # Call the main function to start the training process.
+    parser = argparse.ArgumentParser(description="Extract face embeddings from the training images.")  # Create an argument parser.
+    parser.add_argument('--data-dir', default='data/train',
+                        help="Folder with one subfolder of images per person. Default is data/train.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Clear the embedding cache and process every image again.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Worker processes for embedding new images. 0 = one per CPU core. Default is 1.")
+    parser.add_argument('--dtype', choices=['float32', 'float16'], default='float32',
+                        help="Storage precision of the gallery. float16 halves its size. Default is float32.")
+    add_detector_arguments(parser)  # --detector and the Haar cascade settings.
+    args = parser.parse_args()  # Parse the provided arguments.
+
+    if args.no_cache:  # Full rebuild: start from an empty store.
+        shutil.rmtree('models/embedding_cache', ignore_errors=True)
+    train_model(data_dir=args.data_dir, workers=args.workers, dtype=args.dtype, detector=detector_options(args))  # Call the main function to start the training process.